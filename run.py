@@ -1,30 +1,69 @@
 """
 This script runs the api server with optionally supplied host and port.
+
+With more than one worker, this process becomes the leader: it owns the Dispatcher,
+job scheduling and persistence, and the uvicorn workers forward Dispatcher calls to
+it (see whendo.api.leader).
+
+The debug endpoints (e.g. /debug/profile) are served only when the environment holds
+a token in WHENDO_DEBUG_TOKEN, which requests supply as "Authorization: Bearer <token>".
 """
+
 import argparse
 import uvicorn
 
-"""
-import the main script that creates the FastAPI instance (main.app).
-"""
-from whendo.api import main
+if __name__ == "__main__":
+    """
+    parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1", dest="host")
+    parser.add_argument("--port", type=int, default=8000, dest="port")
+    parser.add_argument("--workers", type=int, default=1, dest="workers")
+    parser.add_argument("--peer-channel", action="store_true", dest="peer_channel")
+    parser.add_argument("--full-rez-info", action="store_true", dest="full_rez_info")
+    parser.add_argument("--max-rez-depth", type=int, default=64, dest="max_rez_depth")
+    parser.add_argument("--log-sample-every", type=int, default=1, dest="sample_every")
+    parser.add_argument("--log-rate-limit", type=float, default=None, dest="rate_limit")
+    parser.add_argument(
+        "--log-summary-interval", type=float, default=60.0, dest="summary_interval"
+    )
+    parser.add_argument("--history-store", action="store_true", dest="history_store")
+    parser.add_argument(
+        "--history-retention-days", type=float, default=30.0, dest="retention_days"
+    )
+    parser.add_argument("--profile-lock", action="store_true", dest="profile_lock")
+    args = parser.parse_args()
 
-"""
-parse command line arguments
-"""
-parser = argparse.ArgumentParser()
-parser.add_argument("--host", type=str, default="127.0.0.1", dest="host")
-parser.add_argument("--port", type=int, default=8000, dest="port")
-parser.add_argument("--workers", type=int, default=1, dest="workers")
-args = parser.parse_args()
+    """
+    apply the settings here; with more than one worker, export them to the
+    environment the workers inherit (see whendo.api.settings)
+    """
+    from whendo.api import settings
 
-"""
-initialize shared server information
-"""
-import whendo.core.util as util
-util.SystemInfo.init(host=args.host, port=args.port)
+    settings.apply(vars(args))
 
-"""
-uvicorn is the ASGI server that runs the api specified with FastAPI.
-"""
-uvicorn.run(main.app, host=args.host, port=args.port, workers=args.workers)
+    """
+    uvicorn is the ASGI server that runs the api specified with FastAPI. Worker
+    processes import the app themselves, so it is passed as an import string.
+    """
+    if args.workers > 1:
+        import whendo.log.init
+        from whendo.core.dispatcher import DispatcherSingleton
+        from whendo.api.leader import Leader
+
+        settings.export(vars(args))
+        Leader.serve(DispatcherSingleton.get())
+        uvicorn.run(
+            "whendo.api.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+        )
+    else:
+        """
+        import the main script that creates the FastAPI instance (main.app).
+        """
+        from whendo.api import main
+
+        uvicorn.run(main.app, host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the per-execute overhead of Action.compute_flds over the built-in
+actions, comparing the current implementation to the previous one (reproduced
+below), which walked __fields__ on every call.
+
+usage:
+    python -m tests.bench_action [iterations]
+"""
+
+import sys
+import timeit
+from whendo.core.action import Action
+from whendo.core.util import Rez
+import whendo.core.actions.list_action as list_x
+import whendo.core.actions.file_action as file_x
+import whendo.core.actions.sys_action as sys_x
+import whendo.core.actions.dispatch_action as disp_x
+
+
+def previous_compute_flds(action: Action, rez: Rez = None):
+    fields = set(
+        name for name in action.__fields__ if action.__fields__[name].default != name
+    )
+    field_values = {
+        f: action.__dict__[f] for f in fields if action.__dict__[f] is not None
+    }
+    if rez and rez.flds:
+        rez_flds = rez.flds.copy()
+        rez_flds.update(field_values)
+        return rez_flds
+    else:
+        return field_values
+
+
+actions = [
+    list_x.Success(),
+    list_x.Result(value=1),
+    list_x.RaiseCmp(value=1, cmp=0),
+    list_x.Vals(vals={"a": 1}),
+    list_x.All(actions=[list_x.Success(), list_x.Result(value=1)]),
+    list_x.IfElse(test_action=list_x.Success(), else_action=list_x.Failure()),
+    file_x.FileAppend(file="/dev/null", payload={"a": 1}),
+    sys_x.SysInfo(),
+    disp_x.Exec(server_name="s", action_name="a"),
+    disp_x.ScheduleAction(scheduler_name="s", action_name="a"),
+]
+rezzes = {"rez=None": None, "rez.flds": Rez(flds={"a": 1, "b": 2, "c": 3})}
+
+
+def main(iterations: int = 100000):
+    print(f"{'action':<16}{'rez':<10}{'before (us)':>12}{'after (us)':>12}")
+    for action in actions:
+        for label, rez in rezzes.items():
+            assert action.compute_flds(rez=rez) == previous_compute_flds(action, rez)
+            before = timeit.timeit(
+                lambda: previous_compute_flds(action, rez), number=iterations
+            )
+            after = timeit.timeit(
+                lambda: action.compute_flds(rez=rez), number=iterations
+            )
+            print(
+                f"{action.__class__.__name__:<16}{label:<10}"
+                f"{before / iterations * 1e6:>12.2f}{after / iterations * 1e6:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -7,21 +7,24 @@ This class and the fixture, startup_and_shutdown_uvicorn, rely on asynchronous p
 import time
 import pytest
 import json
+import asyncio
+import threading
+from fastapi import HTTPException
 from pydantic import BaseModel
 from httpx import AsyncClient
-from datetime import timedelta
+from datetime import datetime, timedelta
 from whendo.core.action import Action, ActionRez
 import whendo.core.actions.file_action as file_x
 import whendo.core.actions.dispatch_action as disp_x
 import whendo.core.actions.sys_action as sys_x
-from whendo.core.actions.list_action import All, Success, Vals
+from whendo.core.actions.list_action import All, Success, Vals, Parallel
 from whendo.core.actions.sys_action import SysInfo
 from whendo.core.scheduler import Scheduler, Immediately
 from whendo.core.schedulers.timed_scheduler import Timely
 from whendo.core.dispatcher import Dispatcher
 from whendo.core.program import Program
 from whendo.core.programs.simple_program import PBEProgram
-from whendo.core.server import Server
+from whendo.core.server import Server, Partition
 from whendo.core.util import (
     FilePathe,
     DateTime,
@@ -29,6 +32,9 @@ from whendo.core.util import (
     DateTime2,
     Rez,
 )
+from whendo.api import main_temp
+from whendo.api.shared import BoundedExecutor
+from whendo.core.peer import Peer, PeerChannels
 from whendo.core.resolver import (
     resolve_action,
     resolve_scheduler,
@@ -1248,6 +1254,250 @@ async def test_collections(
     assert servers["test"] == server
 
 
+@pytest.mark.asyncio
+async def test_collection_pages(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+
+    for i in range(5):
+        await add_action(base_url=base_url, action_name=f"foo{i}", action=Success())
+    await add_action(base_url=base_url, action_name="bar", action=SysInfo())
+
+    response = await get(base_url, "/actions?prefix=foo&limit=2&names_only=true")
+    assert response.json() == {"items": ["foo0", "foo1"], "next": "foo1"}
+    response = await get(base_url, "/actions?prefix=foo&names_only=true&after=foo3")
+    assert response.json() == {"items": ["foo4"], "next": None}
+    response = await get(base_url, "/actions?class_name=SysInfo&fields=class,marker")
+    items = response.json()["items"]
+    assert items == {"bar": {"class": "SysInfo", "marker": "sys_info"}}
+    response = await get(base_url, "/actions")
+    assert len(response.json()) == 6
+
+    response = await get(base_url, "/dispatcher/load?fields=actions")
+    assert set(response.json().keys()) == {"actions"}
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_load_etag(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(base_url=base_url, action_name="foo", action=Success())
+    response = await get(base_url, "/dispatcher/load")
+    etag = response.headers["etag"]
+    assert "foo" in response.json()["actions"]
+    async with AsyncClient(base_url=base_url) as ac:
+        response = await ac.get("/dispatcher/load", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        response = await ac.get(
+            "/dispatcher/describe_all", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        await add_action(base_url=base_url, action_name="bar", action=Success())
+        response = await ac.get("/dispatcher/load", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert "bar" in response.json()["actions"]
+    response = await get(base_url, "/dispatcher/load?fields=actions")
+    assert set(response.json().keys()) == {"actions"}
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_changes(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    feed = (await get(base_url, "/dispatcher/changes?since=0")).json()
+    epoch, revision = feed["epoch"], feed["revision"]
+    await add_action(base_url=base_url, action_name="foo", action=Success())
+    feed = (
+        await get(base_url, f"/dispatcher/changes?since={revision}&epoch={epoch}")
+    ).json()
+    assert not feed["resync"]
+    assert [(c["op"], c["field"], c["name"]) for c in feed["changes"]] == [
+        ("set", "actions", "foo")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_partition(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    server = Server(host="elsewhere", port=8000, tags={"role": ["worker"]})
+    await add_server(base_url=base_url, server_name="aqua", server=server)
+    await add_action(base_url=base_url, action_name="foo", action=Success())
+    await add_scheduler(
+        base_url=base_url, scheduler_name="bar", scheduler=Timely(interval=1)
+    )
+    await schedule_action(base_url=base_url, scheduler_name="bar", action_name="foo")
+    partition = Partition(key_tags={"role": ["worker"]})
+    response = await put(base_url, "/dispatcher/partition", partition)
+    assert response.status_code == 200
+    response = await get(base_url, "/dispatcher/partition")
+    assert Partition(**response.json()) == partition
+    response = await get(base_url, "/dispatcher/partition/assignments")
+    assert response.json() == {"aqua": ["bar:foo"]}
+    async with AsyncClient(base_url=base_url) as ac:
+        response = await ac.delete("/dispatcher/partition")
+        assert response.status_code == 200
+    response = await get(base_url, "/dispatcher/partition")
+    assert response.json() is None
+
+
+@pytest.mark.asyncio
+async def test_exec_best_failover(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, host, port
+):
+    await reset_dispatcher(base_url, str(tmp_path))
+    local = Server(host=host, port=port, tags={"role": ["any"]})
+    # nothing listens on port 1; unmeasured servers are tried in name order
+    dead = Server(host=host, port=1, tags={"role": ["any"]})
+    await add_server(base_url=base_url, server_name="test", server=local)
+    await add_server(base_url=base_url, server_name="dead", server=dead)
+    await add_action(base_url=base_url, action_name="foo", action=Success())
+    exec_best = disp_x.ExecBest(key_tags={"role": ["any"]}, action_name="foo")
+    response = await post(base_url, "/execution", exec_best)
+    assert response.status_code == 200
+    assert response.json()["extra"]["server_name"] == "test"
+    assert "dead" in response.json()["extra"]["failures"]
+    response = await get(base_url, "/dispatcher/server_health")
+    health = response.json()
+    assert health["dead"]["errors"] == 1 and health["test"]["errors"] == 0
+    response = await post(base_url, "/execution", disp_x.ProbeServers())
+    assert response.status_code == 200
+    assert "1min" in response.json()["result"]["test"]
+    response = await get(base_url, "/dispatcher/server_health")
+    assert response.json()["test"]["load_avg"] is not None
+    # a server may be named health
+    await add_server(base_url=base_url, server_name="health", server=local)
+    response = await get(base_url, "/servers/health")
+    assert response.json()["port"] == port
+
+
+@pytest.mark.asyncio
+async def test_peer_channel(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, host, port
+):
+    pytest.importorskip("websockets.sync.client")
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(base_url=base_url, action_name="foo", action=Vals(vals={"a": 1}))
+    PeerChannels.enable()
+    try:
+        peer = Peer(host=host, port=port)
+        results = await asyncio.gather(
+            *[asyncio.to_thread(peer.execute_action, "foo") for _ in range(8)],
+            asyncio.to_thread(peer.execute_supplied_action, Vals(vals={"a": 1})),
+        )
+        assert all(result.flds == {"a": 1} for result in results)
+        # the concurrent calls shared one channel
+        assert len(PeerChannels.channels) == 1
+        with pytest.raises(AssertionError):
+            await asyncio.to_thread(peer.execute_action, "missing")
+        assert PeerChannels.get(host, port).is_open()
+    finally:
+        PeerChannels.disable()
+
+
+@pytest.mark.asyncio
+async def test_peer_channel_malformed(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, host, port
+):
+    """
+    Want malformed frames dropped without closing the channel, and requests that
+    fail answered with an error.
+    """
+    pytest.importorskip("websockets.sync.client")
+    from websockets.sync.client import connect
+
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(base_url=base_url, action_name="foo", action=Vals(vals={"a": 1}))
+
+    def converse():
+        with connect(f"ws://{host}:{port}/execution/channel") as connection:
+            connection.send("not json")
+            connection.send(json.dumps({"action_name": "foo"}))
+            connection.send(json.dumps({"id": 1, "action_name": "missing"}))
+            connection.send(json.dumps({"id": 2, "action_name": "foo"}))
+            responses = [json.loads(connection.recv(timeout=5)) for _ in range(2)]
+        return {response["id"]: response for response in responses}
+
+    responses = await asyncio.to_thread(converse)
+    assert responses[1]["error"] and responses[1]["rez"] is None
+    assert responses[2]["rez"]["flds"] == {"a": 1}
+
+
+@pytest.mark.asyncio
+async def test_idempotent_execution(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    file_append = file_x.FileAppend(
+        relative_to_output_dir=False,
+        file=str(tmp_path / "output.txt"),
+        payload={"hi": "pyrambium"},
+    )
+    await add_action(base_url=base_url, action_name="foo", action=file_append)
+    async with AsyncClient(base_url=base_url) as ac:
+        for key in ["k1", "k1", "k2"]:
+            response = await ac.get(
+                "/actions/foo/execute", headers={"Idempotency-Key": key}
+            )
+            assert response.status_code == 200
+        response = await ac.post(
+            "/execution", data=file_append.json(), headers={"Idempotency-Key": "k1"}
+        )
+        assert response.status_code == 200
+        # the key reused with another action doesn't get the first one's result
+        other = file_append.copy(update={"payload": {"hi": "other"}})
+        response = await ac.post(
+            "/execution", data=other.json(), headers={"Idempotency-Key": "k1"}
+        )
+        assert response.status_code == 200
+    with open(file_append.file, "r") as fid:
+        lines = fid.readlines()
+    # k1 ran once per endpoint, k2 once
+    assert len([line for line in lines if "pyrambium" in line]) == 3
+    assert len([line for line in lines if "other" in line]) == 1
+
+
+@pytest.mark.asyncio
+async def test_parallel_exec(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(base_url=base_url, action_name="foo", action=Vals(vals={"a": 1}))
+    # the members reach the Dispatcher through DispatcherHooks from other threads
+    parallel = Parallel(
+        actions=[disp_x.Exec(action_name="foo")] * 3,
+        timeout=5,
+        include_processing_info=True,
+    )
+    await add_action(base_url=base_url, action_name="bar", action=parallel)
+    response = await get(base_url, "/actions/bar/execute")
+    assert response.status_code == 200
+    assert response.json()["extra"]["success_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_parallel_exec_once(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, host, port
+):
+    """
+    Want repeats of a keyed Exec within one invocation, e.g. on Parallel's
+    threads, to execute once at the server, and each invocation once.
+    """
+    await reset_dispatcher(base_url, str(tmp_path))
+    file_append = file_x.FileAppend(
+        relative_to_output_dir=False,
+        file=str(tmp_path / "output.txt"),
+        payload={"hi": "pyrambium"},
+    )
+    await add_action(base_url=base_url, action_name="foo", action=file_append)
+    await add_server(
+        base_url=base_url, server_name="test", server=Server(host=host, port=port)
+    )
+    exec_foo = disp_x.Exec(server_name="test", action_name="foo", idempotency_key="k")
+    parallel = Parallel(actions=[exec_foo] * 3, timeout=5, include_processing_info=True)
+    await add_action(base_url=base_url, action_name="bar", action=parallel)
+    for _ in range(2):
+        response = await get(base_url, "/actions/bar/execute")
+        assert response.status_code == 200
+        assert response.json()["extra"]["success_count"] == 3
+    with open(file_append.file, "r") as fid:
+        lines = fid.readlines()
+    assert len([line for line in lines if "pyrambium" in line]) == 2
+
+
 @pytest.mark.asyncio
 async def test_scheduling_info(startup_and_shutdown_uvicorn, base_url, tmp_path):
     """ clear all scheduling. """
@@ -1595,6 +1845,160 @@ async def test_unschedule_active_program_2(startup_and_shutdown_uvicorn, base_ur
 
     await clear_all_scheduling(base_url=base_url)
 
+
+@pytest.mark.asyncio
+async def test_executions(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(
+        base_url=base_url,
+        action_name="foo",
+        action=All(actions=[Vals(vals={"a": 1}), Success()]),
+    )
+    since = datetime.now().isoformat()
+    response = await get(base_url, "/actions/foo/execute")
+    assert response.status_code == 200
+    response = await get(base_url, f"/executions?tag=:foo&since={since}")
+    assert response.status_code == 200
+    assert [execution["action_name"] for execution in response.json()] == ["foo"]
+    response = await get(base_url, f"/executions?since={since}")
+    executions = response.json()
+    # the children (untagged) finish, and are recorded, before the action itself
+    assert [execution["action_name"] for execution in executions] == [
+        "Vals",
+        "Success",
+        "foo",
+    ]
+    assert all(execution["status"] == "success" for execution in executions)
+    response = await get(base_url, f"/executions?since={since}&limit=1")
+    assert [execution["action_name"] for execution in response.json()] == ["foo"]
+    response = await get(base_url, f"/executions?status=failure&since={since}")
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_metrics(startup_and_shutdown_uvicorn, base_url, tmp_path):
+    await reset_dispatcher(base_url, str(tmp_path))
+    await add_action(base_url=base_url, action_name="foo", action=Success())
+    response = await get(base_url, "/actions/foo/execute")
+    assert response.status_code == 200
+    response = await get(base_url, "/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'whendo_action_duration_seconds_count{action="foo"}' in response.text
+    assert 'whendo_executor_in_flight{executor="executions"} 0' in response.text
+
+
+@pytest.mark.asyncio
+async def test_standby_rejects_changes(
+    startup_and_shutdown_uvicorn, base_url, tmp_path
+):
+    await reset_dispatcher(base_url, str(tmp_path))
+    main_temp.dispatcher_instance.set_standby("leader:8000 (pid 1)")
+    try:
+        response = await post(base_url, "/actions/foo", Success())
+        assert response.status_code == 503
+        assert response.json()["detail"]["leader"] == "leader:8000 (pid 1)"
+        response = await get(base_url, "/actions")
+        assert response.status_code == 200 and response.json() == {}
+    finally:
+        main_temp.dispatcher_instance.set_standby(None)
+
+
+@pytest.mark.asyncio
+async def test_debug_profile(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, monkeypatch
+):
+    monkeypatch.delenv("WHENDO_DEBUG_TOKEN", raising=False)
+    response = await get(base_url, "/debug/profile?seconds=0.1")
+    assert response.status_code == 404
+    monkeypatch.setenv("WHENDO_DEBUG_TOKEN", "sesame")
+    response = await get(base_url, "/debug/profile?seconds=0.1")
+    assert response.status_code == 401
+    async with AsyncClient(base_url=base_url) as ac:
+        response = await ac.get(
+            url="/debug/profile?seconds=0.2&hz=50",
+            headers={"Authorization": "Bearer sesame"},
+        )
+    assert response.status_code == 200
+    # the event loop's thread awaits the profile
+    assert "MainThread;" in response.text
+
+
+@pytest.mark.asyncio
+async def test_lock_profile_commands(
+    startup_and_shutdown_uvicorn, base_url, tmp_path, monkeypatch
+):
+    """
+    starting and stopping the lock profile is a debug command
+    """
+    await reset_dispatcher(base_url, str(tmp_path))
+    monkeypatch.delenv("WHENDO_DEBUG_TOKEN", raising=False)
+    async with AsyncClient(base_url=base_url) as ac:
+        response = await ac.get(url="/dispatcher/lock_profile/start")
+        assert response.status_code == 405
+        response = await ac.post(url="/dispatcher/lock_profile/start")
+        assert response.status_code == 404
+        monkeypatch.setenv("WHENDO_DEBUG_TOKEN", "sesame")
+        response = await ac.post(url="/dispatcher/lock_profile/start")
+        assert response.status_code == 401
+        headers = {"Authorization": "Bearer sesame"}
+        try:
+            response = await ac.post(
+                url="/dispatcher/lock_profile/start", headers=headers
+            )
+            assert response.status_code == 200
+        finally:
+            response = await ac.post(
+                url="/dispatcher/lock_profile/stop", headers=headers
+            )
+            assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_rejects_when_full():
+    """
+    calls beyond the executor's capacity are turned away with a 503
+    """
+    executor = BoundedExecutor(name="test", max_workers=1, max_queued=0)
+    release = threading.Event()
+    blocked = asyncio.ensure_future(executor.run(release.wait, 5))
+    await asyncio.sleep(0.1)
+    with pytest.raises(HTTPException) as info:
+        await executor.run(lambda: "too many")
+    assert info.value.status_code == 503
+    release.set()
+    assert await blocked
+    assert await executor.run(lambda: "room again") == "room again"
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_keeps_cancelled_calls():
+    """
+    a cancelled request's call holds its slot until the worker is done with it
+    """
+    executor = BoundedExecutor(name="test", max_workers=1, max_queued=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(executor.run(release.wait, 5))
+    waiting = asyncio.ensure_future(executor.run(lambda: "never"))
+    await asyncio.sleep(0.1)
+    running.cancel()
+    waiting.cancel()
+    await asyncio.sleep(0.1)
+    # the waiting call was dropped; the running one still counts
+    assert (executor.in_flight, executor.queued()) == (1, 0)
+    queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+    await asyncio.sleep(0.1)
+    assert executor.queued() == 1
+    with pytest.raises(HTTPException) as info:
+        await executor.run(lambda: "too many")
+    assert info.value.status_code == 503
+    release.set()
+    assert await queued == "queued"
+    await asyncio.sleep(0.1)
+    assert executor.in_flight == 0
+    executor.shutdown()
+
 # ==========================================
 # helpers
 
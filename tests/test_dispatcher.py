@@ -1,21 +1,38 @@
+import json
 import pytest
+import threading
 import time
 from datetime import timedelta
 from typing import Optional, Dict, Any
-from whendo.core.util import Rez, SystemInfo, Now, KeyTagMode, DateTime, Rez
+from whendo.core.util import (
+    Rez,
+    SystemInfo,
+    Now,
+    KeyTagMode,
+    DateTime,
+    Rez,
+    Dirs,
+    FileLock,
+)
 from whendo.core.action import Action
-from whendo.core.server import Server
+from whendo.core.server import Server, Partition
 from whendo.core.actions.list_action import (
     UntilFailure,
+    UntilSuccess,
     All,
     Terminate,
     IfElse,
     RaiseCmp,
     Result,
+    Success,
+    Compose,
+    Vals,
+    Parallel,
 )
 from whendo.core.schedulers.timed_scheduler import Timely
 from whendo.core.scheduler import Immediately
-from whendo.core.dispatcher import Dispatcher
+from whendo.core.dispatcher import Dispatcher, DispatcherSingleton, Lok
+from whendo.core.plan import StepKind
 from whendo.core.programs.simple_program import PBEProgram
 from whendo.core.actions.dispatch_action import (
     UnscheduleProgram,
@@ -24,6 +41,7 @@ from whendo.core.actions.dispatch_action import (
     ExpireAction,
 )
 from whendo.core.timed import Timed
+from whendo.core.exception import StandbyException
 from .fixtures import port, host
 
 pause = 3
@@ -121,6 +139,103 @@ def test_server_any_4(friends, servers):
     assert len(result) == 0
 
 
+def test_server_any_multiple_keys(friends, servers):
+    """
+    A server satisfying more than one key is returned once.
+    """
+    dispatcher, scheduler, action = friends()
+    aqua, teal = servers()
+    dispatcher.add_server(server_name="aqua", server=aqua)
+    dispatcher.add_server(server_name="teal", server=teal)
+    mode = KeyTagMode.ANY
+    result = dispatcher.get_servers_by_tags(
+        key_tags={"foo": ["bar"], "fleas": ["standdown", "riseup"]},
+        key_tag_mode=mode,
+    )
+    assert len(result) == 2
+
+
+def test_server_index_maintenance(friends, servers):
+    dispatcher, scheduler, action = friends()
+    aqua, teal = servers()
+    dispatcher.add_server(server_name="aqua", server=aqua)
+    dispatcher.add_server(server_name="teal", server=teal)
+    mode = KeyTagMode.ANY
+    dispatcher.add_server_key_tags(server_name="teal", key_tags={"krimp": ["kramp"]})
+    result = dispatcher.get_servers_by_tags(
+        key_tags={"krimp": ["kramp"]}, key_tag_mode=mode
+    )
+    assert len(result) == 2
+    dispatcher.set_server(
+        server_name="aqua", server=Server(host="localhost", port=8001)
+    )
+    result = dispatcher.get_servers_by_tags(
+        key_tags={"krimp": ["kramp"]}, key_tag_mode=mode
+    )
+    assert result == [teal]
+    dispatcher.delete_server(server_name="teal")
+    result = dispatcher.get_servers_by_tags(
+        key_tags={"krimp": ["kramp"]}, key_tag_mode=mode
+    )
+    assert len(result) == 0
+
+
+def test_server_index_after_load(friends, servers):
+    dispatcher, scheduler, action = friends()
+    aqua, teal = servers()
+    dispatcher.add_server(server_name="aqua", server=aqua)
+    dispatcher.add_server(server_name="teal", server=teal)
+    loaded = dispatcher.load_current()
+    result = loaded.get_servers_by_tags(
+        key_tags={"slip": ["slide"]}, key_tag_mode=KeyTagMode.ALL
+    )
+    assert len(result) == 1
+
+
+def test_partition(friends, host, port):
+    dispatcher, scheduler, action = friends()
+    local = Server(host=host, port=port, tags={"role": ["worker"]})
+    remote = Server(host="elsewhere", port=port, tags={"role": ["worker"]})
+    dispatcher.add_server(server_name="local", server=local)
+    dispatcher.add_server(server_name="remote", server=remote)
+    dispatcher.add_scheduler("bar", scheduler)
+    for i in range(20):
+        dispatcher.add_action(f"foo{i}", action)
+        dispatcher.schedule_action(scheduler_name="bar", action_name=f"foo{i}")
+    assert len(dispatcher.get_actions_for_scheduler("bar")) == 20
+    assert dispatcher.get_partition_assignments() == {}
+
+    dispatcher.set_partition(Partition(key_tags={"role": ["worker"]}))
+    assignments = dispatcher.get_partition_assignments()
+    assert set(assignments) == {"local", "remote"}
+    owned = set(f"bar:{name}" for name in dispatcher.get_actions_for_scheduler("bar"))
+    assert owned == set(assignments["local"])
+    assert dispatcher.load_current().get_partition() == dispatcher.get_partition()
+    # client renderings don't evict the ring
+    ring = dispatcher.get_hash_ring()
+    for i in range(Dispatcher.max_renderings + 1):
+        dispatcher.render(f"load:{i}", lambda: i)
+    assert dispatcher.get_hash_ring() is ring
+
+    dispatcher.delete_server("remote")
+    assert dispatcher.get_hash_ring() is not ring
+    assert len(dispatcher.get_actions_for_scheduler("bar")) == 20
+
+
+def test_page(friends, servers):
+    dispatcher, scheduler, action = friends()
+    for i in range(5):
+        dispatcher.add_action(f"foo{i}", action)
+    dispatcher.add_action("bar", Result(value=1))
+    page = dispatcher.page("actions", prefix="foo", limit=3, names_only=True)
+    assert page == {"items": ["foo0", "foo1", "foo2"], "next": "foo2"}
+    page = dispatcher.page("actions", prefix="foo", limit=3, after=page["next"])
+    assert list(page["items"].keys()) == ["foo3", "foo4"]
+    assert page["next"] is None
+    page = dispatcher.page("actions", class_name="Result", fields=["class", "value"])
+    assert page["items"] == {"bar": {"class": "Result", "value": 1}}
+
+
 def test_schedule_action(friends):
     """
     Tests Dispatcher and Timed objects running a scheduled action.
@@ -162,6 +277,37 @@ def test_schedule_action_action(friends):
     assert action.flea_count > 0
 
 
+def test_immediately_executes_outside_lock(friends):
+    """
+    Parallel members reach the Dispatcher from other threads while an Immediately
+    scheduler executes their list.
+    """
+    dispatcher, scheduler, action = friends()
+
+    dispatcher.add_action("foo", action)
+    dispatcher.add_scheduler("bar", scheduler)
+    dispatcher.add_scheduler("now", Immediately())
+    parallel = Parallel(
+        actions=[ScheduleAction(scheduler_name="bar", action_name="foo")], timeout=2
+    )
+    dispatcher.add_action("par", parallel)
+    start = time.time()
+    dispatcher.schedule_action(scheduler_name="now", action_name="par")
+    assert time.time() - start < 1
+    assert dispatcher.get_scheduled_actions().actions("bar") == {"foo"}
+
+    # and when deferred
+    dispatcher.unschedule_scheduler_action(scheduler_name="bar", action_name="foo")
+    dispatcher.defer_action(
+        scheduler_name="now", action_name="par", wait_until=Now.dt()
+    )
+    time.sleep(0.1)
+    start = time.time()
+    dispatcher.check_for_deferred_actions()
+    assert time.time() - start < 1
+    assert dispatcher.get_scheduled_actions().actions("bar") == {"foo"}
+
+
 # def test_dispatcher_action_args_1(friends):
 #     """
 #     Tests computation of args based on fields, data and mode (=field).
@@ -399,6 +545,14 @@ def test_scheduled_action_count(friends):
     dispatcher.schedule_action(action_name="foo", scheduler_name="bar")
     assert 1 == dispatcher.get_scheduled_action_count()
     assert 1 == dispatcher.job_count()
+    # read without waiting on the lock
+    counts = {}
+    with Lok.lock:
+        reader = threading.Thread(target=lambda: counts.update(dispatcher.counts()))
+        reader.start()
+        reader.join(timeout=1)
+    assert counts["action_count"] == 1
+    assert counts["deferred_program_count"] == 0
 
 
 def test_jobs_are_running(friends):
@@ -457,6 +611,147 @@ def test_replace_dispatcher(friends):
     assert {"flea"} == dispatcher.get_scheduled_actions().actions("bath")
 
 
+def test_save_current_revision(friends):
+    dispatcher, scheduler, action = friends()
+    dispatcher.add_action("foo", action)
+    revision = dispatcher.get_revision()
+    etag = dispatcher.etag()
+    loaded = dispatcher.load_current()
+    descriptions = dispatcher.describe_all()
+    dispatcher.save_current()
+    dispatcher.check_for_expirations_and_deferrals()
+    assert dispatcher.get_revision() == revision
+    # a new instance each time, so changing one doesn't change the others
+    assert dispatcher.load_current() is not loaded
+    loaded.actions.clear()
+    assert "foo" in dispatcher.load_current().get_actions()
+    assert dispatcher.describe_all() is descriptions
+    assert dispatcher.cached("describe_all") == (etag, descriptions)
+    dispatcher.add_scheduler("bar", scheduler)
+    assert dispatcher.get_revision() == revision + 1
+    assert dispatcher.etag() != etag
+    assert dispatcher.cached("describe_all") is None
+    assert "bar" in dispatcher.load_current().get_schedulers()
+    assert "bar" in dispatcher.describe_all()["schedulers"]
+    assert "foo" in dispatcher.describe_all()["actions"]
+    dispatcher.add_server("baz", Server(host="localhost", port=8000))
+    assert "baz" in dispatcher.describe_all()["servers"]
+    assert "baz" not in dispatcher.describe_all()["programs"]
+
+
+def test_save_current_skips_unchanged(friends, monkeypatch):
+    """
+    Want the periodic checks not to serialize the state when nothing is due.
+    """
+    dispatcher, scheduler, action = friends()
+    dispatcher.add_action("foo", action)
+    serializations = []
+    serialize = Dispatcher.json
+
+    def counted(self, *args, **kwargs):
+        serializations.append(1)
+        return serialize(self, *args, **kwargs)
+
+    monkeypatch.setattr(Dispatcher, "json", counted)
+    dispatcher.check_for_expirations_and_deferrals()
+    assert serializations == []
+    dispatcher.save_current()
+    assert serializations == [1]
+
+
+def test_rendering_keys(friends, monkeypatch):
+    """
+    Want one rendering per set of known fields, and a bounded number of them.
+    """
+    dispatcher, scheduler, action = friends()
+    dispatcher.add_action("foo", action)
+    assert Dispatcher.rendering_key(None) == "load"
+    key = Dispatcher.rendering_key("servers, actions,servers")
+    assert key == "load:actions,servers"
+    with pytest.raises(AssertionError):
+        Dispatcher.rendering_key("actions,secrets")
+    with pytest.raises(AssertionError):
+        dispatcher.rendering("load:servers,actions")
+    monkeypatch.setattr(Dispatcher, "max_renderings", 2)
+    for fields in ["actions", "servers", "actions", "programs"]:
+        etag, value = dispatcher.rendering(Dispatcher.rendering_key(fields))
+        assert set(json.loads(value)) == {fields}
+    # servers was the least recently rendered
+    assert dispatcher.cached("load:servers") is None
+    assert dispatcher.cached("load:actions") is not None
+    assert dispatcher.cached("load:programs") is not None
+
+
+def test_change_feed(friends, servers, monkeypatch):
+    dispatcher, scheduler, action = friends()
+    aqua, teal = servers()
+    dispatcher.add_action("foo", action)
+    dispatcher.add_server("aqua", aqua)
+    replica = Dispatcher()
+    replica.set_timed(Timed())
+    feed = dispatcher.changes(since=0)
+    assert feed["resync"]
+    epoch, revision = replica.apply_changes(feed)
+    assert set(replica.get_actions()) == {"foo"}
+
+    dispatcher.add_scheduler("bar", scheduler)
+    dispatcher.schedule_action(scheduler_name="bar", action_name="foo")
+    dispatcher.add_server("teal", teal)
+    dispatcher.delete_server("aqua")
+    feed = dispatcher.changes(since=revision, epoch=epoch)
+    assert not feed["resync"]
+    assert {"delete"} == {
+        change["op"]
+        for change in feed["changes"]
+        if change["field"] == "servers" and change["name"] == "aqua"
+    }
+    epoch, revision = replica.apply_changes(feed)
+    assert revision == dispatcher.get_revision()
+    assert set(replica.get_schedulers()) == {"bar"}
+    assert set(replica.get_servers()) == {"teal"}
+    assert replica.get_scheduled_actions().actions("bar") == ["foo"]
+    assert dispatcher.changes(since=revision, epoch=epoch)["changes"] == []
+    assert dispatcher.changes(since=revision, epoch="other")["resync"]
+
+    monkeypatch.setattr(Dispatcher, "change_log_size", 1)
+    dispatcher.add_action("foo2", action)
+    dispatcher.add_action("foo3", action)
+    assert dispatcher.changes(since=revision, epoch=epoch)["resync"]
+
+
+def test_standby_takes_over(tmp_path, monkeypatch):
+    saved_dir = str(tmp_path) + "/"
+    monkeypatch.setattr(Dirs, "saved_dir", lambda home_path=None: saved_dir)
+    monkeypatch.setattr(Timed, "instance", Timed())
+    monkeypatch.setattr(DispatcherSingleton, "dispatcher", None)
+    monkeypatch.setattr(DispatcherSingleton, "standby_interval", 0.1)
+    leader = Dispatcher(saved_dir=saved_dir)
+    leader.save_current()
+    leader_lock = FileLock(saved_dir + "leader.lock")
+    assert leader_lock.acquire()
+    leader_lock.write("leader:8000 (pid 1)")
+
+    standby = DispatcherSingleton.get()
+    try:
+        assert not standby.jobs_are_running()
+        leader.add_action("foo", Success())
+        assert wait_for(lambda: "foo" in standby.get_actions())
+        with pytest.raises(StandbyException) as standing_by:
+            standby.add_action("bar", Success())
+        assert standing_by.value.leader == "leader:8000 (pid 1)"
+        assert "bar" not in standby.get_actions()
+        leader_lock.release()
+        assert wait_for(lambda: standby.jobs_are_running())
+        standby.add_action("bar", Success())
+        assert "bar" in leader.load_from_name("current").get_actions()
+        leader_identity = FileLock(saved_dir + "leader.lock").read()
+        assert leader_identity == DispatcherSingleton.identity()
+    finally:
+        standby.stop_jobs()
+        standby.stop_checks()
+        DispatcherSingleton.leader_lock.release()
+
+
 def test_load_dispatcher(friends):
     """
     Tests loading a dispatcher
@@ -986,9 +1281,160 @@ def test_if_else_2(friends):
     assert action2.flea_count == 101
 
 
+def test_plan(friends):
+    """
+    Want compiled plans to execute like the actions themselves, and to be
+    recompiled after set_action.
+    """
+    dispatcher, scheduler, action = friends()
+    tree = All(
+        actions=[
+            Result(value=2),
+            IfElse(
+                test_action=RaiseCmp(value=1),
+                if_action=UntilFailure(
+                    actions=[Result(value=3), RaiseCmp(value=3), Result(value=4)]
+                ),
+                else_action=Result(value=5),
+            ),
+            UntilSuccess(actions=[RaiseCmp(value=3, cmp=0), Success()]),
+            Compose(actions=[Success(), Result(value=6)]),
+        ],
+        include_processing_info=True,
+    )
+    dispatcher.add_action("tree", tree)
+    plan = dispatcher.get_plan("tree")
+    assert [step.kind for step in plan.steps].count(StepKind.ACTION) == 10
+    assert dispatcher.get_plan("tree") is plan
+
+    expected = tree.execute(rez=Rez(flds={"x": 1}))
+    result = dispatcher.execute_action_with_rez("tree", Rez(flds={"x": 1}))
+    assert result.result == expected.result == 6
+    assert result.flds == expected.flds
+    # only the plan's results carry references to its steps; the actions are untouched
+    assert expected.info == {"class": "whendo.core.actions.list_action.All"}
+    assert result.info["step"] == 0
+    assert {k: v for k, v in result.extra.items() if k != "result"} == {
+        k: v for k, v in expected.extra.items() if k != "result"
+    }
+
+    def flattened(rez):
+        return [
+            ((flat["action_info"] or {}).get("class"), flat["action_result"])
+            for flat in rez.flatten_results()
+        ]
+
+    assert flattened(result) == flattened(expected)
+
+    dispatcher.set_action("tree", All(actions=[RaiseCmp(value=1, cmp=0)]))
+    assert dispatcher.get_plan("tree") is not plan
+    result = dispatcher.execute_action_with_rez("tree", Rez(result=1))
+    assert "exception" in result.result
+    # unset fields supplied by rez.flds take effect as usual
+    with pytest.raises(Exception):
+        dispatcher.execute_action_with_rez(
+            "tree", Rez(result=1, flds={"exception_on_no_success": True})
+        )
+
+
+def test_rez_info(friends, monkeypatch):
+    """
+    Want results to carry references to their actions unless full info is asked for.
+    """
+    dispatcher, scheduler, action = friends()
+    vals = {str(i): i for i in range(100)}
+    dispatcher.add_action("foo", All(actions=[Vals(vals=vals), Result(value=1)]))
+    result = dispatcher.execute_action("foo")
+    plan = dispatcher.get_plan("foo")
+    assert result.info == {
+        "class": "whendo.core.actions.list_action.All",
+        "action": "foo",
+        "step": 0,
+        "hash": plan.hash,
+    }
+    assert result.rez.info["step"] == 2 and result.rez.rez.info["step"] == 1
+    assert Success().action_result().info == {
+        "class": "whendo.core.actions.list_action.Success"
+    }
+    monkeypatch.setattr(Action, "full_rez_info", True)
+    result = dispatcher.execute_action("foo")
+    assert result.info["instance"]["actions"][0].vals == vals
+
+
+def test_metrics(friends):
+    """
+    Want execution, scheduling, lock and save metrics in the Prometheus text format.
+    """
+    from whendo.core import metrics
+
+    metrics.registry.clear()
+    dispatcher, scheduler, action = friends()
+    dispatcher.add_action("foo", action)
+    dispatcher.add_scheduler("bar", scheduler)
+    dispatcher.execute_action("foo")
+    dispatcher.run_jobs()
+    dispatcher.schedule_action("bar", "foo")
+    time.sleep(2.5)
+    dispatcher.clear_all_scheduling()
+    values = {}
+    for line in dispatcher.get_metrics().splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    assert values['whendo_action_duration_seconds_count{action="foo"}'] >= 2
+    assert values['whendo_scheduler_lag_seconds_count{scheduler="bar"}'] >= 1
+    assert values['whendo_scheduler_lag_seconds_bucket{scheduler="bar",le="+Inf"}'] >= 1
+    assert values["whendo_lock_wait_seconds_count"] > 0
+    assert values["whendo_save_duration_seconds_count"] > 0
+    assert values["whendo_save_size_bytes"] > 0
+
+
+def test_lock_profile(friends):
+    """
+    Want the lock's waits and holds per call site while profiling, and only then.
+    """
+    dispatcher, scheduler, action = friends()
+    dispatcher.add_action("foo", action)
+    dispatcher.start_lock_profile()
+    try:
+
+        def hold():
+            with Lok.lock:
+                time.sleep(0.2)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        time.sleep(0.05)
+        dispatcher.save_current()
+        holder.join()
+        dispatcher.execute_action("foo")
+    finally:
+        dispatcher.stop_lock_profile()
+    dispatcher.save_current()
+    profile = dispatcher.get_lock_profile()
+    assert not profile["profiling"]
+    sites = profile["sites"]
+    assert list(sites)[0] == "hold"
+    assert sites["hold"]["hold"]["total"] >= 0.2
+    assert sites["save_current"]["acquisitions"] == 1
+    assert sites["save_current"]["wait"]["total"] >= 0.1
+    assert sites["execute_action"]["acquisitions"] >= 1
+    assert sites["execute_action"]["wait"]["p50"] < 0.1
+
+
 # ====================================
 
 
+def wait_for(condition, timeout: float = 5.0):
+    """ polls condition until it holds, for at most timeout seconds """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return condition()
+
+
 class FleaCount(Action):
     flea_count: int = 0
     data: Optional[Dict[Any, Any]]
@@ -0,0 +1,204 @@
+import pytest
+import pickle
+import threading
+import time
+from whendo.api import settings
+from whendo.api.leader import Leader, Replica
+from whendo.core.actions.list_action import Success
+from whendo.core.dispatcher import Dispatcher
+from whendo.core.schedulers.timed_scheduler import Timely
+from whendo.core.timed import Timed
+
+
+def test_leader_proxy(tmp_path, monkeypatch):
+    # restore the environment after Leader.serve sets these
+    monkeypatch.setenv(Leader.address_variable, "")
+    monkeypatch.setenv(Leader.authkey_variable, "")
+    dispatcher = Dispatcher(saved_dir=str(tmp_path))
+    dispatcher.set_timed(Timed())
+    Leader.serve(dispatcher)
+    assert Leader.is_configured()
+    proxy = Leader.connect()
+
+    proxy.add_action("foo", Success())
+    proxy.add_scheduler("bar", Timely(interval=1))
+    proxy.schedule_action(scheduler_name="bar", action_name="foo")
+    assert set(dispatcher.get_actions()) == {"foo"}
+    assert dispatcher.get_scheduled_action_count() == 1
+    with pytest.raises(AssertionError):
+        proxy.add_action("foo", Success())
+    # only the Dispatcher api crosses the channel
+    with pytest.raises(AttributeError):
+        proxy.json()
+
+    dispatcher.run_jobs()
+    try:
+        # schedulers with a running Timed still cross the channel
+        assert set(proxy.snapshot("schedulers")) == {"bar"}
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(proxy.execute_action("foo")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 4
+        etag, descriptions = proxy.rendering("describe_all")
+        assert etag == dispatcher.etag() and "foo" in descriptions["actions"]
+    finally:
+        dispatcher.stop_jobs()
+
+
+def test_replica(tmp_path, monkeypatch):
+    """
+    Want a worker's reads served by its replica, and its own changes read back at once.
+    """
+    monkeypatch.setenv(Leader.address_variable, "")
+    monkeypatch.setenv(Leader.authkey_variable, "")
+    monkeypatch.setattr(Replica, "interval", 0.05)
+    dispatcher = Dispatcher(saved_dir=str(tmp_path))
+    dispatcher.set_timed(Timed())
+    dispatcher.add_action("foo", Success())
+    Leader.serve(dispatcher)
+    replica = Replica(Leader.connect())
+    assert set(replica.snapshot("actions")) == {"foo"}
+
+    # forwarded to the leader, then caught up
+    replica.add_action("baz", Success())
+    assert set(replica.snapshot("actions")) == {"foo", "baz"}
+    assert set(dispatcher.get_actions()) == {"foo", "baz"}
+    with pytest.raises(AssertionError):
+        replica.add_action("foo", Success())
+
+    # followed from the change feed
+    dispatcher.add_scheduler("bar", Timely(interval=1))
+    dispatcher.schedule_action(scheduler_name="bar", action_name="foo")
+    deadline = time.time() + 5
+    while "bar" not in replica.snapshot("schedulers") and time.time() < deadline:
+        time.sleep(0.05)
+    replica.catch_up()
+    assert set(replica.snapshot("schedulers")) == {"bar"}
+    assert replica.counts() == dispatcher.counts()
+    assert replica.etag() == dispatcher.etag()
+    assert replica.rendering("describe_all")[0] == dispatcher.etag()
+    # reads don't cross the channel
+    assert replica.snapshot.__self__ is replica.dispatcher
+    # the replica never writes the leader's current.json
+    assert replica.dispatcher.current_json() == dispatcher.current_json()
+    with pytest.raises(AttributeError):
+        replica.json()
+
+
+def test_leader_exposes_router_calls():
+    """
+    Want every Dispatcher method the api calls to cross the channel.
+    """
+    import os
+    import re
+    import whendo.api
+
+    api_dir = os.path.dirname(whendo.api.__file__)
+    called = set()
+    for directory in (api_dir, os.path.join(api_dir, "router")):
+        for file_name in os.listdir(directory):
+            if file_name.endswith(".py"):
+                with open(os.path.join(directory, file_name)) as file:
+                    called.update(
+                        re.findall(
+                            r"(?:get_dispatcher\(router\)|dispatcher)\.(\w+)",
+                            file.read(),
+                        )
+                    )
+    assert called
+    # dispatcher.router is the router module's, not the Dispatcher's
+    assert called - {"router"} <= set(Leader.exposed())
+    assert "json" not in Leader.exposed()
+
+
+def test_pickle_dispatcher_with_running_jobs(tmp_path):
+    dispatcher = Dispatcher(saved_dir=str(tmp_path))
+    dispatcher.set_timed(Timed())
+    dispatcher.add_action("foo", Success())
+    dispatcher.add_scheduler("bar", Timely(interval=1))
+    dispatcher.schedule_action(scheduler_name="bar", action_name="foo")
+    dispatcher.run_jobs()
+    try:
+        copy = pickle.loads(pickle.dumps(dispatcher))
+        assert set(copy.get_actions()) == {"foo"}
+        assert copy.get_revision() == 0
+    finally:
+        dispatcher.stop_jobs()
+
+
+def test_worker_settings(monkeypatch):
+    from whendo.core.action import Action
+    from whendo.core.history_store import HistoryStore
+    import whendo.core.util as util
+
+    inits = []
+    monkeypatch.setattr(
+        util.SystemInfo, "init", lambda host, port: inits.append((host, port))
+    )
+    monkeypatch.setattr(util.Rez, "max_depth", util.Rez.max_depth)
+    monkeypatch.setattr(Action, "full_rez_info", False)
+    monkeypatch.setenv(settings.variable, "")
+    assert settings.exported() is None
+    settings.export(
+        {
+            "host": "localhost",
+            "port": 8001,
+            "max_rez_depth": 8,
+            "sample_every": 1,
+            "rate_limit": None,
+            "summary_interval": 60.0,
+            "peer_channel": False,
+            "full_rez_info": True,
+            "history_store": True,
+            "retention_days": 30.0,
+            "profile_lock": False,
+        }
+    )
+    settings.apply(settings.exported(), leader=False)
+    assert inits == [("localhost", 8001)]
+    assert util.Rez.max_depth == 8
+    assert Action.full_rez_info
+    # the store is the leader's
+    assert HistoryStore.instance is None
+
+
+@pytest.mark.parametrize(
+    "worker, handler", [(False, "RotatingFileHandler"), (True, "WatchedFileHandler")]
+)
+def test_worker_log_handler(worker, handler):
+    """
+    Want only the leader to rotate job.log; its workers reopen it once rotated.
+    """
+    import os
+    import subprocess
+    import sys
+
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name != Leader.address_variable
+    }
+    if worker:
+        env[Leader.address_variable] = "leader"
+    script = (
+        "import sys\n"
+        "import whendo.log.init\n"
+        "from whendo.log.pipeline import LogPipeline\n"
+        "assert 'whendo.core.dispatcher' not in sys.modules\n"
+        f"assert whendo.log.init.leader_address_variable == {Leader.address_variable!r}\n"
+        "print([type(h).__name__ for h in LogPipeline.listener.handlers])\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == str([handler])
@@ -1,8 +1,12 @@
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, ClassVar
+import time
 import pytest
 import whendo.core.actions.list_action as list_x
 from whendo.core.action import Action, Rez
 from whendo.core.exception import TerminateSchedulerException
+from whendo.core.actions.cache_action import Cached
+from whendo.core.resolver import resolve_action
+from whendo.core.util import SystemInfo
 
 
 def negate(action: Action):
@@ -236,6 +240,86 @@ def test_list_action_uf_3():
     assert computes_exception(uf_action.execute)
 
 
+def test_parallel():
+    parallel = list_x.Parallel(
+        actions=[
+            Sleep(seconds=0.2),
+            Sleep(seconds=0.2),
+            list_x.Failure(),
+            Sleep(seconds=0.2),
+        ],
+        include_processing_info=True,
+    )
+    start = time.perf_counter()
+    rez = parallel.execute(rez=Rez(flds={"a": 1}))
+    # wall time is the longest action's, not the sum
+    assert time.perf_counter() - start < 0.5
+    assert [rez.result[i] for i in [0, 1, 3]] == [0.2, 0.2, 0.2]
+    assert "exception" in rez.result[2]
+    assert rez.extra["success_count"] == 3 and rez.extra["exception_count"] == 1
+    assert rez.flds == {"a": 1}
+    capped = list_x.Parallel(
+        actions=[Sleep(seconds=0.2)] * 3, max_workers=1, timeout=0.3
+    )
+    rez = capped.execute()
+    assert rez.result[0] == 0.2
+    assert all("exception" in result for result in rez.result[1:])
+
+
+def test_race():
+    # the primary fails slowly; the hedge starts the fallback before it fails
+    race = list_x.Race(
+        actions=[SleepFail(seconds=1.5), Sleep(seconds=0.05), Sleep(seconds=0.01)],
+        hedge_delay=0.3,
+        include_processing_info=True,
+    )
+    start = time.perf_counter()
+    rez = race.execute()
+    assert time.perf_counter() - start < 1
+    assert rez.result == 0.05
+    assert rez.extra["processing_count"] == 2
+    assert rez.extra["success_count"] == 1
+    # a failure starts the next action at once
+    race = list_x.Race(
+        actions=[list_x.Failure(), Sleep(seconds=0.05)],
+        hedge_delay=10,
+        include_processing_info=True,
+    )
+    start = time.perf_counter()
+    rez = race.execute()
+    assert time.perf_counter() - start < 1
+    assert rez.result == 0.05 and rez.extra["exception_count"] == 1
+    # all at once; the fastest wins
+    race = list_x.Race(actions=[Sleep(seconds=0.3), Sleep(seconds=0.05)])
+    assert race.execute().result == 0.05
+    race = list_x.Race(
+        actions=[Sleep(seconds=0.5)], timeout=0.1, exception_on_no_success=True
+    )
+    assert computes_exception(race.execute)
+
+
+def test_list_pool():
+    list_x.ListPool.configure(max_workers=2)
+    try:
+        # timed-out actions keep the shared threads; the others overflow, still
+        # concurrently and within their timeout
+        slow = list_x.Parallel(actions=[Sleep(seconds=0.5)] * 2, timeout=0.05)
+        slow.execute()
+        start = time.perf_counter()
+        nested = list_x.Parallel(
+            actions=[list_x.Parallel(actions=[Sleep(seconds=0.1)] * 2)] * 2
+        )
+        assert nested.execute().result == [[0.1, 0.1], [0.1, 0.1]]
+        assert time.perf_counter() - start < 0.3
+        start = time.perf_counter()
+        late = list_x.Parallel(actions=[Sleep(seconds=0.5)] * 4, timeout=0.1)
+        assert all("exception" in result for result in late.execute().result)
+        assert time.perf_counter() - start < 0.3
+        assert len(list_x.ListPool.pool._threads) == 2
+    finally:
+        list_x.ListPool.configure()
+
+
 def test_if_else_action_else_1():
     dictionary = {"value": None}
 
@@ -579,6 +663,66 @@ def test_format_2():
     )
 
 
+def test_cached():
+    before = SystemInfo.get()
+    cached = Cached(action=Count(label="cached"), ttl=0.2, key_flds=["x"])
+    assert cached.execute().result == 1
+    # y is not a key fld
+    assert cached.execute(rez=Rez(flds={"y": 1})).result == 1
+    assert cached.execute(rez=Rez(flds={"x": 1})).result == 2
+    # copies share the cache
+    copy = resolve_action(cached.dict())
+    assert isinstance(copy, Cached)
+    assert list_x.All(actions=[copy]).execute(rez=Rez(flds={"x": 1})).result == 2
+    # a hit gets its own Rez, chained to the supplied one
+    supplied = Rez(result="supplied", flds={"x": 1})
+    hit = cached.execute(rez=supplied)
+    assert hit.result == 2 and hit.rez is supplied
+    assert hit is not cached.execute(rez=Rez(flds={"x": 1}))
+    time.sleep(0.3)
+    assert cached.execute().result == 3
+    after = SystemInfo.get()
+    assert after["cache_hits"] - before.get("cache_hits", 0) == 4
+    assert after["cache_misses"] - before.get("cache_misses", 0) == 3
+    # serialized once per definition
+    assert cached.label() is cached.label()
+    cached.ttl = 0.5
+    assert '"ttl": 0.5' in cached.label()
+
+
+def test_action_caches_bounded(monkeypatch):
+    from whendo.core.actions.cache_action import ActionCaches
+
+    monkeypatch.setattr(ActionCaches, "max_caches", 2)
+    ActionCaches.clear()
+    for label in ("a", "b", "a", "c"):
+        ActionCaches.get(label, max_size=1, ttl=1.0)
+    assert list(ActionCaches.caches) == ["a", "c"]
+
+
+def test_cached_keeps_rez():
+    """
+    Want a hit to carry the wrapped action's flds and extra, as a miss does.
+    """
+    cached = Cached(action=list_x.Vals(vals={"a": 1}), key_flds=["x"])
+    miss = cached.execute(rez=Rez(result="miss", flds={"x": 1}))
+    supplied = Rez(result="hit", flds={"x": 1})
+    hit = cached.execute(rez=supplied)
+    assert miss.flds == hit.flds == {"x": 1, "a": 1}
+    assert hit.rez is supplied and hit.rez.result == "hit"
+    assert hit.extra == miss.extra
+
+
+def test_cached_stale_while_revalidate():
+    cached = Cached(action=Count(label="stale"), ttl=0.1, stale_while_revalidate=True)
+    assert cached.execute().result == 1
+    time.sleep(0.2)
+    # the expired result comes back while the action runs again
+    assert cached.execute().result == 1
+    time.sleep(0.1)
+    assert cached.execute().result == 2
+
+
 # helpers
 
 
@@ -590,3 +734,31 @@ class Add1(Action):
             if isinstance(rez.result, int) or isinstance(rez.result, float):
                 return self.action_result(result=rez.result + 1, rez=rez)
         return self.action_result(result=1, rez=rez)
+
+
+class Count(Action):
+    count: str = "count"
+    label: str
+    executions: ClassVar[Dict[str, int]] = {}
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        Count.executions[self.label] = 1 + Count.executions.get(self.label, 0)
+        return self.action_result(result=Count.executions[self.label], rez=rez)
+
+
+class Sleep(Action):
+    sleep: str = "sleep"
+    seconds: float
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        time.sleep(self.seconds)
+        return self.action_result(result=self.seconds, rez=rez)
+
+
+class SleepFail(Action):
+    sleep_fail: str = "sleep_fail"
+    seconds: float
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        time.sleep(self.seconds)
+        raise Exception("purposely unsuccessful execution", self.json())
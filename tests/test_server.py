@@ -186,3 +186,69 @@ def servers():
         return (server1, server2)
 
     return stuff
+
+
+def test_server_index_select(servers):
+    server1, server2 = servers()
+    index = srv.ServerIndex()
+    index.add("server1", server1)
+    index.add("server2", server2)
+    any_mode, all_mode = util.KeyTagMode.ANY, util.KeyTagMode.ALL
+    assert index.select({"foo": ["baz"]}, any_mode) == {"server1"}
+    assert index.select({"foo": ["bar"]}, any_mode) == {"server1", "server2"}
+    assert index.select({"foo": ["bar"]}, all_mode) == {"server2"}
+    assert index.select({"foo": ["bar", "baz"]}, all_mode) == {"server1", "server2"}
+    index.delete("server1")
+    assert index.select({"foo": ["bar", "baz"]}, any_mode) == {"server2"}
+    assert "krimp" not in index.key_tag_names
+
+
+def test_hash_ring():
+    keys = [f"scheduler{i}:action{i}" for i in range(4000)]
+    assert srv.HashRing([]).owner(keys[0]) is None
+    ring = srv.HashRing(["aqua", "teal", "navy"])
+    before = {key: ring.owner(key) for key in keys}
+    reordered = srv.HashRing(["navy", "teal", "aqua"])
+    assert before == {key: reordered.owner(key) for key in keys}
+    for name in ["aqua", "teal", "navy"]:
+        assert 0.2 < list(before.values()).count(name) / len(keys) < 0.47
+    ring = srv.HashRing(["aqua", "teal", "navy", "ruby"])
+    after = {key: ring.owner(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    # only keys claimed by the new server move, roughly a quarter of them
+    assert all(after[key] == "ruby" for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.4
+
+
+def test_server_health():
+    health = srv.ServerHealth(alpha=0.5)
+    # unmeasured servers score the median of the measured ones
+    assert health.rank(["teal", "aqua"]) == ["aqua", "teal"]
+    health.record_call("aqua", latency=0.2, ok=True)
+    health.record_call("navy", latency=0.4, ok=True)
+    assert health.rank(["aqua", "navy", "teal"]) == ["aqua", "teal", "navy"]
+    health.forget("navy")
+    health.record_call("teal", latency=0.1, ok=True)
+    assert health.rank(["aqua", "teal"]) == ["teal", "aqua"]
+    # load and errors push a faster server back
+    health.record_load("teal", {"1min": 3.0, "5min": 2.0, "15min": 1.0})
+    assert health.rank(["aqua", "teal"]) == ["aqua", "teal"]
+    health.record_load("teal", {"1min": 0.0, "5min": 0.0, "15min": 0.0})
+    health.record_call("teal", latency=0.1, ok=False)
+    assert health.describe()["teal"]["error_rate"] == 0.5
+    assert health.rank(["aqua", "teal"]) == ["aqua", "teal"]
+    health.forget("teal")
+    assert set(health.describe()) == {"aqua"}
+
+
+def test_server_health_fast_failures():
+    """
+    Want a server failing fast to rank behind a slower healthy one.
+    """
+    health = srv.ServerHealth()
+    for _ in range(20):
+        health.record_call("dead", latency=0.001, ok=False)
+        health.record_call("good", latency=0.1, ok=True)
+    assert health.rank(["dead", "good"]) == ["good", "dead"]
+    # an unmeasured server ranks between them
+    assert health.rank(["dead", "good", "new"]) == ["good", "new", "dead"]
@@ -113,3 +113,32 @@ def test_file_action(tmp_path):
     suite.run()
     line_count = suite.gather()
     assert line_count and line_count >= 2, "no lines written to file"
+
+
+def test_fire_time():
+    """
+    Jobs see the time they were scheduled for; Exec derives its keys from it.
+    """
+    from whendo.core.actions.dispatch_action import Exec
+
+    action = Exec(action_name="foo", idempotency_key="k")
+    fired = []
+    timed = Timed()
+    timed.schedule_timely_callable(
+        "tag", lambda: fired.append((Timed.fire_time(), action.invocation_key("k")))
+    )
+    timed.run()
+    time.sleep(2.5)
+    timed.stop()
+    timed.clear()
+    assert Timed.fire_time() is None
+    assert len(fired) >= 2
+    keys = [key for _, key in fired]
+    assert keys == [f"k:{fire_time.isoformat()}" for fire_time, _ in fired]
+    assert len(set(keys)) == len(keys)
+    assert action.invocation_key(None) is None
+    # outside jobs, the key derives from the invocation, not the time
+    from whendo.core.history import invoked
+
+    assert invoked("i", action.invocation_key, "k") == "k:i"
+    assert action.invocation_key("k") != action.invocation_key("k")
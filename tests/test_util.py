@@ -331,3 +331,414 @@ def test_system_info():
     assert "failures" in info
     assert "elapsed" in info
     assert "virtual_memory" in info
+
+
+def test_object_projection():
+    class Marked(BaseModel):
+        marked: str = "marked"
+        value: int = 7
+
+    projection = util.object_projection(Marked(), ["class", "marker", "value"])
+    assert projection == {"class": "Marked", "marker": "marked", "value": 7}
+
+
+def test_file_lock(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    lock1 = util.FileLock(path)
+    lock2 = util.FileLock(path)
+    assert lock1.acquire() and lock1.is_held()
+    assert not lock2.acquire()
+    lock1.release()
+    assert lock2.acquire()
+    lock2.release()
+
+
+def test_result_cache():
+    import threading
+    import time as timing
+
+    cache = util.ResultCache(max_size=2, ttl=0.5)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        timing.sleep(0.05)
+        return value
+
+    # concurrent callers with one key share one computation
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("a", lambda: compute(1)))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1, 1, 1, 1] and calls == [1]
+
+    def fail():
+        raise ValueError("nope")
+
+    try:
+        cache.get_or_compute("b", fail)
+        assert False
+    except ValueError:
+        pass
+    assert cache.get_or_compute("b", lambda: compute(2)) == 2
+    # beyond max_size the least recently used key goes
+    cache.get_or_compute("a", lambda: compute(3))
+    cache.get_or_compute("c", lambda: compute(4))
+    assert cache.get_or_compute("b", lambda: compute(5)) == 5
+    assert cache.get_or_compute("a", lambda: compute(6)) == 6
+    timing.sleep(0.6)
+    assert cache.get_or_compute("a", lambda: compute(7)) == 7
+    assert calls == [1, 2, 4, 5, 6, 7]
+    assert cache.info()["size"] == 2
+
+    # a key being computed isn't evicted: its repeats wait rather than recompute
+    release = threading.Event()
+    pending = threading.Thread(
+        target=lambda: cache.get_or_compute("p", lambda: release.wait(5) and "p")
+    )
+    pending.start()
+    timing.sleep(0.05)
+    for key in ("d", "e", "f"):
+        cache.get_or_compute(key, lambda: key)
+    assert "p" in cache.entries and cache.info()["size"] == 2
+    release.set()
+    pending.join()
+    assert cache.get_or_compute("p", lambda: "again") == "p"
+
+    # keys may carry arguments' fingerprints
+    assert util.fingerprint({"rez": Rez(result=1)}) == util.fingerprint(
+        {"rez": Rez(result=1)}
+    )
+    assert util.fingerprint({"rez": Rez(result=1)}) != util.fingerprint(
+        {"rez": Rez(result=2)}
+    )
+
+
+def test_rez_chain(monkeypatch):
+    monkeypatch.setattr(Rez, "max_depth", 8)
+    first = Rez(result=0)
+    second = Rez(result=1, rez=first)
+    assert second.rez is first  # shared, not copied
+    rez = second
+    for i in range(2, 100):
+        rez = Rez(result=i, rez=rez)
+    results = rez.flatten_results()
+    assert len(results) <= 8
+    assert results[0]["action_result"] == 99
+    summary = results[-1]["action_result"]
+    assert summary == f"({100 - len(results) + 1}) earlier results truncated"
+    assert second.rez is first  # truncation leaves shared results alone
+
+
+def test_log_pipeline():
+    import logging
+    import threading
+    from logging.handlers import QueueListener
+    from queue import Queue
+    from whendo.core.action import log_action_result
+    from whendo.log.pipeline import AsyncQueueHandler
+
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append((threading.current_thread(), self.format(record)))
+
+    class Counted(Rez):
+        def flatten_results(self):
+            records.append("rendered")
+            return super().flatten_results()
+
+    handler = AsyncQueueHandler(Queue(maxsize=2))
+    logger = logging.getLogger("test_log_pipeline")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    for i in range(3):
+        log_action_result(logger, "caller", "action", Counted(result=i), tag="t")
+    assert records == [] and handler.dropped == 1
+    listener = QueueListener(handler.queue, Collect())
+    listener.start()
+    listener.stop()
+    logger.removeHandler(handler)
+    assert records[0] == "rendered"
+    thread, message = records[1]
+    assert thread is not threading.current_thread()
+    assert message.startswith("CLASS (str) TAG (t) ACTION (action) RESULT (")
+    assert len(records) == 4
+
+
+def test_log_sampling(monkeypatch):
+    import time as timing
+    from whendo.log.sampling import LogSampling
+
+    summaries = []
+    monkeypatch.setattr(
+        "whendo.log.sampling.logger.info", lambda line: summaries.append(line)
+    )
+    LogSampling.configure(sample_every=3, summary_interval=3600)
+    LogSampling.set_policy("slow", rate_limit=1.0)
+    try:
+        admitted = [LogSampling.admit("fast:a", duration=0.5) for _ in range(7)]
+        assert admitted == [True, False, False, True, False, False, True]
+        assert LogSampling.admit("fast:a", duration=1.5, failed=True)
+        # the rate limit allows a burst of one, then one per second
+        assert [LogSampling.admit("slow:b") for _ in range(3)] == [True, False, False]
+        LogSampling.summarize()
+        assert len(summaries) == 2
+        assert summaries[0].startswith(
+            "SUMMARY TAG (fast:a) RESULTS (8) LOGGED (4) FAILURES (1) MEAN (0.6250s) MAX (1.5000s)"
+        )
+        assert "TAG (slow:b) RESULTS (3) LOGGED (1)" in summaries[1]
+        # a quiet tag's last interval is still reported
+        LogSampling.configure(sample_every=3, summary_interval=0.2)
+        LogSampling.admit("quiet:c", duration=0.1)
+        timing.sleep(0.5)
+        assert len(summaries) == 3
+        assert summaries[2].startswith("SUMMARY TAG (quiet:c) RESULTS (1) LOGGED (1)")
+    finally:
+        LogSampling.reset()
+    assert not LogSampling.enabled
+    assert LogSampling.summarizer is None
+
+
+def test_log_sampling_jobs(monkeypatch):
+    """
+    Want only the jobs counted, the lines within a job logged along with its own.
+    """
+    import logging
+    from whendo.core.actions.list_action import All, Success
+    from whendo.core.executor import Executor
+    from whendo.log.sampling import LogSampling
+
+    summaries = []
+    monkeypatch.setattr(
+        "whendo.log.sampling.logger.info", lambda line: summaries.append(line)
+    )
+    lines = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            lines.append(record.name)
+
+    handler = Collect()
+    loggers = [
+        logging.getLogger(name)
+        for name in ("whendo.core.executor", "whendo.core.actions.list_action")
+    ]
+    for logger in loggers:
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    executor = Executor(lambda _: {"a": All(actions=[Success(), Success()])}, None)
+    LogSampling.configure(sample_every=2, summary_interval=3600)
+    try:
+        executor.push("job")
+        assert lines == ["whendo.core.actions.list_action"] * 2 + [
+            "whendo.core.executor"
+        ]
+        executor.push("job")
+        assert len(lines) == 3
+        LogSampling.summarize()
+        assert summaries[0].startswith("SUMMARY TAG (job:a) RESULTS (2) LOGGED (1)")
+    finally:
+        LogSampling.reset()
+        for logger in loggers:
+            logger.removeHandler(handler)
+            logger.setLevel(logging.NOTSET)
+
+
+def test_execution_history():
+    from whendo.core.history import ExecutionHistory, execute_recorded
+    from whendo.core.actions.list_action import Result, Failure, Terminate
+    from whendo.core.exception import TerminateSchedulerException
+
+    history = ExecutionHistory(capacity=4)
+    before = datetime.now()
+    for i in range(3):
+        history.record("s:a", "a", 0.0, 0.1, result=Rez(result=i))
+    history.record("s:b", "b", 0.0, 0.2, exception=Exception("oops"))
+    history.record("s:a", "a", 0.0, 0.1, result=Rez(result=3))
+    # the first execution of s:a was overwritten
+    assert [r["summary"] for r in history.query(tag="s:a")] == ["1", "2", "3"]
+    failures = history.query(status="failure")
+    assert len(failures) == 1
+    assert failures[0]["action_name"] == "b"
+    assert failures[0]["summary"] == "Exception: oops"
+    assert len(history.query(tag="s:a", limit=2)) == 2
+    assert len(history.query(since=before)) == 4
+    assert history.query(since=datetime.now() + timedelta(seconds=1)) == []
+    assert history.query(tag="s:c") == []
+    for i in range(7):
+        history.record("s:c", "c", 0.0, 0.1)
+    # swept when the ring wrapped: s:a and s:b no longer have live records
+    assert history.info()["indexes"] == 3
+    assert history.query(tag="s:a") == []
+
+    ExecutionHistory.get().clear()
+    assert execute_recorded(Result(value=7), tag="t").result == 7
+    try:
+        execute_recorded(Failure(), tag="t")
+    except Exception:
+        pass
+    # terminating the scheduler isn't a failure
+    try:
+        execute_recorded(Terminate(), tag="t")
+        assert False, "TerminateSchedulerException not raised"
+    except TerminateSchedulerException:
+        pass
+    records = ExecutionHistory.get().query(tag="t")
+    assert [r["status"] for r in records] == ["success", "failure", "success"]
+    assert records[0]["action_name"] == "Result"
+    assert records[2]["summary"] == repr("terminated ('t')")
+    ExecutionHistory.get().clear()
+
+
+def test_history_store(tmp_path, monkeypatch):
+    from whendo.core.history import ExecutionHistory
+    from whendo.core.history_store import HistoryStore
+
+    registered = []
+    monkeypatch.setattr("whendo.core.history_store.atexit.register", registered.append)
+    monkeypatch.setattr(HistoryStore, "exit_registered", False)
+    HistoryStore.enable(path=str(tmp_path / "history.db"))
+    store = HistoryStore.enable(
+        path=str(tmp_path / "history.db"), server="here", flush_interval=3600
+    )
+    history = ExecutionHistory(capacity=10)
+    try:
+        for i in range(1, 101):
+            history.record("s:a", "a", 0.0, i / 100)
+        history.record("s:b", "b", 0.0, 2.0, exception=Exception("oops"))
+        # one bucket for all
+        stats = store.stats(action_name="a", bucket=1e9)
+        assert len(stats) == 1
+        assert stats[0]["count"] == 100
+        assert stats[0]["failures"] == 0
+        assert (stats[0]["p50"], stats[0]["p90"], stats[0]["p99"]) == (0.5, 0.9, 0.99)
+        assert stats[0]["max"] == 1.0
+        assert store.stats(status="failure", bucket=1e9)[0]["count"] == 1
+        assert store.stats(server="there") == []
+        assert store.stats(since=datetime.now() + timedelta(seconds=1)) == []
+        assert store.info()["written"] == 101
+        assert store.prune(before=0) == 0
+        assert store.prune() == 0
+        assert store.prune(before=datetime.now().timestamp() + 1) == 101
+        assert store.stats() == []
+    finally:
+        HistoryStore.disable()
+    assert ExecutionHistory.sink is None
+    # the exit handler is registered once, however often the store is enabled
+    assert registered == [HistoryStore.disable]
+
+
+def test_history_store_behind(tmp_path):
+    """
+    Want the oldest pending records dropped and counted when the writer falls
+    behind, and the writer to survive errors.
+    """
+    import time as time_
+    from whendo.core.history_store import HistoryStore
+
+    store = HistoryStore(
+        path=str(tmp_path / "history.db"), flush_interval=0.01, max_pending=3
+    )
+    try:
+        flush = store.flush
+        failures = []
+
+        def failing_flush():
+            failures.append(1)
+            raise Exception("disk full")
+
+        store.flush = failing_flush
+        for i in range(5):
+            store.add((i, float(i), "s:a", "a", 0.0, 0.1, True, str(i)))
+        assert store.info()["pending"] == 3
+        assert store.info()["dropped"] == 2
+        time_.sleep(0.1)
+        assert len(failures) > 1
+        assert store.writer.is_alive()
+        store.flush = flush
+        time_.sleep(0.1)
+        assert store.info()["written"] == 3
+        assert store.stats(bucket=1e9)[0]["count"] == 3
+    finally:
+        store.close()
+
+
+def test_stack_sampler():
+    import threading
+    import time as time_
+    from whendo.core.profiler import StackSampler, thread_group
+
+    assert thread_group("whendo-executions_3") == "whendo-executions"
+    assert thread_group("Thread-7 (run)") == "Thread (run)"
+    done = threading.Event()
+
+    def spin():
+        while not done.is_set():
+            time_.sleep(0.001)
+
+    spinner = threading.Thread(target=spin, name="whendo-spin_1")
+    spinner.start()
+    try:
+        collapsed = StackSampler.profile(seconds=0.3, hz=50, threads="whendo-spin")
+    finally:
+        done.set()
+        spinner.join()
+    lines = collapsed.splitlines()
+    assert all(line.startswith("whendo-spin;threading.") for line in lines)
+    assert any("tests.test_util.spin" in line for line in lines)
+    assert 10 <= sum(int(line.rsplit(" ", 1)[1]) for line in lines) <= 16
+
+
+def test_peer_channels_open_outside_lock(monkeypatch):
+    """
+    Want a slow server's channel opening to hold up only its own callers.
+    """
+    import threading
+    import time as timing
+    import whendo.core.peer as peer
+    from whendo.core.peer import PeerChannels
+
+    opened = []
+
+    class SlowChannel:
+        def __init__(self, host: str, port: int, open_timeout: float):
+            if host == "slow":
+                timing.sleep(0.5)
+            opened.append(host)
+
+        def is_open(self):
+            return True
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(peer, "PeerChannel", SlowChannel)
+    monkeypatch.setattr(peer, "connect", lambda *args, **kwargs: None)
+    PeerChannels.enable()
+    try:
+        slow = [
+            threading.Thread(target=PeerChannels.get, args=("slow", 8000))
+            for _ in range(2)
+        ]
+        for thread in slow:
+            thread.start()
+        timing.sleep(0.1)
+        start = timing.perf_counter()
+        assert PeerChannels.get("fast", 8000) is not None
+        assert timing.perf_counter() - start < 0.2
+        for thread in slow:
+            thread.join()
+        # one opening for the callers of the slow server
+        assert opened == ["fast", "slow"]
+    finally:
+        PeerChannels.disable()
@@ -0,0 +1,190 @@
+"""
+Support for running the api server with more than one worker process.
+
+The process started by run.py is the leader. It owns the Dispatcher, its Timed instances
+(scheduled jobs and the out-of-band checks for deferrals and expirations) and the
+writing of current.json, and serves the Dispatcher to the uvicorn worker processes over
+a local socket. Each worker imports whendo.api.main, finds the leader's address in its
+environment and keeps a Replica of the leader's saved state, from which it serves the
+reads of that state; other calls, mutations and executions among them, are forwarded
+to the leader. Jobs fire once, in the leader, while request handling spreads over the
+workers.
+"""
+
+import logging
+import os
+import secrets
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from types import MethodType
+from pydantic import BaseModel
+from whendo.core.dispatcher import Dispatcher
+from whendo.core.timed import Timed
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderManager(BaseManager):
+    pass
+
+
+class WorkerManager(BaseManager):
+    pass
+
+
+WorkerManager.register("get_dispatcher")
+
+
+class Leader:
+    """
+    usage (leader, before starting the workers):
+        Leader.serve(DispatcherSingleton.get())
+    usage (worker):
+        if Leader.is_configured():
+            dispatcher = Replica(Leader.connect())
+        else:
+            dispatcher = DispatcherSingleton.get()
+    note:
+        the workers inherit the leader's address and authentication key through
+        environment variables, so Leader.serve must run before they are started.
+    """
+
+    address_variable = "WHENDO_LEADER_ADDRESS"
+    authkey_variable = "WHENDO_LEADER_AUTHKEY"
+    server = None
+
+    @classmethod
+    def serve(cls, dispatcher: Dispatcher):
+        """
+        Serves dispatcher on a local socket in daemon threads; returns the address.
+        """
+        authkey = secrets.token_bytes(32)
+        LeaderManager.register(
+            "get_dispatcher", callable=lambda: dispatcher, exposed=cls.exposed()
+        )
+        cls.server = LeaderManager(authkey=authkey).get_server()
+        threading.Thread(
+            target=cls.server.serve_forever, name="whendo-leader", daemon=True
+        ).start()
+        os.environ[cls.address_variable] = cls.server.address
+        os.environ[cls.authkey_variable] = authkey.hex()
+        return cls.server.address
+
+    @classmethod
+    def stop(cls):
+        """
+        Stops serving; serve_forever ends once its stop_event is set.
+        """
+        stop_event = getattr(cls.server, "stop_event", None)
+        if stop_event:
+            stop_event.set()
+        cls.server = None
+
+    @classmethod
+    def exposed(cls):
+        """
+        The public methods the Dispatcher class defines, so that a method the api
+        starts to call is exposed without listing it. Workers reach neither the
+        pydantic model methods (copy, dict, json, ...) nor the private attributes.
+        """
+        return sorted(
+            name
+            for name in vars(Dispatcher)
+            if not name.startswith("_")
+            and not hasattr(BaseModel, name)
+            and callable(getattr(Dispatcher, name))
+        )
+
+    @classmethod
+    def is_configured(cls):
+        return cls.address_variable in os.environ
+
+    @classmethod
+    def connect(cls):
+        """
+        Returns a proxy of the leader's Dispatcher. Each thread calling through the
+        proxy gets its own connection, so concurrent calls stay concurrent.
+        """
+        manager = WorkerManager(
+            address=os.environ[cls.address_variable],
+            authkey=bytes.fromhex(os.environ[cls.authkey_variable]),
+        )
+        manager.connect()
+        return manager.get_dispatcher()
+
+
+class Replica:
+    """
+    A worker's copy of the leader's saved Dispatcher state, kept current through the
+    leader's change feed (see Dispatcher.changes): a daemon thread asks for the
+    changes every interval seconds, and a call forwarded to the leader asks for them
+    once it returns, so that a worker reads its own writes. The calls in reads are
+    served by the copy without a round trip to the leader; any other call is
+    forwarded to it. The copy mirrors the leader's revisions, so etags are the same
+    whichever worker serves a request.
+
+    usage (worker):
+        dispatcher = Replica(Leader.connect())
+    """
+
+    interval = 0.25
+    reads = {
+        "snapshot",
+        "peek",
+        "page",
+        "counts",
+        "current_json",
+        "get_revision",
+        "etag",
+        "cached",
+        "rendering",
+    }
+
+    def __init__(self, leader):
+        self.leader = leader
+        self.dispatcher = Dispatcher(saved_dir=leader.get_saved_dir())
+        self.dispatcher.set_timed(Timed())
+        # never writes the leader's current.json
+        self.dispatcher.set_standby("leader")
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.revision = 0
+        self.catch_up()
+        threading.Thread(target=self.follow, name="whendo-replica", daemon=True).start()
+
+    def __getattr__(self, name: str):
+        if name in self.reads:
+            return getattr(self.dispatcher, name)
+        return MethodType(forwarder(name), self)
+
+    def catch_up(self):
+        """
+        Applies the leader's changes since the last call.
+        """
+        with self.lock:
+            feed = self.leader.changes(since=self.revision, epoch=self.epoch)
+            self.epoch, self.revision = self.dispatcher.apply_changes(feed, mirror=True)
+
+    def follow(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.catch_up()
+            except Exception:
+                logger.exception("error following the leader")
+
+
+def forwarder(name: str):
+    """
+    Returns a Replica method calling the leader's method name, then catching up.
+    """
+
+    def forward(replica: Replica, *args, **kwargs):
+        try:
+            return getattr(replica.leader, name)(*args, **kwargs)
+        finally:
+            replica.catch_up()
+
+    forward.__name__ = name
+    return forward
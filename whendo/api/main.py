@@ -2,6 +2,7 @@
 This script establishes the top FastAPI path and all sub-path routers.
 It also initializes the Dispatcher for the calling ASGI server.
 """
+
 from fastapi import FastAPI
 from whendo.core.dispatcher import DispatcherSingleton
 from whendo.api.router import (
@@ -10,10 +11,15 @@ from whendo.api.router import (
     dispatcher,
     jobs,
     execution,
+    executions,
+    metrics,
+    debug,
     programs,
     servers,
 )
 from whendo.api.shared import set_dispatcher
+from whendo.api.leader import Leader, Replica
+from whendo.api import settings
 import whendo.log.init
 
 app = FastAPI()
@@ -24,12 +30,23 @@ async def root():
     return "whengo API server started"
 
 
-dispatcher_instance = DispatcherSingleton.get()
+# worker processes apply run.py's settings and read a replica of the leader's
+# Dispatcher, forwarding the other calls to it (see whendo.api.settings and
+# whendo.api.leader)
+if Leader.is_configured():
+    settings.apply(settings.exported(), leader=False)
+dispatcher_instance = (
+    Replica(Leader.connect()) if Leader.is_configured() else DispatcherSingleton.get()
+)
 
 app.include_router(set_dispatcher(actions.router, dispatcher_instance))
 app.include_router(set_dispatcher(schedulers.router, dispatcher_instance))
 app.include_router(set_dispatcher(dispatcher.router, dispatcher_instance))
 app.include_router(set_dispatcher(jobs.router, dispatcher_instance))
 app.include_router(set_dispatcher(execution.router, dispatcher_instance))
+app.include_router(execution.channel_router)
+app.include_router(set_dispatcher(executions.router, dispatcher_instance))
+app.include_router(set_dispatcher(metrics.router, dispatcher_instance))
+app.include_router(set_dispatcher(debug.router, dispatcher_instance))
 app.include_router(set_dispatcher(programs.router, dispatcher_instance))
 app.include_router(set_dispatcher(servers.router, dispatcher_instance))
@@ -5,6 +5,7 @@ It also initializes the Dispatcher for the calling ASGI server.
 This version is only used in unit testing -- the Dispatcher construction
 is different from main.py.
 """
+
 from fastapi import FastAPI
 from whendo.core.dispatcher import Dispatcher
 from whendo.core.timed import Timed
@@ -14,6 +15,9 @@ from whendo.api.router import (
     dispatcher,
     jobs,
     execution,
+    executions,
+    metrics,
+    debug,
     programs,
     servers,
 )
@@ -36,5 +40,9 @@ app.include_router(set_dispatcher(schedulers.router, dispatcher_instance))
 app.include_router(set_dispatcher(dispatcher.router, dispatcher_instance))
 app.include_router(set_dispatcher(jobs.router, dispatcher_instance))
 app.include_router(set_dispatcher(execution.router, dispatcher_instance))
+app.include_router(execution.channel_router)
+app.include_router(set_dispatcher(executions.router, dispatcher_instance))
+app.include_router(set_dispatcher(metrics.router, dispatcher_instance))
+app.include_router(set_dispatcher(debug.router, dispatcher_instance))
 app.include_router(set_dispatcher(programs.router, dispatcher_instance))
 app.include_router(set_dispatcher(servers.router, dispatcher_instance))
@@ -0,0 +1,45 @@
+import asyncio
+import functools
+from typing import Optional
+from fastapi import APIRouter, status, Depends
+from fastapi.responses import PlainTextResponse
+from whendo.api.shared import raised_exception, get_dispatcher, require_debug_token
+from whendo.core.profiler import StackSampler
+
+router = APIRouter(
+    prefix="/debug", tags=["Debug"], dependencies=[Depends(require_debug_token)]
+)
+
+
+@router.get(
+    "/profile", status_code=status.HTTP_200_OK, response_class=PlainTextResponse
+)
+async def profile(
+    seconds: float = 10.0,
+    hz: float = 100.0,
+    threads: Optional[str] = None,
+    local: bool = False,
+):
+    """
+    seconds: how long to sample (at most 60); hz: samples per second;
+    threads: a regular expression the names of the sampled threads match, e.g.
+    whendo-timed|whendo-executions; local: sample this api process rather than the
+    Dispatcher's (they differ with more than one worker)
+
+    Returns the threads' stacks in the collapsed-stack format of flamegraph tools.
+    Needs "Authorization: Bearer <token>" with the token in the server's
+    WHENDO_DEBUG_TOKEN.
+    """
+    try:
+        sample = (
+            functools.partial(StackSampler.profile, seconds, hz, threads)
+            if local
+            else functools.partial(
+                get_dispatcher(router).profile_threads, seconds, hz, threads
+            )
+        )
+        return PlainTextResponse(
+            await asyncio.get_running_loop().run_in_executor(None, sample)
+        )
+    except Exception as e:
+        raise raised_exception(f"failed to profile", e)
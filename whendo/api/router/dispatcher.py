@@ -1,87 +1,214 @@
-from fastapi import APIRouter, status, Depends
-from whendo.api.shared import return_success, raised_exception, get_dispatcher
+from typing import Optional
+from fastapi import APIRouter, status, Depends, Request
+from whendo.api.shared import (
+    read,
+    return_success,
+    raised_exception,
+    get_dispatcher,
+    mutate,
+    revisioned,
+    require_debug_token,
+)
 from whendo.core.dispatcher import Dispatcher
 from whendo.core.util import FilePathe
+from whendo.core.server import Partition
 
 router = APIRouter(prefix="/dispatcher", tags=["Dispatcher"])
 
 
 @router.get("/clear", status_code=status.HTTP_200_OK)
-def clear():
+async def clear():
     try:
-        get_dispatcher(router).clear_all()
+        await mutate(get_dispatcher(router).clear_all)
         return return_success("dispatcher cleared")
     except Exception as e:
         raise raised_exception("failed to clear the Dispatcher", e)
 
 
 @router.put("/replace", status_code=status.HTTP_200_OK)
-def replace(replacement=Depends(Dispatcher.resolve)):
+async def replace(replacement=Depends(Dispatcher.resolve)):
     try:
         assert replacement, f"couldn't resolve class for replacement dispatcher"
-        get_dispatcher(router).replace_all(replacement=replacement)
+        await mutate(get_dispatcher(router).replace_all, replacement=replacement)
         return return_success(f"dispatcher was successfully replaced")
     except Exception as e:
         raise raised_exception(f"failed to replace dispatcher", e)
 
 
 @router.get("/describe_all", status_code=status.HTTP_200_OK)
-def describe_all():
+async def describe_all(request: Request):
     try:
-        return get_dispatcher(router).describe_all()
+        return await revisioned(request, get_dispatcher(router), "describe_all")
     except Exception as e:
         raise raised_exception(f"failed to describe all dispatcher objects", e)
 
 
 @router.get("/load", status_code=status.HTTP_200_OK)
-def load():
+async def load(request: Request, fields: Optional[str] = None):
+    """
+    fields: optional comma-separated list of Dispatcher fields to return (e.g.
+    servers,scheduled_actions) instead of the whole Dispatcher
+
+    Served from memory with an ETag; send it back as If-None-Match to get a 304
+    while the Dispatcher is unchanged.
+    """
     try:
-        return return_success(get_dispatcher(router).load_current())
+        return await revisioned(
+            request, get_dispatcher(router), Dispatcher.rendering_key(fields)
+        )
     except Exception as e:
         raise raised_exception("failed to retrieve the Dispatcher", e)
 
 
+@router.get("/changes", status_code=status.HTTP_200_OK)
+async def changes(since: int = 0, epoch: Optional[str] = None):
+    """
+    since: the revision the caller has; epoch: the epoch returned with it
+
+    Returns the changes after since, or the whole saved state with resync set
+    (see Dispatcher.changes).
+    """
+    try:
+        return await read(get_dispatcher(router).changes, since=since, epoch=epoch)
+    except Exception as e:
+        raise raised_exception(f"failed to retrieve changes since ({since})", e)
+
+
 @router.get("/save", status_code=status.HTTP_200_OK)
-def save():
+async def save():
     try:
-        get_dispatcher(router).save_current()
+        await mutate(get_dispatcher(router).save_current, force=True)
         return return_success(f"dispatcher saved to current")
     except Exception as e:
         raise raised_exception("failed to save the Dispatcher", e)
 
 
 @router.get("/load_from_name/{name}", status_code=status.HTTP_200_OK)
-def load_from_name(name: str):
+async def load_from_name(name: str):
     try:
-        return return_success(get_dispatcher(router).load_from_name(name))
+        return return_success(await mutate(get_dispatcher(router).load_from_name, name))
     except Exception as e:
         raise raised_exception(f"failed to retrieve the Dispatcher from ({name})", e)
 
 
 @router.get("/save_to_name/{name}", status_code=status.HTTP_200_OK)
-def save_to_name(name: str):
+async def save_to_name(name: str):
     try:
-        get_dispatcher(router).save_to_name(name)
+        await mutate(get_dispatcher(router).save_to_name, name)
         return return_success(f"dispatcher saved to ({name})")
     except Exception as e:
         raise raised_exception(f"failed to save the Dispatcher to ({name})", e)
 
 
 @router.put("/saved_dir", status_code=status.HTTP_200_OK)
-def set_saved_dir(file_pathe: FilePathe):
+async def set_saved_dir(file_pathe: FilePathe):
     try:
         saved_dir = file_pathe.path
-        get_dispatcher(router).set_saved_dir(saved_dir)
+        await mutate(get_dispatcher(router).set_saved_dir, saved_dir)
         return return_success(f"saved_dir set to ({saved_dir})")
     except Exception as e:
         raise raised_exception("failed to set (saved_dir)", e)
 
 
 @router.get("/saved_dir", status_code=status.HTTP_200_OK)
-def get_saved_dir():
+async def get_saved_dir():
     try:
-        saved_dir = get_dispatcher(router).get_saved_dir()
+        saved_dir = await read(get_dispatcher(router).get_saved_dir)
         file_pathe = FilePathe(path=saved_dir)
         return return_success(file_pathe)
     except Exception as e:
         raise raised_exception("failed to get (saved_dir)", e)
+
+
+@router.get("/partition", status_code=status.HTTP_200_OK)
+async def get_partition():
+    try:
+        return return_success(await read(get_dispatcher(router).get_partition))
+    except Exception as e:
+        raise raised_exception("failed to get the partition", e)
+
+
+@router.put("/partition", status_code=status.HTTP_200_OK)
+async def set_partition(partition: Partition):
+    try:
+        await mutate(get_dispatcher(router).set_partition, partition=partition)
+        return return_success(f"partition set to ({partition})")
+    except Exception as e:
+        raise raised_exception("failed to set the partition", e)
+
+
+@router.delete("/partition", status_code=status.HTTP_200_OK)
+async def clear_partition():
+    try:
+        await mutate(get_dispatcher(router).set_partition, partition=None)
+        return return_success("partition cleared")
+    except Exception as e:
+        raise raised_exception("failed to clear the partition", e)
+
+
+@router.get("/partition/assignments", status_code=status.HTTP_200_OK)
+async def get_partition_assignments():
+    try:
+        return return_success(
+            await mutate(get_dispatcher(router).get_partition_assignments)
+        )
+    except Exception as e:
+        raise raised_exception("failed to get the partition assignments", e)
+
+
+@router.get("/server_health", status_code=status.HTTP_200_OK)
+async def get_server_health():
+    """
+    Returns the health of the servers as observed by ExecBest (see ServerHealth);
+    outside /servers so that it doesn't shadow a server named health.
+    """
+    try:
+        return await read(get_dispatcher(router).get_server_health)
+    except Exception as e:
+        raise raised_exception(f"failed to retrieve server health", e)
+
+
+@router.get("/lock_profile", status_code=status.HTTP_200_OK)
+async def get_lock_profile():
+    """
+    Returns the waits and holds of the Dispatcher's lock per call site, recorded
+    since the profile was last started.
+    """
+    try:
+        return return_success(await read(get_dispatcher(router).get_lock_profile))
+    except Exception as e:
+        raise raised_exception("failed to get the lock profile", e)
+
+
+@router.post(
+    "/lock_profile/start",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_debug_token)],
+)
+async def start_lock_profile():
+    """
+    Starts recording the Dispatcher's lock profile; requires the server's
+    WHENDO_DEBUG_TOKEN (see /debug).
+    """
+    try:
+        await read(get_dispatcher(router).start_lock_profile)
+        return return_success("lock profile started")
+    except Exception as e:
+        raise raised_exception("failed to start the lock profile", e)
+
+
+@router.post(
+    "/lock_profile/stop",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_debug_token)],
+)
+async def stop_lock_profile():
+    """
+    Stops recording the Dispatcher's lock profile; requires the server's
+    WHENDO_DEBUG_TOKEN.
+    """
+    try:
+        await read(get_dispatcher(router).stop_lock_profile)
+        return return_success("lock profile stopped")
+    except Exception as e:
+        raise raised_exception("failed to stop the lock profile", e)
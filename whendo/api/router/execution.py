@@ -1,16 +1,36 @@
-from fastapi import APIRouter, status, Depends
-from whendo.api.shared import return_success, raised_exception, get_dispatcher
-from whendo.core.resolver import resolve_action_rez, resolve_action
+import asyncio
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, status, Depends, Header, WebSocket, WebSocketDisconnect
+from whendo.api.shared import (
+    return_success,
+    raised_exception,
+    get_dispatcher,
+    execute_once,
+)
+from whendo.core.peer import PeerResponse
+from whendo.core.resolver import resolve_action_rez, resolve_action, resolve_rez
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/execution", tags=["Execution"])
+# websocket routes don't get a router's prefix in all fastapi versions
+channel_router = APIRouter(tags=["Execution"])
 
 
 @router.post("", status_code=status.HTTP_200_OK)
-def execute_supplied_action(supplied_action=Depends(resolve_action)):
+async def execute_supplied_action(
+    supplied_action=Depends(resolve_action),
+    idempotency_key: Optional[str] = Header(None),
+):
     try:
         assert supplied_action, f"couldn't resolve class for action ({supplied_action})"
-        return get_dispatcher(router).execute_supplied_action(
-            supplied_action=supplied_action
+        return await execute_once(
+            get_dispatcher(router),
+            idempotency_key,
+            "execute_supplied_action",
+            supplied_action=supplied_action,
         )
     except Exception as e:
         raise raised_exception(
@@ -19,7 +39,10 @@ def execute_supplied_action(supplied_action=Depends(resolve_action)):
 
 
 @router.post("/with_rez", status_code=status.HTTP_200_OK)
-def execute_supplied_action_with_rez(action_rez=Depends(resolve_action_rez)):
+async def execute_supplied_action_with_rez(
+    action_rez=Depends(resolve_action_rez),
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     The supplied action needs to be passed as an ActionRez
     """
@@ -27,11 +50,84 @@ def execute_supplied_action_with_rez(action_rez=Depends(resolve_action_rez)):
         assert action_rez, f"couldn't resolve class for action_rez ({action_rez})"
         action = action_rez.action
         rez = action_rez.rez
-        return get_dispatcher(router).execute_supplied_action_with_rez(
-            supplied_action=action, rez=rez
+        return await execute_once(
+            get_dispatcher(router),
+            idempotency_key,
+            "execute_supplied_action_with_rez",
+            supplied_action=action,
+            rez=rez,
         )
     except Exception as e:
         raise raised_exception(
             f"failed to directly execute the action embedded in ({action_rez})",
             e,
         )
+
+
+@channel_router.websocket("/execution/channel")
+async def peer_channel(websocket: WebSocket):
+    """
+    A long-lived channel carrying executions from a peer server (see
+    whendo.core.peer). Requests run concurrently on the executions executor and
+    are answered by id as they complete. Frames that aren't requests with an
+    integer id are logged and dropped; the other requests carry on.
+    """
+    await websocket.accept()
+    dispatcher = get_dispatcher(router)
+    sending = asyncio.Lock()
+    running = set()
+
+    async def respond(request_id: int, request: dict):
+        try:
+            action_name = request.get("action_name", None)
+            rez = resolve_rez(request["rez"]) if request.get("rez", None) else None
+            idempotency_key = request.get("idempotency_key", None)
+            if action_name:
+                execution = "execute_action_with_rez" if rez else "execute_action"
+                kwargs = {"action_name": action_name}
+            else:
+                action = resolve_action(request.get("action", None) or {})
+                assert action, f"couldn't resolve class for action ({request})"
+                execution = (
+                    "execute_supplied_action_with_rez"
+                    if rez
+                    else "execute_supplied_action"
+                )
+                kwargs = {"supplied_action": action}
+            if rez:
+                kwargs["rez"] = rez
+            result = await execute_once(
+                dispatcher, idempotency_key, execution, **kwargs
+            )
+            response = PeerResponse(id=request_id, rez=result)
+        except Exception as e:
+            error = raised_exception(f"failed to execute peer request", e).detail
+            response = PeerResponse(id=request_id, error=error)
+        try:
+            async with sending:
+                await websocket.send_text(response.json())
+        except Exception:
+            pass  # the peer has gone
+
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                request = json.loads(frame)
+                request_id = request.get("id", None)
+            except Exception:
+                request = request_id = None
+            if not isinstance(request_id, int):
+                logger.warning(f"peer channel: dropped a malformed request ({frame[:200]})")
+                continue
+            task = asyncio.create_task(respond(request_id, request))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # the peer has gone; its pending requests have no one to answer
+        tasks = list(running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
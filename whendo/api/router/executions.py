@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, status
+from whendo.api.shared import raised_exception, get_dispatcher, read, execute
+
+router = APIRouter(prefix="/executions", tags=["Executions"])
+
+
+@router.get("", status_code=status.HTTP_200_OK)
+async def get_executions(
+    tag: Optional[str] = None,
+    since: Optional[datetime] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    tag: e.g. scheduler:action; since: executions finished at or after this time;
+    status: success or failure; limit: at most the newest limit executions
+
+    Returns the recent executions (oldest first) kept by the server.
+    """
+    try:
+        return await read(
+            get_dispatcher(router).get_executions,
+            tag=tag,
+            since=since,
+            status=status,
+            limit=limit,
+        )
+    except Exception as e:
+        raise raised_exception(f"failed to retrieve executions", e)
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_execution_stats(
+    tag: Optional[str] = None,
+    action_name: Optional[str] = None,
+    server: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: float = 3600.0,
+):
+    """
+    tag, action_name, server, status (success or failure): filters; since, until:
+    executions finished in [since, until); bucket: seconds per bucket
+
+    Returns counts, failures and latencies (mean, max, p50, p90, p99) per bucket of
+    the executions kept in the server's history store.
+    """
+    try:
+        return await execute(
+            get_dispatcher(router).get_execution_stats,
+            tag=tag,
+            action_name=action_name,
+            server=server,
+            status=status,
+            since=since,
+            until=until,
+            bucket=bucket,
+        )
+    except Exception as e:
+        raise raised_exception(f"failed to retrieve execution stats", e)
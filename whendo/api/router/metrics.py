@@ -0,0 +1,29 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from whendo.api.shared import (
+    raised_exception,
+    get_dispatcher,
+    DispatcherExecutors,
+    read,
+)
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get(
+    "/metrics", status_code=status.HTTP_200_OK, response_class=PlainTextResponse
+)
+async def get_metrics():
+    """
+    Returns the server's metrics in the Prometheus text format: scheduler lag,
+    action durations, Lok.lock waits, saves, requests to other servers and the
+    api executors' queues.
+    """
+    try:
+        return PlainTextResponse(
+            await read(get_dispatcher(router).get_metrics)
+            + DispatcherExecutors.render_metrics(),
+            media_type="text/plain; version=0.0.4",
+        )
+    except Exception as e:
+        raise raised_exception(f"failed to render metrics", e)
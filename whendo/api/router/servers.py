@@ -1,70 +1,93 @@
 from fastapi import APIRouter, status, Depends
 from whendo.core.util import KeyTagMode
-from whendo.api.shared import return_success, raised_exception, get_dispatcher
+from whendo.api.shared import (
+    read,
+    return_success,
+    raised_exception,
+    get_dispatcher,
+    mutate,
+    execute,
+    PageParams,
+)
 from whendo.core.resolver import resolve_server, resolve_rez, resolve_action
 
 router = APIRouter(prefix="/servers", tags=["Servers"])
 
 
 @router.get("", status_code=status.HTTP_200_OK)
-def get_servers():
+async def get_servers(page: PageParams = Depends()):
     try:
-        return get_dispatcher(router).get_servers()
+        dispatcher = get_dispatcher(router)
+        if page.requested():
+            return await page.page(dispatcher, "servers")
+        return await read(dispatcher.snapshot, "servers")
     except Exception as e:
         raise raised_exception(f"failed to retrieve servers", e)
 
 
 @router.get("/{server_name}", status_code=status.HTTP_200_OK)
-def get_server(server_name: str):
+async def get_server(server_name: str):
     try:
-        server = get_dispatcher(router).get_server(server_name=server_name)
+        server = await read(get_dispatcher(router).peek, "servers", server_name)
+        assert server, f"server ({server_name}) does not exist"
         return return_success(server)
     except Exception as e:
         raise raised_exception(f"failed to retrieve the server ({server_name})", e)
 
 
 @router.post("/{server_name}", status_code=status.HTTP_200_OK)
-def add_server(server_name: str, server=Depends(resolve_server)):
+async def add_server(server_name: str, server=Depends(resolve_server)):
     try:
         assert server, f"couldn't resolve class for server ({server_name})"
-        get_dispatcher(router).add_server(server_name=server_name, server=server)
+        await mutate(
+            get_dispatcher(router).add_server, server_name=server_name, server=server
+        )
         return return_success(f"server ({server_name}) was successfully added")
     except Exception as e:
         raise raised_exception(f"failed to add server ({server_name})", e)
 
 
 @router.put("/{server_name}", status_code=status.HTTP_200_OK)
-def set_server(server_name: str, server=Depends(resolve_server)):
+async def set_server(server_name: str, server=Depends(resolve_server)):
     try:
         assert server, f"couldn't resolve class for server ({server_name})"
-        get_dispatcher(router).set_server(server_name=server_name, server=server)
+        await mutate(
+            get_dispatcher(router).set_server, server_name=server_name, server=server
+        )
         return return_success(f"server ({server_name}) was successfully updated")
     except Exception as e:
         raise raised_exception(f"failed to update server ({server_name})", e)
 
 
 @router.delete("/{server_name}", status_code=status.HTTP_200_OK)
-def delete_server(server_name: str):
+async def delete_server(server_name: str):
     try:
-        get_dispatcher(router).delete_server(server_name=server_name)
+        await mutate(get_dispatcher(router).delete_server, server_name=server_name)
         return return_success(f"server ({server_name}) was successfully deleted")
     except Exception as e:
         raise raised_exception(f"failed to delete server ({server_name})", e)
 
 
 @router.get("/{server_name}/describe", status_code=status.HTTP_200_OK)
-def describe_server(server_name: str):
+async def describe_server(server_name: str):
     try:
-        return get_dispatcher(router).describe_server(server_name=server_name)
+        server = await read(get_dispatcher(router).peek, "servers", server_name)
+        return (
+            server.description()
+            if server
+            else f"server ({server_name}) does not exist."
+        )
     except Exception as e:
         raise raised_exception(f"failed to describe program ({server_name})", e)
 
 
 @router.post("/{server_name}/add_key_tags", status_code=status.HTTP_200_OK)
-def add_server_key_tags(server_name: str, key_tags: dict):
+async def add_server_key_tags(server_name: str, key_tags: dict):
     try:
-        get_dispatcher(router).add_server_key_tags(
-            server_name=server_name, key_tags=key_tags
+        await mutate(
+            get_dispatcher(router).add_server_key_tags,
+            server_name=server_name,
+            key_tags=key_tags,
         )
         return return_success(
             f"key tags ({key_tags}) were successfully added to server ({server_name})."
@@ -76,18 +99,22 @@ def add_server_key_tags(server_name: str, key_tags: dict):
 
 
 @router.get("/{server_name}/get_tags", status_code=status.HTTP_200_OK)
-def get_server_tags(server_name: str):
+async def get_server_tags(server_name: str):
     try:
-        return get_dispatcher(router).get_server_tags(server_name=server_name)
+        server = await read(get_dispatcher(router).peek, "servers", server_name)
+        assert server, f"server ({server_name}) does not exist"
+        return server.tags
     except Exception as e:
         raise raised_exception(f"failed to retrieve tags for server ({server_name})", e)
 
 
 @router.post("/by_tags/{mode}", status_code=status.HTTP_200_OK)
-def get_servers_by_tags(mode: str, key_tags: dict):
+async def get_servers_by_tags(mode: str, key_tags: dict):
     try:
-        return get_dispatcher(router).get_servers_by_tags(
-            key_tags=key_tags, key_tag_mode=KeyTagMode(mode)
+        return await mutate(
+            get_dispatcher(router).get_servers_by_tags,
+            key_tags=key_tags,
+            key_tag_mode=KeyTagMode(mode),
         )
     except Exception as e:
         raise raised_exception(
@@ -98,10 +125,12 @@ def get_servers_by_tags(mode: str, key_tags: dict):
 @router.get(
     "/{server_name}/actions/{action_name}/execute", status_code=status.HTTP_200_OK
 )
-def execute_on_server(server_name: str, action_name: str):
+async def execute_on_server(server_name: str, action_name: str):
     try:
-        return get_dispatcher(router).execute_on_server(
-            server_name=server_name, action_name=action_name
+        return await execute(
+            get_dispatcher(router).execute_on_server,
+            server_name=server_name,
+            action_name=action_name,
         )
     except Exception as e:
         raise raised_exception(
@@ -113,12 +142,15 @@ def execute_on_server(server_name: str, action_name: str):
     "/{server_name}/actions/{action_name}/execute_with_rez",
     status_code=status.HTTP_200_OK,
 )
-def execute_on_server_with_rez(
+async def execute_on_server_with_rez(
     server_name: str, action_name: str, rez=Depends(resolve_rez)
 ):
     try:
-        return get_dispatcher(router).execute_on_server_with_rez(
-            server_name=server_name, action_name=action_name, rez=rez
+        return await execute(
+            get_dispatcher(router).execute_on_server_with_rez,
+            server_name=server_name,
+            action_name=action_name,
+            rez=rez,
         )
     except Exception as e:
         raise raised_exception(
@@ -130,9 +162,10 @@ def execute_on_server_with_rez(
 @router.post(
     "/by_tags/{mode}/actions/{action_name}/execute", status_code=status.HTTP_200_OK
 )
-def execute_on_servers(action_name: str, mode: str, key_tags: dict):
+async def execute_on_servers(action_name: str, mode: str, key_tags: dict):
     try:
-        return get_dispatcher(router).execute_on_servers(
+        return await execute(
+            get_dispatcher(router).execute_on_servers,
             action_name=action_name,
             key_tags=key_tags,
             key_tag_mode=KeyTagMode(mode),
@@ -147,13 +180,14 @@ def execute_on_servers(action_name: str, mode: str, key_tags: dict):
     "/by_tags/{mode}/actions/{action_name}/execute_with_rez",
     status_code=status.HTTP_200_OK,
 )
-def execute_on_servers_with_rez(
+async def execute_on_servers_with_rez(
     action_name: str, mode: str, rez_dict=Depends(resolve_action)
 ):
     try:
         rez = rez_dict.rez
         key_tags = rez_dict.dictionary
-        return get_dispatcher(router).execute_on_servers_with_rez(
+        return await execute(
+            get_dispatcher(router).execute_on_servers_with_rez,
             action_name=action_name,
             key_tags=key_tags,
             key_tag_mode=KeyTagMode(mode),
@@ -0,0 +1,98 @@
+"""
+The server's settings from run.py's command line.
+
+run.py applies them in its own process. With more than one worker it also exports
+them to the environment, which the uvicorn workers inherit, and each worker applies
+them when it imports whendo.api.main. The execution history store and the lock
+profile stay with the leader: workers forward every execution to the leader's
+Dispatcher (see whendo.api.leader), so they neither record executions nor hold
+Lok.lock.
+
+usage:
+    settings.apply(vars(args))
+    settings.export(vars(args))  # before starting the workers
+    settings.apply(settings.exported(), leader=False)  # in each worker
+"""
+
+import json
+import os
+from typing import Optional
+
+variable = "WHENDO_SETTINGS"
+
+
+def apply(settings: dict, leader: bool = True):
+    """
+    initialize shared server information
+    """
+    import whendo.core.util as util
+
+    util.SystemInfo.init(host=settings["host"], port=settings["port"])
+
+    """
+    bound the chains of action results (0: unbounded; see Rez)
+    """
+    util.Rez.max_depth = settings["max_rez_depth"] or None
+
+    """
+    optionally log 1 in N action results and at most R per second per tag, with
+    periodic summaries (see whendo.log.sampling)
+    """
+    from whendo.log.sampling import LogSampling
+
+    LogSampling.configure(
+        sample_every=settings["sample_every"],
+        rate_limit=settings["rate_limit"],
+        summary_interval=settings["summary_interval"],
+    )
+
+    """
+    optionally carry remote executions over one WebSocket per peer server (see
+    whendo.core.peer); needs the websockets package
+    """
+    if settings["peer_channel"]:
+        from whendo.core.peer import PeerChannels
+
+        PeerChannels.enable()
+
+    """
+    optionally have action results carry their actions' full info rather than a
+    reference (see Action.rez_info)
+    """
+    if settings["full_rez_info"]:
+        from whendo.core.action import Action
+
+        Action.full_rez_info = True
+
+    if not leader:
+        return
+
+    """
+    optionally keep the execution history in a local SQLite database under the
+    saved directory (see whendo.core.history_store)
+    """
+    if settings["history_store"]:
+        from whendo.core.history_store import HistoryStore
+
+        HistoryStore.enable(
+            server=f"{settings['host']}:{settings['port']}",
+            retention_days=settings["retention_days"],
+        )
+
+    """
+    optionally profile the Dispatcher's lock per call site from the start (see
+    Lok.start_profile; also started and stopped through /dispatcher/lock_profile)
+    """
+    if settings["profile_lock"]:
+        from whendo.core.dispatcher import Lok
+
+        Lok.start_profile()
+
+
+def export(settings: dict):
+    os.environ[variable] = json.dumps(settings)
+
+
+def exported() -> Optional[dict]:
+    value = os.environ.get(variable, None)
+    return json.loads(value) if value else None
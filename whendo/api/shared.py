@@ -1,8 +1,20 @@
 """
 This code in this module is used in FastAPI and APIRouter code.
 """
-from fastapi import status, HTTPException, APIRouter
+
+import asyncio
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseProxy
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Optional
+from fastapi import status, HTTPException, APIRouter, Header, Query, Request, Response
+from fastapi.responses import JSONResponse
+from whendo.api.leader import Replica
 from whendo.core.dispatcher import Dispatcher
+from whendo.core.exception import StandbyException
+from whendo.core.metrics import Gauge, Registry
 from whendo.core.util import Now
 
 
@@ -15,10 +27,54 @@ def return_success(obj: object):
 
 def raised_exception(text: str, exception: Exception):
     """
-    for exception reporting
+    for exception reporting; HTTPExceptions (e.g. a busy executor) pass through and
+    changes asked of a standby are unavailable, naming the leader to ask instead
     """
+    if isinstance(exception, HTTPException):
+        return exception
     status_code = status.HTTP_400_BAD_REQUEST
     detail = {"outcome": text, "exception": str(exception), "time": Now.s()}
+    if isinstance(exception, StandbyException):
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        detail["leader"] = exception.leader
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+debug_token_variable = "WHENDO_DEBUG_TOKEN"
+
+
+def require_debug_token(authorization: Optional[str] = Header(None)):
+    """
+    A dependency of the debug endpoints: they exist only if the server's environment
+    holds a token in WHENDO_DEBUG_TOKEN, and answer requests carrying it as
+    "Authorization: Bearer <token>".
+    """
+    token = os.environ.get(debug_token_variable, "")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"outcome": "debug endpoints are disabled", "time": Now.s()},
+        )
+    scheme, _, supplied = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        supplied.strip().encode(), token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={"outcome": "missing or wrong debug token", "time": Now.s()},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def busy_exception(executor_name: str):
+    """
+    for requests turned away by a full executor
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = {
+        "outcome": f"executor ({executor_name}) is at capacity; retry later",
+        "time": Now.s(),
+    }
     return HTTPException(status_code=status_code, detail=detail)
 
 
@@ -30,3 +86,231 @@ def get_dispatcher(router: APIRouter):
 def set_dispatcher(router: APIRouter, dispatcher: Dispatcher):
     router.__dict__["_dispatcher"] = dispatcher
     return router
+
+
+class PageParams:
+    """
+    Query parameters of the inventory list endpoints (see Dispatcher.page), e.g.
+
+        GET /actions?prefix=pump_&limit=50&after=pump_17&fields=class,marker
+
+    fields is a comma-separated list. Without any of these parameters the endpoints
+    return the whole collection as before.
+    """
+
+    def __init__(
+        self,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        prefix: Optional[str] = None,
+        class_name: Optional[str] = None,
+        fields: Optional[str] = None,
+        names_only: bool = False,
+    ):
+        self.after = after
+        self.limit = limit
+        self.prefix = prefix
+        self.class_name = class_name
+        self.fields = fields.split(",") if fields else None
+        self.names_only = names_only
+
+    def requested(self):
+        return any(
+            [
+                self.after,
+                self.limit,
+                self.prefix,
+                self.class_name,
+                self.fields,
+                self.names_only,
+            ]
+        )
+
+    async def page(self, dispatcher: Dispatcher, collection: str):
+        return await read(
+            dispatcher.page,
+            collection=collection,
+            after=self.after,
+            limit=self.limit,
+            prefix=self.prefix,
+            class_name=self.class_name,
+            fields=self.fields,
+            names_only=self.names_only,
+        )
+
+
+class BoundedExecutor:
+    """
+    A thread pool with a bounded number of admitted calls (running plus waiting).
+    Async endpoints await blocking Dispatcher calls here instead of in Starlette's
+    shared threadpool. Calls beyond the bound are rejected with a 503 rather than
+    queued without limit. A call stays admitted until its worker is done with it,
+    even when its request is cancelled (e.g. the client disconnected): cancelling
+    doesn't stop a running worker.
+
+    usage:
+        result = await executor.run(dispatcher.add_action, action_name=name, action=action)
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queued: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"whendo-{name}"
+        )
+        self.admitted = BoundedSemaphore(max_workers + max_queued)
+        self.lock = Lock()  # guards in_flight
+        self.in_flight = 0  # admitted calls, running or waiting
+
+    async def run(self, callable: Callable, *args, **kwargs):
+        if not self.admitted.acquire(blocking=False):
+            raise busy_exception(self.name)
+        with self.lock:
+            self.in_flight += 1
+        try:
+            future = self.pool.submit(callable, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        # a call cancelled while waiting for a worker is dropped and released too
+        future.add_done_callback(self.release)
+        return await asyncio.wrap_future(future)
+
+    def release(self, future=None):
+        with self.lock:
+            self.in_flight -= 1
+        self.admitted.release()
+
+    def queued(self):
+        """
+        The admitted calls waiting for a worker.
+        """
+        with self.lock:
+            return max(self.in_flight - self.max_workers, 0)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+class DispatcherExecutors:
+    """
+    The executors used by the routers:
+
+        mutations: changes to and lock-holding reads of Dispatcher state. One
+                   worker, since these calls serialize on Lok.lock anyway.
+        executions: action executions, local or remote.
+
+    Read-only endpoints use Dispatcher.snapshot and Dispatcher.peek and run
+    directly on the event loop.
+
+    usage:
+        DispatcherExecutors.configure(execution_workers=16)
+    """
+
+    mutations = BoundedExecutor(name="mutations", max_workers=1, max_queued=256)
+    executions = BoundedExecutor(name="executions", max_workers=8, max_queued=256)
+    metrics = Registry()
+    in_flight = metrics.register(
+        Gauge(
+            "whendo_executor_in_flight",
+            "Calls admitted to an api executor, running or waiting.",
+            label_name="executor",
+        )
+    )
+    queue_depth = metrics.register(
+        Gauge(
+            "whendo_executor_queue_depth",
+            "Calls waiting for a worker of an api executor.",
+            label_name="executor",
+        )
+    )
+
+    @classmethod
+    def configure(
+        cls,
+        mutation_queued: int = 256,
+        execution_workers: int = 8,
+        execution_queued: int = 256,
+    ):
+        cls.mutations.shutdown()
+        cls.executions.shutdown()
+        cls.mutations = BoundedExecutor(
+            name="mutations", max_workers=1, max_queued=mutation_queued
+        )
+        cls.executions = BoundedExecutor(
+            name="executions",
+            max_workers=execution_workers,
+            max_queued=execution_queued,
+        )
+
+    @classmethod
+    def render_metrics(cls):
+        """
+        The executors' metrics in the Prometheus text format. They belong to this
+        api process, while the Dispatcher's may belong to the leader.
+        """
+        for executor in (cls.mutations, cls.executions):
+            cls.in_flight.set(executor.in_flight, executor.name)
+            cls.queue_depth.set(executor.queued(), executor.name)
+        return cls.metrics.render()
+
+
+async def mutate(callable: Callable, *args, **kwargs):
+    return await DispatcherExecutors.mutations.run(callable, *args, **kwargs)
+
+
+async def execute(callable: Callable, *args, **kwargs):
+    return await DispatcherExecutors.executions.run(callable, *args, **kwargs)
+
+
+async def read(callable: Callable, *args, **kwargs):
+    """
+    Runs a Dispatcher read that doesn't wait on Lok.lock (e.g. snapshot, peek,
+    changes) on the event loop. A worker's Replica serves the reads of the saved
+    state the same way; the reads it forwards to the leader (see whendo.api.leader)
+    are blocking round trips, so they run on the executions executor.
+    """
+    if isinstance(getattr(callable, "__self__", None), (BaseProxy, Replica)):
+        return await execute(callable, *args, **kwargs)
+    return callable(*args, **kwargs)
+
+
+async def execute_once(
+    dispatcher: Dispatcher, idempotency_key: Optional[str], execution: str, **kwargs
+):
+    """
+    Runs the Dispatcher execution method (e.g. execute_action) on the executions
+    executor; at most once per idempotency key if the request supplied one (see
+    Dispatcher.execute_idempotently).
+    """
+    if idempotency_key:
+        return await execute(
+            dispatcher.execute_idempotently, idempotency_key, execution, **kwargs
+        )
+    return await execute(getattr(dispatcher, execution), **kwargs)
+
+
+async def revisioned(request: Request, dispatcher: Dispatcher, key: str):
+    """
+    Serves a rendering of the saved Dispatcher state (see Dispatcher.rendering) with
+    its ETag. A request whose If-None-Match holds the current ETag gets a 304
+    without touching the Dispatcher or its lock. String renderings are sent as
+    already-serialized json.
+    """
+    etag = await read(dispatcher.etag)
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [
+        tag.strip() for tag in if_none_match.split(",")
+    ]:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    etag, content = await read(dispatcher.cached, key) or await mutate(
+        dispatcher.rendering, key
+    )
+    if isinstance(content, str):
+        return Response(
+            content=content, media_type="application/json", headers={"ETag": etag}
+        )
+    return JSONResponse(content=content, headers={"ETag": etag})
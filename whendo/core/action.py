@@ -1,17 +1,27 @@
+from contextvars import ContextVar
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
-from logging import Logger, getLogger
+from typing import Dict, Any, Optional, Tuple, ClassVar
+from logging import Logger, getLogger, INFO
 from .util import object_info, SystemInfo, Rez
+from whendo.log.sampling import LogSampling
 
 
 logger = getLogger(__name__)
 
+# the action a Plan is running and its reference; see Action.rez_info and Plan.run
+plan_reference: ContextVar = ContextVar("plan_reference", default=None)
+# the non-meta field names of each Action subclass; see Action.field_names
+action_field_names: Dict[type, Tuple[str, ...]] = {}
+
 
 class Action(BaseModel):
     """
     Actions get something done.
     """
 
+    # whether results carry the action's full info() rather than a reference
+    full_rez_info: ClassVar[bool] = False
+
     def description(self):
         return "This has no description."
 
@@ -21,6 +31,19 @@ class Action(BaseModel):
     def info(self):
         return object_info(self)
 
+    def rez_info(self):
+        """
+        The info of this action's results: a reference to the action (its class, and
+        if it is part of a stored action, the action name, plan step and hash), or
+        the full info() if full_rez_info is set.
+        """
+        if self.full_rez_info:
+            return self.info()
+        running = plan_reference.get()
+        if running and running[0] is self and running[1]:
+            return running[1]
+        return {"class": f"{self.__class__.__module__}.{self.__class__.__name__}"}
+
     def flat(self):
         return self.json()
 
@@ -44,23 +67,35 @@ class Action(BaseModel):
         """
         Return only non-meta fields.
         """
-        return set(
-            name for name in self.__fields__ if self.__fields__[name].default != name
-        )
+        return frozenset(self.field_names())
+
+    @classmethod
+    def field_names(cls):
+        """
+        The non-meta field names of this class, in declaration order; computed once
+        per class.
+        """
+        names = action_field_names.get(cls, None)
+        if names is None:
+            names = action_field_names[cls] = tuple(
+                name for name in cls.__fields__ if cls.__fields__[name].default != name
+            )
+        return names
 
     def field_values(self):
-        return {
-            f: self.__dict__[f] for f in self.fields() if self.__dict__[f] is not None
-        }
+        values = self.__dict__
+        return {f: values[f] for f in self.field_names() if values[f] is not None}
 
     def compute_flds(self, rez: Rez = None):
-        field_values = self.field_values()
-        if rez and rez.flds:
-            rez_flds = rez.flds.copy()
-            rez_flds.update(field_values)
-            return rez_flds
-        else:
-            return field_values
+        """
+        Returns the non-None field values over the supplied rez.flds.
+        """
+        rez_flds = rez.flds.copy() if rez and rez.flds else {}
+        values = self.__dict__
+        for name in self.field_names():
+            if values[name] is not None:
+                rez_flds[name] = values[name]
+        return rez_flds
 
     def action_result(
         self,
@@ -75,20 +110,65 @@ class Action(BaseModel):
             flds=flds,
             rez=rez,
             extra=extra,
-            info=info if info else self.info(),
+            info=info if info else self.rez_info(),
         )
 
 
+result_format = "CLASS (%s) TAG (%s) ACTION (%s) RESULT (%s)"
+
+
 def log_action_result(
     calling_logger: Logger,
     calling_object: Any,
     action: Action,
     result: Rez,
     tag: str = None,
+    duration: Optional[float] = None,
 ):
-    calling_logger.info(
-        f"CLASS ({calling_object.__class__.__name__}) TAG ({tag}) ACTION ({action}) RESULT ({result.flatten_results() if result else None})"
-    )
+    """
+    Logs an action's result; duration is the time its execution took, measured for
+    a job's result (Executor.push). Subject to LogSampling: a job's result is
+    counted and sampled, the results within it follow its decision.
+    """
+    if not calling_logger.isEnabledFor(INFO):
+        return
+    args = (calling_object.__class__.__name__, tag, action, FlatResults(result))
+    extra = {"tag": tag, "action": action, "rez": result}
+    if LogSampling.enabled:
+        if duration is not None:
+            admitted = LogSampling.admit(tag, duration)
+            LogSampling.release(admitted)
+            if not admitted:
+                return
+        elif LogSampling.holding():
+            record = calling_logger.makeRecord(
+                calling_logger.name,
+                INFO,
+                "(unknown file)",
+                0,
+                result_format,
+                args,
+                None,
+                extra=extra,
+            )
+            LogSampling.hold(calling_logger, record)
+            return
+    calling_logger.info(result_format, *args, extra=extra)
+
+
+class FlatResults:
+    """
+    Renders result.flatten_results() when the log record is formatted rather than
+    when it is logged.
+    """
+
+    __slots__ = ("result",)
+
+    def __init__(self, result: Optional[Rez]):
+        self.result = result
+
+    def __str__(self):
+        return str(self.result.flatten_results() if self.result else None)
 
 
 class ActionRez(Action):
@@ -0,0 +1,149 @@
+import json
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional
+from pydantic import PrivateAttr
+from whendo.core.action import Action, Rez, log_action_result
+from whendo.core.util import ResultCache, SystemInfo
+from whendo.core.history import execute_recorded
+
+logger = logging.getLogger(__name__)
+
+
+class ActionCaches:
+    """
+    The caches of this process's Cached actions, one for each distinct Cached
+    definition, so that copies of a Cached action (e.g. in different lists) share
+    their results. At most max_caches are kept, the least recently used going first,
+    so that replaced definitions don't accumulate.
+    """
+
+    caches: Dict[str, ResultCache] = OrderedDict()
+    max_caches = 256
+    lock = Lock()
+
+    @classmethod
+    def get(cls, label: str, max_size: int, ttl: float) -> ResultCache:
+        with cls.lock:
+            cache = cls.caches.get(label, None)
+            if cache is None:
+                cache = cls.caches[label] = ResultCache(max_size=max_size, ttl=ttl)
+                while len(cls.caches) > cls.max_caches:
+                    cls.caches.popitem(last=False)
+            else:
+                cls.caches.move_to_end(label)
+            return cache
+
+    @classmethod
+    def info(cls):
+        with cls.lock:
+            caches = list(cls.caches.items())
+        return {label: cache.info() for label, cache in caches}
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.caches.clear()
+
+
+class Cached(Action):
+    """
+    Memoizes the Rez of action for ttl seconds, keyed on the values of key_flds in
+    the supplied rez.flds (all of rez.flds if key_flds is not provided); each call gets
+    the Rez action returned, flds and extra included, chained to the rez it supplied,
+    so a hit looks like a miss downstream. At most max_size results are kept, the
+    least recently used going first. With stale_while_revalidate, an expired
+    result is returned at once while action is re-executed in the background.
+
+    Lookups are counted in SystemInfo (cache_hits, cache_stale_hits, cache_misses).
+    Exceptions aren't cached.
+
+    The definition's cache is found by its json, serialized on the first execution
+    and again after a field is assigned; changes within action itself aren't noticed.
+    """
+
+    cached: str = "cached"
+    action: Action
+    ttl: float = 60.0
+    max_size: int = 64
+    key_flds: Optional[List[str]] = None
+    stale_while_revalidate: Optional[bool] = None
+    _label: Optional[str] = PrivateAttr(default=None)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.__fields__:
+            self._label = None
+
+    def label(self):
+        """
+        the name of this definition's cache in ActionCaches
+        """
+        label = self._label
+        if label is None:
+            label = self._label = self.json()
+        return label
+
+    def description(self):
+        return f"This action memoizes the result of ({self.action}) for ({self.ttl}) seconds, keyed on the rez flds ({self.key_flds if self.key_flds else 'all'})."
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        flds = self.compute_flds(rez=rez)
+        action = flds["action"]
+        rez_flds = rez.flds if rez and rez.flds else {}
+        key_flds = flds.get("key_flds", None)
+        if key_flds is not None:
+            rez_flds = {fld: rez_flds.get(fld, None) for fld in key_flds}
+        key = json.dumps(rez_flds, sort_keys=True, default=str)
+        cache = ActionCaches.get(self.label(), max_size=self.max_size, ttl=self.ttl)
+
+        def compute():
+            result = execute_recorded(action, tag=tag, rez=rez)
+            log_action_result(
+                calling_logger=logger,
+                calling_object=self,
+                tag=tag,
+                action=action,
+                result=result,
+            )
+            if not isinstance(result, Rez):
+                result = self.action_result(
+                    result=result, rez=rez, flds=rez.flds if rez else {}
+                )
+            return (result, rez)
+
+        (result, supplied), outcome = cache.fetch(
+            key,
+            compute,
+            stale_while_revalidate=flds.get("stale_while_revalidate", None) or False,
+        )
+        SystemInfo.increment_cache_count(outcome)
+        return rechain(result, supplied, rez)
+
+
+def rechain(result: Rez, supplied: Optional[Rez], rez: Optional[Rez]):
+    """
+    Returns the cached result of an execution that was supplied supplied, as if rez
+    had been supplied instead: the results chained above supplied are rebuilt on top
+    of rez. A result whose chain doesn't reach supplied is returned as is.
+    """
+    if supplied is rez:
+        return result
+    links = []
+    link = result
+    while link is not None and link is not supplied:
+        links.append(link)
+        link = link.rez
+    if link is None and supplied is not None:
+        return result
+    below = rez
+    for link in reversed(links):
+        below = Rez(
+            result=link.result,
+            flds=link.flds,
+            extra=link.extra,
+            info=link.info,
+            rez=below,
+        )
+    return below
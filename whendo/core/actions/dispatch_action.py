@@ -1,10 +1,15 @@
 import logging
+import time
 from typing import Optional, Dict, Set, Any
-from whendo.core.util import Now, Http, KeyTagMode, DateTime2, DateTime
+from uuid import uuid4
+from whendo.core.util import Now, KeyTagMode, DateTime2, DateTime
 from whendo.core.hooks import DispatcherHooks
-from whendo.core.action import Action, ActionRez, Rez, log_action_result
-from whendo.core.resolver import resolve_rez, resolve_action
-
+from whendo.core.action import Action, Rez, log_action_result
+from whendo.core.resolver import resolve_action
+from whendo.core.peer import Peer
+from whendo.core.actions.sys_action import SysInfo
+from whendo.core.timed import Timed
+from whendo.core.history import invocation
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,20 @@ class DispatcherAction(Action):
     methods directly by way of the class, DispatcherHooks.
     """
 
+    def invocation_key(self, idempotency_key: Optional[str]):
+        """
+        Derives the key of one invocation from an action's idempotency_key and the
+        time its job was scheduled for or, outside jobs, the invocation it's part of
+        (see whendo.core.history.invocation): repeats and hedges within a firing or
+        an api call share the key while each firing or call executes.
+        """
+        if idempotency_key is None:
+            return None
+        fired = Timed.fire_time()
+        if fired is not None:
+            return f"{idempotency_key}:{fired.isoformat()}"
+        return f"{idempotency_key}:{invocation.get() or uuid4().hex}"
+
 
 class ScheduleProgram(DispatcherAction):
     program_name: Optional[str] = None
@@ -245,11 +264,13 @@ class ClearAllScheduling(DispatcherAction):
 
 class Exec(DispatcherAction):
     """
-    Execute an action at a server.
+    Execute an action at a server. Executions at another server of the same firing
+    (see DispatcherAction.invocation_key) run once while the server keeps the result.
     """
 
     server_name: Optional[str] = None
     action_name: Optional[str] = None
+    idempotency_key: Optional[str] = None
     exec: str = "exec"
 
     def description(self):
@@ -259,6 +280,7 @@ class Exec(DispatcherAction):
         flds = self.compute_flds(rez=rez)
         server_name = flds.get("server_name", None)
         action_name = flds.get("action_name", None)
+        idempotency_key = self.invocation_key(flds.get("idempotency_key", None))
         if action_name == None:
             raise ValueError(f"action name missing")
         if server_name == None:
@@ -284,10 +306,9 @@ class Exec(DispatcherAction):
                     result=result,
                 )
             else:
-                response = Http(host=host, port=port).post(
-                    f"/actions/{action_name}/execute", rez
+                result = Peer(host=host, port=port).execute_action(
+                    action_name, rez=rez, idempotency_key=idempotency_key
                 )
-                result = resolve_rez(response)
         else:
             if is_local:
                 # execute locally
@@ -301,10 +322,9 @@ class Exec(DispatcherAction):
                     result=result,
                 )
             else:
-                response = Http(host=server.host, port=server.port).get(
-                    f"/actions/{action_name}/execute"
+                result = Peer(host=host, port=port).execute_action(
+                    action_name, idempotency_key=idempotency_key
                 )
-                result = resolve_rez(response)
 
         return self.action_result(result=result, rez=rez, flds=rez.flds if rez else {})
 
@@ -355,10 +375,8 @@ class ExecKeyTags(DispatcherAction):
                         result=action_rez,
                     )
                 else:
-                    response = Http(host=server.host, port=server.port).post(
-                        f"/actions/{action_name}/execute", rez
-                    )
-                    result.append(resolve_rez(response))
+                    peer = Peer(host=server.host, port=server.port)
+                    result.append(peer.execute_action(action_name, rez=rez))
         else:
             for server in servers:
                 if (
@@ -377,20 +395,144 @@ class ExecKeyTags(DispatcherAction):
                         result=action_rez,
                     )
                 else:
-                    response = Http(host=server.host, port=server.port).get(
-                        f"/actions/{action_name}/execute"
-                    )
-                    result.append(resolve_rez(response))
+                    peer = Peer(host=server.host, port=server.port)
+                    result.append(peer.execute_action(action_name))
+        return self.action_result(result=result, rez=rez, flds=rez.flds if rez else {})
+
+
+class ExecBest(DispatcherAction):
+    """
+    Execute an action at one of the servers satisfying key_tags (any server if key_tags
+    is not provided). Servers are tried best first by observed latency, error rate and
+    load (see ServerHealth), failing over to the next on error, at most attempts times.
+    """
+
+    action_name: Optional[str] = None
+    key_tags: Optional[Dict[str, Set[str]]] = None
+    key_tag_mode: Optional[KeyTagMode] = None
+    attempts: Optional[int] = None
+    exec_best: str = "exec_best"
+
+    def description(self):
+        return f"This action executes ({self.action_name}) at the best of the servers with key:tags satisfying ({self.key_tags}) using key tag mode ({self.key_tag_mode}), failing over at most ({self.attempts}) times."
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        flds = self.compute_flds(rez=rez)
+        action_name = flds.get("action_name", None)
+        if action_name == None:
+            raise ValueError(f"action name missing")
+        key_tags = flds.get("key_tags", None)
+        key_tag_mode = flds.get("key_tag_mode", None) or KeyTagMode.ANY
+        attempts = flds.get("attempts", None)
+
+        servers = DispatcherHooks.rank_servers(
+            key_tags=key_tags, key_tag_mode=key_tag_mode
+        )
+        if len(servers) == 0:
+            raise ValueError(f"no servers satisfy key:tags ({key_tags})")
+        health = DispatcherHooks.get_server_health()
+        failures = {}
+        for server_name, server in servers[:attempts]:
+            start = time.perf_counter()
+            try:
+                result = self.execute_at(server, action_name, tag=tag, rez=rez)
+            except Exception as exception:
+                health.record_call(
+                    server_name, latency=time.perf_counter() - start, ok=False
+                )
+                failures[server_name] = str(exception)
+                logger.warning(
+                    f"action ({action_name}) failed at server ({server_name}); failing over",
+                    exc_info=exception,
+                )
+                continue
+            health.record_call(
+                server_name, latency=time.perf_counter() - start, ok=True
+            )
+            return self.action_result(
+                result=result,
+                rez=rez,
+                flds=rez.flds if rez else {},
+                extra={"server_name": server_name, "failures": failures},
+            )
+        raise ValueError(f"action ({action_name}) failed at servers ({failures})")
+
+    def execute_at(self, server, action_name: str, tag: str = None, rez: Rez = None):
+        if server.host == self.local_host() and server.port == self.local_port():
+            # execute locally
+            action = DispatcherHooks.get_action(action_name)
+            result = action.execute(tag=tag, rez=rez)
+            log_action_result(
+                calling_logger=logger,
+                calling_object=self,
+                tag=tag,
+                action=action,
+                result=result,
+            )
+            return result
+        return Peer(host=server.host, port=server.port).execute_action(
+            action_name, rez=rez
+        )
+
+
+class ProbeServers(DispatcherAction):
+    """
+    Refresh the Dispatcher's server health (see ServerHealth) with the load_avg that
+    SysInfo reports at each of the servers satisfying key_tags (all servers if key_tags
+    is not provided). Schedule it to keep ExecBest's choices current.
+    """
+
+    key_tags: Optional[Dict[str, Set[str]]] = None
+    key_tag_mode: Optional[KeyTagMode] = None
+    probe_servers: str = "probe_servers"
+
+    def description(self):
+        return f"This action probes the load of the servers with key:tags satisfying ({self.key_tags}) using key tag mode ({self.key_tag_mode})."
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        flds = self.compute_flds(rez=rez)
+        key_tags = flds.get("key_tags", None)
+        key_tag_mode = flds.get("key_tag_mode", None) or KeyTagMode.ANY
+
+        health = DispatcherHooks.get_server_health()
+        result = {}
+        for server_name, server in DispatcherHooks.rank_servers(
+            key_tags=key_tags, key_tag_mode=key_tag_mode
+        ):
+            start = time.perf_counter()
+            try:
+                if (
+                    server.host == self.local_host()
+                    and server.port == self.local_port()
+                ):
+                    info = SysInfo().execute(tag=tag)
+                else:
+                    peer = Peer(host=server.host, port=server.port)
+                    info = peer.execute_supplied_action(SysInfo())
+                load_avg = info.result["load_avg"]
+            except Exception as exception:
+                health.record_call(
+                    server_name, latency=time.perf_counter() - start, ok=False
+                )
+                result[server_name] = str(exception)
+                continue
+            health.record_call(
+                server_name, latency=time.perf_counter() - start, ok=True
+            )
+            health.record_load(server_name, load_avg)
+            result[server_name] = load_avg
         return self.action_result(result=result, rez=rez, flds=rez.flds if rez else {})
 
 
 class ExecSupplied(DispatcherAction):
     """
-    Execute an action at a server.
+    Execute an action at a server. Executions at another server of the same firing
+    (see DispatcherAction.invocation_key) run once while the server keeps the result.
     """
 
     server_name: Optional[str] = None
     action: Optional[Action] = None
+    idempotency_key: Optional[str] = None
     exec_supplied: str = "exec_supplied"
 
     def description(self):
@@ -405,6 +547,7 @@ class ExecSupplied(DispatcherAction):
             raise ValueError(f"action missing")
         if isinstance(action, dict):
             action = resolve_action(action)
+        idempotency_key = self.invocation_key(flds.get("idempotency_key", None))
         server_name = flds.get("server_name", None)
         if server_name == None:
             host = self.local_host()
@@ -427,11 +570,10 @@ class ExecSupplied(DispatcherAction):
                     result=result,
                 )
             else:
-                action_rez = ActionRez(action=action, rez=rez)
-                response = Http(host=host, port=port).post(
-                    f"/execution/with_rez", action_rez
+                peer = Peer(host=host, port=port)
+                result = peer.execute_supplied_action(
+                    action, rez=rez, idempotency_key=idempotency_key
                 )
-                result = resolve_rez(response)
         else:
             if is_local:
                 # execute locally
@@ -444,10 +586,9 @@ class ExecSupplied(DispatcherAction):
                     result=result,
                 )
             else:
-                response = Http(host=server.host, port=server.port).post(
-                    f"/execution", action
+                result = Peer(host=host, port=port).execute_supplied_action(
+                    action, idempotency_key=idempotency_key
                 )
-                result = resolve_rez(response)
         return self.action_result(result=result, rez=rez, flds=rez.flds if rez else {})
 
 
@@ -497,11 +638,8 @@ class ExecSuppliedKeyTags(DispatcherAction):
                         result=action_rez,
                     )
                 else:
-                    action_rez = ActionRez(action=action, rez=rez)
-                    response = Http(host=server.host, port=server.port).post(
-                        f"/execution/with_rez", action_rez
-                    )
-                    result.append(resolve_rez(response))
+                    peer = Peer(host=server.host, port=server.port)
+                    result.append(peer.execute_supplied_action(action, rez=rez))
         else:
             for server in servers:
                 if (
@@ -519,10 +657,8 @@ class ExecSuppliedKeyTags(DispatcherAction):
                         result=action_rez,
                     )
                 else:
-                    response = Http(host=server.host, port=server.port).post(
-                        f"/execution", action
-                    )
-                    result.append(resolve_rez(response))
+                    peer = Peer(host=server.host, port=server.port)
+                    result.append(peer.execute_supplied_action(action))
         return self.action_result(result=result, rez=rez, flds=rez.flds if rez else {})
 
 
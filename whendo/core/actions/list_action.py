@@ -1,10 +1,15 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from enum import Enum
 import json
 import logging
 from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import copy_context
+from threading import BoundedSemaphore
+from time import monotonic
 from whendo.core.action import Action, Rez, log_action_result
 from whendo.core.exception import TerminateSchedulerException
+from whendo.core.history import execute_recorded
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +33,14 @@ def processing_results(
     }
 
 
+def execute_child(position: int, action: Action, tag: str = None, rez: Rez = None):
+    """
+    executes the child action at position of a composite action (ListAction, IfElse,
+    Compose); a Plan supplies its own, executing the child's compiled step
+    """
+    return execute_recorded(action, tag=tag, rez=rez)
+
+
 class Vals(Action):
     """
     flds in this object override supplied rez.flds.
@@ -165,7 +178,7 @@ class Fail(Action):
         operand = flds["operand"]
         operand_result = None
         try:
-            operand_result = operand.execute(tag=tag, rez=rez)
+            operand_result = execute_recorded(operand, tag=tag, rez=rez)
             log_action_result(
                 calling_logger=logger,
                 calling_object=self,
@@ -191,6 +204,8 @@ class ListOpMode(str, Enum):
     ALL = "all"
     UNTIL_SUCCESS = "until_success"
     UNTIL_FAILURE = "until_failure"
+    PARALLEL = "parallel"
+    RACE = "race"
 
 
 class ListAction(Action):
@@ -200,6 +215,8 @@ class ListAction(Action):
         ListOpMode.ALL:   executes all, irrespective of individual outcomes
         ListOpMode.UNTIL_SUCCESS:    executes until the first successful action (no exception)
         ListOpMode.UNTIL_FAILURE:   executes until the first exception (failure)
+        ListOpMode.PARALLEL:   executes all concurrently, each with the supplied rez
+        ListOpMode.RACE:   executes concurrently, staggered, until the first success
 
     Intended to be abstract class; not intended to be instantiated. Its subclasses,
     All, Or, and And, should be used instead.
@@ -219,18 +236,54 @@ class ListAction(Action):
             return f"This action executes all of these actions in order until the first success: ({self.actions}). It serves a role similar to logical or."
         if self.op_mode == ListOpMode.UNTIL_FAILURE:
             return f"This action executes all of these actions in order until the first failure: ({self.actions}). It serves a role similar to logical and."
+        if self.op_mode == ListOpMode.PARALLEL:
+            return f"This action executes all of these actions concurrently: ({self.actions})."
+        if self.op_mode == ListOpMode.RACE:
+            return f"This action races these actions, staggered, until the first success: ({self.actions})."
 
     def execute(self, tag: str = None, rez: Rez = None):
-        flds = self.compute_flds(rez=rez)
-        processing_info = process_actions(
-            calling_object=self,
-            rez=rez,
-            op_mode=flds.get("op_mode", ListOpMode.ALL),
-            tag=tag,
-            actions=flds["actions"],
-            successful_actions=[],
-            exception_actions=[],
-        )
+        return self.execute_flds(self.compute_flds(rez=rez), tag=tag, rez=rez)
+
+    def execute_flds(
+        self,
+        flds: Dict[str, Any],
+        tag: str = None,
+        rez: Rez = None,
+        execute: Callable = execute_child,
+    ):
+        """
+        executes with flds already computed; execute runs the children of the
+        sequential op modes (see execute_child)
+        """
+        if flds.get("op_mode", None) == ListOpMode.PARALLEL:
+            processing_info = process_actions_in_parallel(
+                calling_object=self,
+                rez=rez,
+                tag=tag,
+                actions=flds["actions"],
+                max_workers=flds.get("max_workers", None),
+                timeout=flds.get("timeout", None),
+            )
+        elif flds.get("op_mode", None) == ListOpMode.RACE:
+            processing_info = process_actions_racing(
+                calling_object=self,
+                rez=rez,
+                tag=tag,
+                actions=flds["actions"],
+                hedge_delay=flds.get("hedge_delay", None),
+                timeout=flds.get("timeout", None),
+            )
+        else:
+            processing_info = process_actions(
+                calling_object=self,
+                rez=rez,
+                op_mode=flds.get("op_mode", ListOpMode.ALL),
+                tag=tag,
+                actions=flds["actions"],
+                successful_actions=[],
+                exception_actions=[],
+                execute=execute,
+            )
         if (
             processing_info["processing_count"] > 0
             and processing_info["success_count"] == 0
@@ -287,6 +340,45 @@ class UntilFailure(ListAction):
         return super().execute(tag=tag, rez=rez)
 
 
+class Parallel(ListAction):
+    """
+    executes all actions concurrently on the ListPool's threads (its own once they
+    are busy), at most max_workers at a time (ListPool.max_workers if not provided),
+    each with the supplied rez.
+    The result is the list of the actions' results in order. Actions not done within
+    timeout seconds count as exceptions; threads can't be cancelled, so they are
+    left to finish in the background, side effects included (e.g. a timed-out
+    ScheduleAction may still schedule).
+    """
+
+    parallel: str = "parallel"
+    op_mode: ListOpMode = ListOpMode.PARALLEL
+    max_workers: Optional[int] = None
+    timeout: Optional[float] = None
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        return super().execute(tag=tag, rez=rez)
+
+
+class Race(ListAction):
+    """
+    executes actions until first success, like UntilSuccess, without waiting for an
+    action to fail before starting the next one: the next starts when the running
+    actions have failed or haven't finished within hedge_delay seconds (all start at
+    once if hedge_delay is not provided). The first success wins; the other running
+    actions are left to finish in the background and their results are ignored.
+    Actions not done within timeout seconds count as exceptions.
+    """
+
+    race: str = "race"
+    op_mode: ListOpMode = ListOpMode.RACE
+    hedge_delay: Optional[float] = None
+    timeout: Optional[float] = None
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        return super().execute(tag=tag, rez=rez)
+
+
 def process_actions(
     calling_object: Action,
     op_mode: ListOpMode,
@@ -298,16 +390,17 @@ def process_actions(
     processing_count: int = 0,
     success_count: int = 0,
     exception_count: int = 0,
+    execute: Callable = execute_child,
 ):
     """
     services the three action list classes, ALL, UNTIL_SUCCESS, and UNTIL_FAILURE
     """
     exceptions: List[Exception] = []
     loop_rez = rez
-    for action in actions:
+    for position, action in enumerate(actions):
         exception = None
         try:
-            loop_rez = action.execute(tag=tag, rez=loop_rez)
+            loop_rez = execute(position, action, tag=tag, rez=loop_rez)
             log_action_result(
                 calling_logger=logger,
                 calling_object=calling_object,
@@ -355,6 +448,258 @@ def process_actions(
     )
 
 
+class ListPool:
+    """
+    The threads shared by the Parallel and Race executions of this process, at most
+    max_workers of them. An action submitted while they are all busy (e.g. with
+    timed-out actions still running, or with the outer actions of a nested Parallel)
+    executes on its submitter's Overflow threads rather than waiting for one, so the
+    shared threads stay bounded, nested list actions can't deadlock the pool, and
+    the submitter's actions still run concurrently and within its timeout.
+
+    usage:
+        ListPool.configure(max_workers=64)
+    """
+
+    max_workers = 32
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whendo-list")
+    slots = BoundedSemaphore(max_workers)
+
+    @classmethod
+    def configure(cls, max_workers: int = 32):
+        assert max_workers >= 1, f"max_workers ({max_workers}) must be positive"
+        cls.pool.shutdown(wait=False)
+        cls.max_workers = max_workers
+        cls.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="whendo-list"
+        )
+        cls.slots = BoundedSemaphore(max_workers)
+
+    @classmethod
+    def submit(
+        cls, action: Action, overflow: "Overflow", tag: str = None, rez: Rez = None
+    ):
+        """
+        executes action on a thread of the pool, or of overflow if none is free, in
+        a copy of this thread's context, so that it keeps e.g. its job's fire time
+        and invocation (see Timed.fire_time); returns its future
+        """
+        slots = cls.slots
+        if not slots.acquire(blocking=False):
+            return overflow.submit(action, tag=tag, rez=rez)
+        try:
+            future = cls.pool.submit(
+                copy_context().run, execute_recorded, action, tag=tag, rez=rez
+            )
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+
+class Overflow:
+    """
+    The threads of one Parallel or Race execution for the actions ListPool has no
+    free thread for, at most max_workers of them, started when first needed.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, action: Action, tag: str = None, rez: Rez = None):
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="whendo-overflow"
+            )
+        return self.pool.submit(
+            copy_context().run, execute_recorded, action, tag=tag, rez=rez
+        )
+
+    def shutdown(self):
+        """
+        lets the actions still running (e.g. timed-out ones) finish in the background
+        """
+        if self.pool:
+            self.pool.shutdown(wait=False)
+
+
+def process_actions_in_parallel(
+    calling_object: Action,
+    actions: List[Action],
+    tag: str = None,
+    rez: Rez = None,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    services Parallel; aggregates processing results like process_actions
+    """
+    if len(actions) == 0:
+        return processing_results(rez)
+    deadline = monotonic() + timeout if timeout is not None else None
+    limit = max_workers or ListPool.max_workers
+    overflow = Overflow(max_workers=min(limit, len(actions)))
+    # actions left unstarted at the deadline count as timed out, like unfinished ones
+    futures: List[Optional[Future]] = [None] * len(actions)
+    running = set()
+    started = 0
+    while started < len(actions) or running:
+        remaining = None if deadline is None else deadline - monotonic()
+        if remaining is not None and remaining <= 0:
+            break
+        while started < len(actions) and len(running) < limit:
+            futures[started] = ListPool.submit(
+                actions[started], overflow, tag=tag, rez=rez
+            )
+            running.add(futures[started])
+            started += 1
+        done, running = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+    overflow.shutdown()
+    results = []
+    successful_actions = []
+    exception_actions = []
+    terminate = None
+    for action, future in zip(actions, futures):
+        if future is None or not future.done():
+            exception = TimeoutError(f"action not done within ({timeout}) seconds")
+        else:
+            exception = future.exception()
+        if exception:
+            logger.error(
+                f"ListAction: tag ({tag}); error while executing action ({action}) in parallel",
+                exc_info=exception,
+            )
+            exception_dict = action.dict().copy()
+            exception_dict.update({"exception": str(exception)})
+            exception_actions.append(exception_dict)
+            results.append(exception_dict)
+            if isinstance(exception, TerminateSchedulerException):
+                terminate = exception
+        else:
+            action_rez = future.result()
+            log_action_result(
+                calling_logger=logger,
+                calling_object=calling_object,
+                tag=tag,
+                action=action,
+                result=action_rez,
+            )
+            successful_actions.append(action.dict())
+            results.append(action_rez.result if action_rez else None)
+    info = processing_results(
+        Rez(result=results, rez=rez, flds=rez.flds if rez else {}),
+        len(actions),
+        len(successful_actions),
+        len(exception_actions),
+        successful_actions,
+        exception_actions,
+    )
+    if terminate:
+        terminate.value = info
+        raise terminate
+    return info
+
+
+def process_actions_racing(
+    calling_object: Action,
+    actions: List[Action],
+    tag: str = None,
+    rez: Rez = None,
+    hedge_delay: Optional[float] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    services Race; aggregates processing results like process_actions
+    """
+    if len(actions) == 0:
+        return processing_results(rez)
+    deadline = monotonic() + timeout if timeout is not None else None
+    overflow = Overflow(max_workers=min(ListPool.max_workers, len(actions)))
+    running = {}
+    successful_actions = []
+    exception_actions = []
+    loop_rez = rez
+    won = False
+    terminate = None
+
+    def exception_rez(action: Action, exception: Exception):
+        logger.error(
+            f"ListAction: tag ({tag}); error while racing action ({action})",
+            exc_info=exception,
+        )
+        exception_dict = action.dict().copy()
+        exception_dict.update({"exception": str(exception)})
+        exception_actions.append(exception_dict)
+        return Rez(result=exception_dict, rez=rez, flds=rez.flds if rez else {})
+
+    started = len(actions) if not hedge_delay else 1
+    for action in actions[:started]:
+        running[ListPool.submit(action, overflow, tag=tag, rez=rez)] = action
+    while running:
+        delays = [] if started == len(actions) else [hedge_delay]
+        if deadline is not None:
+            delays.append(max(0.0, deadline - monotonic()))
+        done, _ = wait(
+            running,
+            timeout=min(delays) if delays else None,
+            return_when=FIRST_COMPLETED,
+        )
+        failures = 0
+        for future in done:
+            action = running.pop(future)
+            exception = future.exception()
+            if exception:
+                failures += 1
+                failed_rez = exception_rez(action, exception)
+                if not won:
+                    loop_rez = failed_rez
+                if isinstance(exception, TerminateSchedulerException):
+                    terminate = exception
+            elif not won:
+                won = True
+                loop_rez = future.result()
+                log_action_result(
+                    calling_logger=logger,
+                    calling_object=calling_object,
+                    tag=tag,
+                    action=action,
+                    result=loop_rez,
+                )
+                successful_actions.append(action.dict())
+        if won or terminate:
+            break
+        if deadline is not None and monotonic() >= deadline:
+            for action in running.values():
+                loop_rez = exception_rez(
+                    action,
+                    TimeoutError(f"action not done within ({timeout}) seconds"),
+                )
+            break
+        # one more for each failure, or one if the running ones are slow
+        following = actions[started : started + (failures if done else 1)]
+        for action in following:
+            future = ListPool.submit(action, overflow, tag=tag, rez=rez)
+            running[future] = action
+        started += len(following)
+    overflow.shutdown()
+    info = processing_results(
+        loop_rez,
+        started,
+        len(successful_actions),
+        len(exception_actions),
+        successful_actions,
+        exception_actions,
+    )
+    if terminate:
+        terminate.value = info
+        raise terminate
+    return info
+
+
 class IfElse(Action):
     """
     executes actions based on:
@@ -381,7 +726,19 @@ class IfElse(Action):
         return f"If  action ({self.test_action}) succeeds, then IfElse executes ({self.if_action}), otherwise executes ({self.else_action})"
 
     def execute(self, tag: str = None, rez: Rez = None):
-        flds = self.compute_flds(rez=rez)
+        return self.execute_flds(self.compute_flds(rez=rez), tag=tag, rez=rez)
+
+    def execute_flds(
+        self,
+        flds: Dict[str, Any],
+        tag: str = None,
+        rez: Rez = None,
+        execute: Callable = execute_child,
+    ):
+        """
+        executes with flds already computed; execute runs the test (position 0),
+        else (1) and if (2) actions (see execute_child)
+        """
         test_action = flds["test_action"]
         else_action = flds["else_action"]
         if_action = flds.get("if_action", None)
@@ -389,7 +746,7 @@ class IfElse(Action):
         include_processing_info = flds.get("include_processing_info", False)
         exception = None
         try:
-            rez = test_action.execute(tag=tag, rez=rez)
+            rez = execute(0, test_action, tag=tag, rez=rez)
             log_action_result(
                 calling_logger=logger,
                 calling_object=self,
@@ -425,7 +782,7 @@ class IfElse(Action):
                 raise exception
             exception = None
             try:
-                rez = else_action.execute(tag=tag, rez=rez)
+                rez = execute(1, else_action, tag=tag, rez=rez)
                 log_action_result(
                     calling_logger=logger,
                     calling_object=self,
@@ -468,7 +825,7 @@ class IfElse(Action):
             if if_action:  # execute the if_action
                 exception = None
                 try:
-                    rez = if_action.execute(tag=tag, rez=rez)
+                    rez = execute(2, if_action, tag=tag, rez=rez)
                     log_action_result(
                         calling_logger=logger,
                         calling_object=self,
@@ -577,11 +934,23 @@ class Compose(Action):
         )
 
     def execute(self, tag: str = None, rez: Rez = None):
-        flds = self.compute_flds(rez=rez)
+        return self.execute_flds(self.compute_flds(rez=rez), tag=tag, rez=rez)
+
+    def execute_flds(
+        self,
+        flds: Dict[str, Any],
+        tag: str = None,
+        rez: Rez = None,
+        execute: Callable = execute_child,
+    ):
+        """
+        executes with flds already computed; execute runs the actions (see
+        execute_child)
+        """
         actions = flds["actions"]
         loop_rez = rez
-        for action in actions:
-            loop_rez = action.execute(tag=tag, rez=loop_rez)
+        for position, action in enumerate(actions):
+            loop_rez = execute(position, action, tag=tag, rez=loop_rez)
             log_action_result(
                 calling_logger=logger,
                 calling_object=self,
@@ -6,15 +6,38 @@ endpoints of a restful api and supports testing outside of the restful api imple
 Instances of this class contain Schedulers, Actions and Programs, which can at any point be submitted to and removed from the
 job scheduling mechanism of the schedule library (refer to the 'timed' module).
 """
+
 from pydantic import BaseModel, PrivateAttr
-from threading import RLock
-from typing import Dict, List, Set
+from threading import RLock, Thread, get_ident
+import time
+import functools
+import socket
+from typing import Dict, List, Set, Tuple, Callable
+import copy
 import json
 import os
+import sys
+import uuid
+import heapq
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from .util import PP, Dirs, Now, str_to_dt, dt_to_str, Http, SystemInfo, KeyTagMode, Rez
+from typing import Optional, Dict, Any, ClassVar
+from .util import (
+    PP,
+    Dirs,
+    Now,
+    str_to_dt,
+    dt_to_str,
+    SystemInfo,
+    KeyTagMode,
+    Rez,
+    object_projection,
+    FileLock,
+    ResultCache,
+    SharedRWs,
+    fingerprint,
+)
 from .hooks import DispatcherHooks
 from .action import Action, log_action_result
 from .program import Program, ProgramItem
@@ -26,20 +49,41 @@ from .resolver import (
     resolve_program,
     resolve_server,
     resolve_action,
-    resolve_rez,
 )
 from .executor import Executor
+from .exception import StandbyException
 from .scheduling import (
     DeferredPrograms,
     DeferredProgram,
     ScheduledActions,
     DatedScheduledActions,
 )
-from .server import Server
+from .peer import Peer
+from .history import ExecutionHistory, execute_recorded, invoked
+from .history_store import HistoryStore
+from .plan import Plan
+from .profiler import StackSampler
+from . import metrics
+from .server import Server, ServerIndex, Partition, HashRing, ServerHealth
 
 logger = logging.getLogger(__name__)
 
 
+def leading(method):
+    """
+    Marks a Dispatcher method that changes its state. A standby rejects it, since
+    its state is replaced whenever the leader saves (see DispatcherSingleton).
+    """
+
+    @functools.wraps(method)
+    def guarded(self, *args, **kwargs):
+        if self._leader is not None and self._follower != get_ident():
+            raise StandbyException(self._leader)
+        return method(self, *args, **kwargs)
+
+    return guarded
+
+
 class Dispatcher(BaseModel):
     """
     Serializations of this class are stored in the local file system. When a runtime starts
@@ -55,10 +99,79 @@ class Dispatcher(BaseModel):
     expiring_scheduled_actions: DatedScheduledActions = DatedScheduledActions()
     deferred_programs: DeferredPrograms = DeferredPrograms()
     saved_dir: Optional[str] = None
+    partition: Optional[Partition] = None
 
     # not treated as a model attrs
     _timed: Timed = PrivateAttr(default_factory=Timed.get)
     _timed_for_out_of_band: Timed = PrivateAttr(default_factory=Timed)
+    _server_index: Optional[ServerIndex] = PrivateAttr(default=None)
+    # (revision, ring) and (revision, names) of the partitioning, kept apart from
+    # the client-driven renderings; see get_hash_ring and get_local_server_names
+    _hash_ring: Optional[Tuple[int, HashRing]] = PrivateAttr(default=None)
+    _local_server_names: Optional[Tuple[int, Set[str]]] = PrivateAttr(default=None)
+    _server_health: ServerHealth = PrivateAttr(default_factory=ServerHealth)
+    # (revision, json) as of the last save_current that changed something
+    _saved: Tuple[int, Optional[str]] = PrivateAttr(default=(0, None))
+    # scheduling counts as of the last save_current; see counts
+    _counts: Optional[Dict[str, int]] = PrivateAttr(default=None)
+    # least recently rendered first; see render
+    _renderings: Dict[Tuple[int, str], Any] = PrivateAttr(default_factory=OrderedDict)
+    _epoch: str = PrivateAttr(default_factory=lambda: uuid.uuid4().hex[:8])
+    # (revision, floor, ((revision, changes), ...), saved state); see changes
+    _feed: Tuple[int, int, Tuple, Optional[Dict[str, Any]]] = PrivateAttr(
+        default=(0, 0, (), None)
+    )
+    # the leader's identity while standing by, when changes are rejected and
+    # save_current doesn't write current.json; the thread following the leader
+    # (see DispatcherSingleton)
+    _leader: Optional[str] = PrivateAttr(default=None)
+    _follower: Optional[int] = PrivateAttr(default=None)
+    # compiled plans of the stored actions, by action name; see get_plan
+    _plans: Dict[str, Plan] = PrivateAttr(default_factory=dict)
+    # results of executions requested with idempotency keys; see execute_idempotently
+    _results: ResultCache = PrivateAttr(
+        default_factory=lambda: ResultCache(
+            max_size=Dispatcher.result_cache_size, ttl=Dispatcher.result_cache_ttl
+        )
+    )
+
+    # inventory dictionaries readable without Lok.lock (see snapshot and peek)
+    snapshot_collections: ClassVar[Set[str]] = {
+        "actions",
+        "schedulers",
+        "programs",
+        "servers",
+    }
+    collection_resolvers: ClassVar[Dict[str, Callable]] = {
+        "actions": resolve_action,
+        "schedulers": resolve_scheduler,
+        "programs": resolve_program,
+        "servers": resolve_server,
+    }
+    # number of revisions kept in the change log
+    change_log_size: ClassVar[int] = 1024
+    # number of renderings kept for the current revision
+    max_renderings: ClassVar[int] = 16
+    # bounds of the idempotent execution results; entries, seconds
+    result_cache_size: ClassVar[int] = 1024
+    result_cache_ttl: ClassVar[float] = 60.0
+    idempotent_executions: ClassVar[Set[str]] = {
+        "execute_action",
+        "execute_action_with_rez",
+        "execute_supplied_action",
+        "execute_supplied_action_with_rez",
+    }
+
+    # pickles (e.g. for the leader's proxy, see whendo.api.leader) leave out the
+    # process-local private attributes; unpickling restores their defaults
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {}
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._init_private_attributes()
 
     # jobs and timed object
     def set_timed(self, timed: Timed):
@@ -114,11 +227,100 @@ class Dispatcher(BaseModel):
     def get_saved_dir(self):
         return self.saved_dir
 
+    # lock-free reads
+    def snapshot(self, collection: str):
+        """
+        Returns a shallow copy of one of the inventory dictionaries (actions,
+        schedulers, programs, servers) without waiting on Lok.lock. Copying a
+        dictionary is atomic under the GIL, so readers see a point-in-time view
+        even while a mutation or a long execution holds the lock.
+        """
+        assert (
+            collection in self.snapshot_collections
+        ), f"collection ({collection}) cannot be read without the lock"
+        return getattr(self, collection).copy()
+
+    def peek(self, collection: str, name: str):
+        """
+        Returns one element of an inventory dictionary without waiting on Lok.lock.
+        """
+        assert (
+            collection in self.snapshot_collections
+        ), f"collection ({collection}) cannot be read without the lock"
+        return getattr(self, collection).get(name, None)
+
+    def counts(self):
+        """
+        Returns the scheduled, deferred and expiring action counts and the deferred
+        program count as of the last save_current, without waiting on Lok.lock
+        (unless nothing was saved yet).
+        """
+        counts = self._counts
+        if counts is None:
+            with Lok.lock:
+                counts = self.compute_counts()
+        return counts
+
+    def compute_counts(self):
+        return {
+            "action_count": self.scheduled_actions.action_count(),
+            "deferred_action_count": self.deferred_scheduled_actions.action_count(),
+            "expiring_action_count": self.expiring_scheduled_actions.action_count(),
+            "deferred_program_count": self.deferred_programs.count(),
+        }
+
+    def page(
+        self,
+        collection: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        prefix: Optional[str] = None,
+        class_name: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        names_only: bool = False,
+    ):
+        """
+        Returns one page of an inventory dictionary in name order as
+        {"items": ..., "next": ...}, reading a lock-free snapshot.
+
+            after: cursor; only names greater than this one are returned
+            limit: page size; "next" is the cursor for the following page, None at the end
+            prefix, class_name: filters on the element name and element class name
+            fields: project each element onto these fields (see util.object_projection)
+            names_only: "items" is just the list of names
+        """
+        assert limit is None or limit > 0, f"limit ({limit}) must be positive"
+        elements = self.snapshot(collection)
+        names = (
+            name
+            for name, element in elements.items()
+            if (after is None or name > after)
+            and (prefix is None or name.startswith(prefix))
+            and (class_name is None or element.__class__.__name__ == class_name)
+        )
+        next_name = None
+        if limit is None:
+            names = sorted(names)
+        else:
+            names = heapq.nsmallest(limit + 1, names)
+            if len(names) > limit:
+                names = names[:limit]
+                next_name = names[-1]
+        if names_only:
+            items = names
+        elif fields:
+            items = {name: object_projection(elements[name], fields) for name in names}
+        else:
+            items = {name: elements[name] for name in names}
+        return {"items": items, "next": next_name}
+
     def get_actions_for_scheduler(self, scheduler_name: str):
         with Lok.lock:
             action_names = self.scheduled_actions.actions(scheduler_name)
             return {
-                action_name: self.actions[action_name] for action_name in action_names
+                action_name: self.get_plan(action_name)
+                for action_name in action_names
+                if self.owns(scheduler_name, action_name)
             }
 
     def unschedule_scheduler_thunk(self, scheduler_name: str):
@@ -131,13 +333,14 @@ class Dispatcher(BaseModel):
         self.check_for_deferred_actions()
         self.check_for_expiring_actions()
 
-    def initialize(self):
+    def initialize(self, run_checks: bool = True):
         Lok.reset()
         self._timed_for_out_of_band.clear()
         self._timed_for_out_of_band.every(1).second.do(
             self.check_for_expirations_and_deferrals
         ).tag("check_for_expirations_and_deferrals")
-        self._timed_for_out_of_band.run()
+        if run_checks:
+            self.run_checks()
         DispatcherHooks.init(
             schedule_program_thunk=lambda program_name, start, stop: self.schedule_program(
                 program_name, start, stop
@@ -173,6 +376,10 @@ class Dispatcher(BaseModel):
                 key_tags, key_tag_mode
             ),
             get_action_thunk=lambda action_name: self.get_action(action_name),
+            rank_servers_thunk=lambda key_tags, key_tag_mode: self.rank_servers(
+                key_tags, key_tag_mode
+            ),
+            get_server_health_thunk=lambda: self._server_health,
             get_scheduling_info_thunk=lambda: {
                 key: value
                 for (key, value) in self.__dict__.items()
@@ -187,15 +394,272 @@ class Dispatcher(BaseModel):
             get_dispatcher_dump_thunk=lambda: self.load_current(),
         )
 
+    def run_checks(self):
+        """
+        Starts the out-of-band checks for deferrals and expirations.
+        """
+        self._timed_for_out_of_band.run(name="whendo-timed-out-of-band")
+
+    def stop_checks(self):
+        self._timed_for_out_of_band.stop()
+
+    def set_standby(self, leader: Optional[str]):
+        """
+        Stands by for leader (None: leads).
+        """
+        self._leader = leader
+
+    def get_leader(self):
+        return self._leader
+
+    def follow(self, replacement: object):
+        """
+        Replaces a standby's state with the leader's.
+        """
+        self._follower = get_ident()
+        try:
+            self.replace_all(replacement)
+        finally:
+            self._follower = None
+
     def pprint(self):
         PP.pprint(self.dict())
 
     def load_current(self):
-        return self.load_from_name("current")
+        """
+        Returns the Dispatcher as of the last save_current. Before the first save in
+        this process it is read from current.json; afterwards it is resolved from
+        the in-memory serialization. Each call returns a new instance, so callers
+        may change it; the api serves the serialization itself (see current_json).
+        """
+        with Lok.lock:
+            if self._saved[1] is None or not self.saved_dir:
+                return self.load_from_name("current")
+            serialization = self._saved[1]
+        return Dispatcher.resolve(json.loads(serialization))
+
+    def save_current(self, force: bool = False):
+        """
+        Saves to current.json and advances the revision, but only if the
+        serialization differs from the last saved one (or if forced). The
+        once-a-second checks for deferrals and expirations only call it when
+        something was due.
+        """
+        with Lok.lock:
+            start = time.perf_counter()
+            serialization = self.json()
+            if force or serialization != self._saved[1]:
+                revision = self._saved[0] + 1
+                self._saved = (revision, serialization)
+                self._counts = self.compute_counts()
+                self._renderings = OrderedDict()
+                self.log_changes(revision, json.loads(serialization))
+                if self._leader is None:
+                    self.save_to_name("current", serialization)
+                    metrics.save_duration.observe(time.perf_counter() - start)
+                    metrics.save_size.set(len(serialization))
+
+    # revision-stamped renderings of the saved state
+    def get_revision(self):
+        return self._saved[0]
+
+    def etag(self, revision: Optional[int] = None):
+        """
+        Returns an HTTP entity tag for the saved state at revision (default: current).
+        """
+        revision = self.get_revision() if revision is None else revision
+        return f'"{self._epoch}-{revision}"'
+
+    def cached(self, key: str):
+        """
+        Lock-free: returns (etag, value) if the rendering named key exists for the
+        current revision, otherwise None.
+        """
+        revision = self.get_revision()
+        value = self._renderings.get((revision, key), None)
+        return None if value is None else (self.etag(revision), value)
+
+    def render(self, key: str, renderer: Callable):
+        """
+        Returns (etag, renderer()) for the current revision, calling renderer at
+        most once per revision while the rendering is among the max_renderings
+        most recently rendered.
+        """
+        with Lok.lock:
+            revision = self.get_revision()
+            renderings = self._renderings
+            value = renderings.get((revision, key), None)
+            if value is None:
+                value = renderer()
+                renderings[(revision, key)] = value
+                while len(renderings) > self.max_renderings:
+                    renderings.popitem(last=False)
+            else:
+                renderings.move_to_end((revision, key))
+            return (self.etag(revision), value)
+
+    @classmethod
+    def rendering_key(cls, fields: Optional[str] = None):
+        """
+        Returns the key of the rendering of the Dispatcher restricted to fields (a
+        comma-separated list of Dispatcher fields; all if not provided), the fields
+        sorted and deduplicated so that each set of fields has one key.
+        """
+        names = sorted({name.strip() for name in (fields or "").split(",")} - {""})
+        unknown = [name for name in names if name not in cls.__fields__]
+        assert not unknown, f"unknown Dispatcher fields ({', '.join(unknown)})"
+        return f"load:{','.join(names)}" if names else "load"
+
+    def rendering(self, key: str):
+        """
+        Returns (etag, value) of a named rendering: "describe_all" or a key from
+        rendering_key. Unlike render, callable through the leader's proxy (see
+        whendo.api.leader).
+        """
+        if key == "describe_all":
+            return self.render(key, self.compute_descriptions)
+        fields = key.split(":", 1)[1] if key.startswith("load:") else None
+        assert key == self.rendering_key(fields), f"unknown rendering ({key})"
+        return self.render(
+            key, lambda: self.current_json(fields.split(",") if fields else None)
+        )
+
+    def current_json(self, fields: Optional[List[str]] = None):
+        """
+        Returns the json string of the last saved Dispatcher, optionally restricted
+        to the named fields.
+        """
+        with Lok.lock:
+            if not fields and self._saved[1] is not None and self.saved_dir:
+                return self._saved[1]
+            current = self.load_current()
+            if current is None:
+                return json.dumps(None)
+            return current.json(include=set(fields) if fields else None)
+
+    # change feed
+    def log_changes(self, revision: int, state: Dict[str, Any]):
+        """
+        Appends the differences between the previously saved state and state to
+        the change log. The feed tuple is replaced whole, so changes() can read
+        it without the lock.
+        """
+        _, floor, entries, previous = self._feed
+        if previous is None:
+            # nothing to compare with; the feed starts here
+            floor = revision
+        else:
+            entries = entries + ((revision, self.diff_states(previous, state)),)
+            if len(entries) > self.change_log_size:
+                floor = entries[-self.change_log_size - 1][0]
+                entries = entries[-self.change_log_size :]
+        self._feed = (revision, floor, entries, state)
+
+    def diff_states(self, previous: Dict[str, Any], state: Dict[str, Any]):
+        """
+        Inventory collections are compared element by element, the other fields
+        as a whole.
+        """
+        changes = []
+        for field, value in state.items():
+            before = previous.get(field, None)
+            if field in self.snapshot_collections:
+                before = before or {}
+                for name, element in value.items():
+                    if before.get(name, None) != element:
+                        changes.append(
+                            {
+                                "op": "set",
+                                "field": field,
+                                "name": name,
+                                "value": element,
+                            }
+                        )
+                for name in before.keys() - value.keys():
+                    changes.append({"op": "delete", "field": field, "name": name})
+            elif before != value:
+                changes.append({"op": "set", "field": field, "value": value})
+        return changes
+
+    def changes(self, since: int, epoch: Optional[str] = None):
+        """
+        Returns the changes to the saved state after revision since:
+
+            {"epoch": ..., "revision": ..., "resync": False, "changes": [...]}
+
+        If the log no longer reaches back to since, or epoch is not this
+        process's epoch (e.g. after a restart), it returns the whole saved state
+        instead:
+
+            {"epoch": ..., "revision": ..., "resync": True, "dispatcher": {...}}
 
-    def save_current(self):
+        Replicas pass the returned epoch and revision to the next call (see
+        apply_changes).
+        """
+        revision, floor, entries, state = self._feed
+        if (epoch and epoch != self._epoch) or since < floor or since > revision:
+            return {
+                "epoch": self._epoch,
+                "revision": revision,
+                "resync": True,
+                "dispatcher": state,
+            }
+        return {
+            "epoch": self._epoch,
+            "revision": revision,
+            "resync": False,
+            "changes": [
+                dict(change, revision=entry_revision)
+                for entry_revision, entry_changes in entries
+                if entry_revision > since
+                for change in entry_changes
+            ],
+        }
+
+    def apply_changes(self, feed: Dict[str, Any], mirror: bool = False):
+        """
+        Applies the result of another Dispatcher's changes() to this one, keeping
+        this one's saved_dir, as its follower if it stands by for the other. With
+        mirror, it also takes the feed's epoch and revision as its own, so that its
+        etags and renderings match the other's (see whendo.api.leader.Replica).
+        Returns the (epoch, revision) to ask for next.
+        """
         with Lok.lock:
-            self.save_to_name("current")
+            self._follower = get_ident()
+            try:
+                if feed["resync"]:
+                    if feed["dispatcher"] is not None:
+                        self.replace_all(
+                            Dispatcher.resolve(copy.deepcopy(feed["dispatcher"]))
+                        )
+                else:
+                    for change in feed["changes"]:
+                        field = change["field"]
+                        if field in self.snapshot_collections:
+                            collection = getattr(self, field)
+                            if change["op"] == "delete":
+                                collection.pop(change["name"], None)
+                            else:
+                                resolver = self.collection_resolvers[field]
+                                collection[change["name"]] = resolver(change["value"])
+                            if field == "servers":
+                                self._server_index = None
+                                self.forget_partitioning()
+                        elif field != "saved_dir":
+                            value = change["value"]
+                            model = self.__fields__[field].type_
+                            setattr(
+                                self,
+                                field,
+                                None if value is None else model.parse_obj(value),
+                            )
+                    self.save_current()
+            finally:
+                self._follower = None
+            if mirror:
+                self._epoch = feed["epoch"]
+                self._saved = (feed["revision"], self._saved[1])
+            return (feed["epoch"], feed["revision"])
 
     def load_from_name(self, name: str):
         with Lok.lock:
@@ -207,11 +671,14 @@ class Dispatcher(BaseModel):
             else:
                 return None
 
-    def save_to_name(self, name: str):
+    def save_to_name(self, name: str, serialization: Optional[str] = None):
         with Lok.lock:
             if self.saved_dir:
-                with open(self.saved_dir + name + ".json", "w") as outfile:
-                    json.dump(self.json(), outfile, indent=2)
+                # write then rename, so that readers (e.g. a standby) never see a partial file
+                path = self.saved_dir + name + ".json"
+                with open(path + ".tmp", "w") as outfile:
+                    json.dump(serialization or self.json(), outfile, indent=2)
+                os.replace(path + ".tmp", path)
 
     def set_saved_dir(self, saved_dir: str):
         with Lok.lock:
@@ -221,6 +688,7 @@ class Dispatcher(BaseModel):
             self.saved_dir = saved_dir
             self.save_current()
 
+    @leading
     def clear_all(self, should_save: bool = True):
         """
         Removes all actions, schedulers, programs, and foreground
@@ -232,13 +700,19 @@ class Dispatcher(BaseModel):
             self.expiring_scheduled_actions.clear()
             self.deferred_programs.clear()
             self.actions.clear()
+            self._plans.clear()
             self.schedulers.clear()
             self.programs.clear()
             self.servers.clear()
+            self._server_index = None
+            self._server_health.clear()
+            self.partition = None
+            self.forget_partitioning()
             self._timed.clear()
             if should_save:
                 self.save_current()
 
+    @leading
     def clear_all_scheduling(self, should_save: bool = True):
         """
         Removes all scheduled actions, current or planned, and foreground
@@ -253,6 +727,7 @@ class Dispatcher(BaseModel):
             self._timed.clear()
             self.save_current()
 
+    @leading
     def replace_all(self, replacement: object):
         """
         Note #1: the assumption is that the replacement is a Dispatcher. There's
@@ -284,14 +759,19 @@ class Dispatcher(BaseModel):
                     replacement.get_expiring_scheduled_actions()
                 )
                 self.deferred_programs = replacement.get_deferred_programs()
+                self.partition = replacement.get_partition()
                 self.save_current()
 
         typed_replace_all(replacement)
 
     def describe_all(self):
         """
-        Returns descriptions of all actions, schedulers and programs.
+        Returns descriptions of all actions, schedulers and programs, rendered
+        once per revision.
         """
+        return self.render("describe_all", self.compute_descriptions)[1]
+
+    def compute_descriptions(self):
         result = {}
 
         stuff = self.actions.copy()
@@ -312,7 +792,7 @@ class Dispatcher(BaseModel):
         stuff = self.servers.copy()
         for name in stuff:
             stuff[name] = stuff[name].description()
-        result["programs"] = stuff
+        result["servers"] = stuff
 
         return result
 
@@ -321,6 +801,18 @@ class Dispatcher(BaseModel):
         with Lok.lock:
             return self.actions.get(action_name, None)
 
+    def get_plan(self, action_name: str):
+        """
+        Returns the compiled Plan of the named action, compiling it on first use or
+        if the stored action has been replaced since.
+        """
+        with Lok.lock:
+            action = self.actions[action_name]
+            plan = self._plans.get(action_name, None)
+            if plan is None or plan.action is not action:
+                plan = self._plans[action_name] = Plan(action, name=action_name)
+            return plan
+
     def describe_action(self, action_name: str):
         with Lok.lock:
             action = self.get_action(action_name)
@@ -330,18 +822,22 @@ class Dispatcher(BaseModel):
                 else f"action ({action_name}) does not exist."
             )
 
+    @leading
     def add_action(self, action_name: str, action: Action):
         with Lok.lock:
             self.check_action_name(action_name, invert=True)
             self.actions[action_name] = action
             self.save_current()
 
+    @leading
     def set_action(self, action_name: str, action: Action):
         with Lok.lock:
             self.check_action_name(action_name)
             self.actions[action_name] = action
+            self._plans.pop(action_name, None)
             self.save_current()
 
+    @leading
     def delete_action(self, action_name: str):
         with Lok.lock:
             self.check_action_name(action_name)
@@ -349,6 +845,7 @@ class Dispatcher(BaseModel):
             for ds in deleted_schedulers:
                 self.check_scheduler(ds)
             self.actions.pop(action_name, None)
+            self._plans.pop(action_name, None)
             self.deferred_scheduled_actions.delete_dated_action(action_name=action_name)
             self.expiring_scheduled_actions.delete_dated_action(action_name=action_name)
 
@@ -363,57 +860,151 @@ class Dispatcher(BaseModel):
 
             self.save_current()
 
+    # executions hold Lok.lock only to look up the action's plan; actions reach
+    # Dispatcher state through DispatcherHooks, which lock for themselves, possibly
+    # from other threads (e.g. Parallel)
     def execute_action(self, action_name: str):
         with Lok.lock:
             self.check_action_name(action_name)
-            action = self.get_action(action_name)
-            result = action.execute()
-            log_action_result(
-                calling_logger=logger,
-                calling_object=self,
-                tag=f":{action_name}",
-                action=action,
-                result=result,
-            )
-            return result
+            plan = self.get_plan(action_name)
+        return self.execute_and_log(f":{action_name}", action_name, plan.action, plan)
 
     def execute_action_with_rez(self, action_name: str, rez: Rez):
         with Lok.lock:
             self.check_action_name(action_name)
-            action = self.get_action(action_name)
-            result = action.execute(rez=rez)
-            log_action_result(
-                calling_logger=logger,
-                calling_object=self,
-                tag=f":{action_name}",
-                action=action,
-                result=result,
-            )
-            return result
+            plan = self.get_plan(action_name)
+        return self.execute_and_log(
+            f":{action_name}", action_name, plan.action, plan, rez=rez
+        )
 
     def execute_supplied_action(self, supplied_action: Action):
-        with Lok.lock:
-            result = supplied_action.execute()
-            log_action_result(
-                calling_logger=logger,
-                calling_object=self,
-                tag="",
-                action=supplied_action,
-                result=result,
-            )
-            return result
+        return self.execute_and_log(
+            "", supplied_action.__class__.__name__, supplied_action, supplied_action
+        )
 
     def execute_supplied_action_with_rez(self, supplied_action: Action, rez: Rez):
-        with Lok.lock:
-            result = supplied_action.execute(rez=rez)
-            log_action_result(
-                calling_logger=logger,
-                calling_object=self,
-                tag="",
-                action=supplied_action,
-                result=result,
+        return self.execute_and_log(
+            "",
+            supplied_action.__class__.__name__,
+            supplied_action,
+            supplied_action,
+            rez=rez,
+        )
+
+    def execute_and_log(
+        self, tag: str, action_name: str, action: Action, executable, rez: Rez = None
+    ):
+        """
+        Executes executable (the action or its plan) with rez, recording the
+        execution in the ExecutionHistory and logging its result under tag.
+        """
+        start = time.perf_counter()
+        try:
+            result = execute_recorded(
+                action,
+                tag=tag,
+                rez=rez,
+                action_name=action_name,
+                execute=lambda tag, rez: executable.execute(rez=rez),
             )
-            return result
+        finally:
+            duration = time.perf_counter() - start
+            metrics.action_duration.observe(duration, action_name)
+        log_action_result(
+            calling_logger=logger,
+            calling_object=self,
+            tag=tag,
+            action=action,
+            result=result,
+            duration=duration,
+        )
+        return result
+
+    def execute_idempotently(self, idempotency_key: str, execution: str, **kwargs):
+        """
+        Calls the execution method (e.g. execute_action) with kwargs unless an
+        execution with the same idempotency_key and kwargs is cached or under way, in
+        which case its result is returned instead. Repeats within result_cache_ttl
+        seconds, such as client retries after a timeout, don't execute the action
+        again; a key reused with other kwargs doesn't get another execution's result.
+        The execution is the invocation idempotency_key (see invoked), so the keyed
+        actions it runs derive the same keys on every repeat.
+        """
+        assert (
+            execution in self.idempotent_executions
+        ), f"({execution}) is not an execution"
+        return self._results.get_or_compute(
+            (execution, idempotency_key, fingerprint(kwargs)),
+            lambda: invoked(idempotency_key, getattr(self, execution), **kwargs),
+        )
+
+    def get_result_cache_info(self):
+        return self._results.info()
+
+    def get_metrics(self):
+        """
+        Returns this process's metrics in the Prometheus text format.
+        """
+        return metrics.registry.render()
+
+    def start_lock_profile(self):
+        Lok.start_profile()
+
+    def stop_lock_profile(self):
+        Lok.stop_profile()
+
+    def profile_threads(
+        self, seconds: float, hz: float = 100.0, threads: Optional[str] = None
+    ):
+        """
+        Returns the collapsed stacks of this process's threads sampled for seconds
+        (see StackSampler.profile).
+        """
+        return StackSampler.profile(seconds=seconds, hz=hz, threads=threads)
+
+    def get_lock_profile(self):
+        """
+        Returns the waits and holds of Lok.lock per call site (see Lok.dump).
+        """
+        return Lok.dump()
+
+    def get_executions(
+        self,
+        tag: Optional[str] = None,
+        since: Optional[datetime] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ):
+        """
+        Returns the recent executions of this process (see ExecutionHistory.query).
+        """
+        return ExecutionHistory.get().query(
+            tag=tag, since=since, status=status, limit=limit
+        )
+
+    def get_execution_stats(
+        self,
+        tag: Optional[str] = None,
+        action_name: Optional[str] = None,
+        server: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        bucket: float = 3600.0,
+    ):
+        """
+        Returns counts and latencies per time bucket of the stored executions (see
+        HistoryStore.stats).
+        """
+        return HistoryStore.get().stats(
+            tag=tag,
+            action_name=action_name,
+            server=server,
+            status=status,
+            since=since,
+            until=until,
+            bucket=bucket,
+        )
 
     # schedulers
     def get_scheduler(self, scheduler_name: str):
@@ -429,12 +1020,14 @@ class Dispatcher(BaseModel):
                 else f"scheduler ({scheduler_name}) does not exist."
             )
 
+    @leading
     def add_scheduler(self, scheduler_name: str, scheduler: Scheduler):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name, invert=True)
             self.schedulers[scheduler_name] = scheduler
             self.save_current()
 
+    @leading
     def set_scheduler(self, scheduler_name: str, scheduler: Scheduler):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -442,6 +1035,7 @@ class Dispatcher(BaseModel):
             self.reschedule_scheduler(scheduler_name)
             self.save_current()
 
+    @leading
     def delete_scheduler(self, scheduler_name: str):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -488,6 +1082,7 @@ class Dispatcher(BaseModel):
                 else f"program ({program_name}) does not exist."
             )
 
+    @leading
     def add_program(self, program_name: str, program: Program):
         with Lok.lock:
             self.check_program_name(program_name, invert=True)
@@ -495,6 +1090,7 @@ class Dispatcher(BaseModel):
             self.programs[program_name] = program
             self.save_current()
 
+    @leading
     def set_program(self, program_name: str, program: Program):
         with Lok.lock:
             self.check_program_name(program_name)
@@ -502,6 +1098,7 @@ class Dispatcher(BaseModel):
             self.programs[program_name] = program
             self.save_current()
 
+    @leading
     def delete_program(self, program_name: str):
         """
         Deletes program from programs and removes all references
@@ -513,6 +1110,7 @@ class Dispatcher(BaseModel):
             self.programs.pop(program_name)
             self.save_current()
 
+    @leading
     def unschedule_program(self, program_name: str):
         """
         Deletes program from programs and removes all references
@@ -523,6 +1121,7 @@ class Dispatcher(BaseModel):
             self.deferred_programs.clear_program(program_name)
             self.save_current()
 
+    @leading
     def unschedule_active_program(self, program_name: str):
         """
         Deletes schedulers/actions referenced in program from deferred, expiring and active schedulers/actions
@@ -562,6 +1161,7 @@ class Dispatcher(BaseModel):
                 error_txt = f"program ({program}) error_msgs ({error_msgs})"
                 raise ValueError(error_txt)
 
+    @leading
     def schedule_program(self, program_name: str, start: datetime, stop: datetime):
         """
         This method defers the scheduling of a program.
@@ -626,30 +1226,28 @@ class Dispatcher(BaseModel):
         with Lok.lock:
             return self.deferred_programs.count()
 
+    @leading
     def clear_all_deferred_programs(self):
         with Lok.lock:
             self.deferred_programs.clear()
             self.save_current()
 
     # servers
+    @leading
     def add_server(self, server_name: str, server: Server):
         with Lok.lock:
             self.check_server_name(server_name, invert=True)
             self.servers[server_name] = server
+            self.get_server_index().add(server_name, server)
             self.save_current()
 
+    @leading
     def add_server_key_tags(self, server_name: str, key_tags: Dict[str, List[str]]):
         with Lok.lock:
             self.check_server_name(server_name)
             server = self.get_server(server_name)
-            for key in key_tags:
-                if key in server.tags:
-                    tags = server.tags[key]
-                    for tag in key_tags[key]:
-                        if tag not in tags:
-                            tags.append(tag)
-                else:
-                    server.tags[key] = key_tags[key]
+            server.add_key_tags(key_tags)
+            self.get_server_index().add_key_tags(server_name, key_tags)
             self.save_current()
 
     def get_server_tags(self, server_name: str):
@@ -666,15 +1264,22 @@ class Dispatcher(BaseModel):
                 else f"server ({server_name}) does not exist."
             )
 
+    @leading
     def set_server(self, server_name: str, server: Server):
         with Lok.lock:
             self.check_server_name(server_name)
+            index = self.get_server_index()
+            index.delete(server_name)
             self.servers[server_name] = server
+            index.add(server_name, server)
             self.save_current()
 
+    @leading
     def delete_server(self, server_name: str):
         with Lok.lock:
             self.check_server_name(server_name)
+            self.get_server_index().delete(server_name)
+            self._server_health.forget(server_name)
             self.servers.pop(server_name)
             self.save_current()
 
@@ -682,22 +1287,60 @@ class Dispatcher(BaseModel):
         self.check_server_name(server_name)
         return self.servers[server_name]
 
+    def get_server_index(self):
+        """
+        Returns the key:tag inverted index over the servers, building it from
+        the servers dictionary if absent (e.g. after loading or clearing).
+        """
+        with Lok.lock:
+            if self._server_index is None:
+                index = ServerIndex()
+                for server_name, server in self.servers.items():
+                    index.add(server_name, server)
+                self._server_index = index
+            return self._server_index
+
     def get_servers_by_tags(
         self,
         key_tags: Dict[str, List[str]],
         key_tag_mode: KeyTagMode = KeyTagMode.ANY,
     ):
+        """
+        Returns the servers satisfying at least one of the supplied keys, each
+        server at most once. See ServerIndex.select.
+        """
         if key_tags:
-            result = []
-            for server in self.servers.values():
-                for key in key_tags:
-                    tags = key_tags[key]
-                    if key in server.get_keys(tags=tags, key_tag_mode=key_tag_mode):
-                        result.append(server)
-            return result
+            with Lok.lock:
+                server_names = self.get_server_index().select(
+                    key_tags=key_tags, key_tag_mode=key_tag_mode
+                )
+                return [self.servers[name] for name in sorted(server_names)]
         else:
             return list(self.servers.values())
 
+    def rank_servers(
+        self,
+        key_tags: Optional[Dict[str, List[str]]] = None,
+        key_tag_mode: KeyTagMode = KeyTagMode.ANY,
+    ):
+        """
+        Returns (server_name, server) pairs for the servers satisfying key_tags (all
+        servers if key_tags is not provided), best first by observed health. See
+        ServerHealth.rank.
+        """
+        with Lok.lock:
+            if key_tags:
+                server_names = self.get_server_index().select(
+                    key_tags=key_tags, key_tag_mode=key_tag_mode
+                )
+            else:
+                server_names = list(self.servers)
+            servers = {name: self.servers[name] for name in server_names}
+        return [(name, servers[name]) for name in self._server_health.rank(servers)]
+
+    def get_server_health(self):
+        return self._server_health.describe()
+
     def execute_on_server(
         self,
         server_name: str,
@@ -710,10 +1353,7 @@ class Dispatcher(BaseModel):
         ):
             return self.execute_action(action_name)
         else:
-            response = Http(host=server.host, port=server.port).get(
-                f"/actions/{action_name}/execute"
-            )
-            return resolve_rez(response)
+            return Peer(host=server.host, port=server.port).execute_action(action_name)
 
     def execute_on_server_with_rez(self, server_name: str, action_name: str, rez: Rez):
         server = self.get_server(server_name=server_name)
@@ -723,10 +1363,8 @@ class Dispatcher(BaseModel):
         ):
             return self.execute_action_with_rez(action_name=action_name, rez=rez)
         else:
-            response = Http(host=server.host, port=server.port).post(
-                f"/actions/{action_name}/execute", rez
-            )
-            return resolve_rez(response)
+            peer = Peer(host=server.host, port=server.port)
+            return peer.execute_action(action_name, rez=rez)
 
     def execute_on_servers(
         self, action_name: str, key_tags: Dict[str, List[str]], key_tag_mode: KeyTagMode
@@ -742,10 +1380,8 @@ class Dispatcher(BaseModel):
                 exec_rez = self.execute_action(action_name)
                 result.append(exec_rez)
             else:
-                response = Http(host=server.host, port=server.port).get(
-                    f"/actions/{action_name}/execute"
-                )
-                result.append(resolve_rez(response))
+                peer = Peer(host=server.host, port=server.port)
+                result.append(peer.execute_action(action_name))
         return result
 
     def execute_on_servers_with_rez(
@@ -768,17 +1404,127 @@ class Dispatcher(BaseModel):
                 )
                 result.append(exec_rez)
             else:
-                response = Http(host=server.host, port=server.port).post(
-                    f"/actions/{action_name}/execute", rez
-                )
-                result.append(resolve_rez(response))
+                peer = Peer(host=server.host, port=server.port)
+                result.append(peer.execute_action(action_name, rez=rez))
         return result
 
+    # partitioning
+    @leading
+    def set_partition(self, partition: Optional[Partition]):
+        """
+        Partitions scheduled actions across servers (see Partition), or stops
+        partitioning if partition is None. Every server in the partition needs
+        the same servers and partition, e.g. through replace_all or apply_changes.
+        """
+        with Lok.lock:
+            self.partition = partition
+            self.forget_partitioning()
+            self.save_current()
+
+    def get_partition(self):
+        return self.partition
+
+    def get_hash_ring(self):
+        """
+        Returns the HashRing over the partition's servers, built once per revision.
+        """
+        cached = self._hash_ring
+        if cached is None or cached[0] != self.get_revision():
+            with Lok.lock:
+                cached = self._hash_ring
+                revision = self.get_revision()
+                if cached is None or cached[0] != revision:
+                    cached = self._hash_ring = (revision, self.compute_hash_ring())
+        return cached[1]
+
+    def compute_hash_ring(self):
+        server_names = self.get_server_index().select(
+            key_tags=self.partition.key_tags, key_tag_mode=self.partition.key_tag_mode
+        )
+        return HashRing(sorted(server_names), replicas=self.partition.replicas)
+
+    def get_local_server_names(self):
+        """
+        Returns the names of the servers that are this process (see SystemInfo).
+        """
+        cached = self._local_server_names
+        if cached is None or cached[0] != self.get_revision():
+            with Lok.lock:
+                cached = self._local_server_names
+                revision = self.get_revision()
+                if cached is None or cached[0] != revision:
+                    cached = self._local_server_names = (
+                        revision,
+                        self.compute_local_server_names(),
+                    )
+        return cached[1]
+
+    def compute_local_server_names(self):
+        host, port = SystemInfo.get()["host"], SystemInfo.get()["port"]
+        return {
+            server_name
+            for server_name, server in self.servers.items()
+            if server.host == host and server.port == port
+        }
+
+    def forget_partitioning(self):
+        """
+        Drops the hash ring and local server names, rebuilt on their next use.
+        """
+        self._hash_ring = None
+        self._local_server_names = None
+
+    def partition_owner(self, scheduler_name: str, action_name: str):
+        """
+        Returns the name of the server owning the scheduler:action pair; None if
+        there's no partition or no server qualifies for it.
+        """
+        if not self.partition:
+            return None
+        return self.get_hash_ring().owner(f"{scheduler_name}:{action_name}")
+
+    def owns(self, scheduler_name: str, action_name: str):
+        """
+        Whether this process runs the scheduler:action pair. Unowned pairs run
+        everywhere, as without a partition.
+        """
+        owner = self.partition_owner(scheduler_name, action_name)
+        return owner is None or owner in self.get_local_server_names()
+
+    def get_partition_assignments(self):
+        """
+        Returns the scheduled scheduler:action pairs by owning server name.
+        """
+        with Lok.lock:
+            assignments = {}
+            for scheduler_name in self.scheduled_actions.scheduler_names():
+                for action_name in self.scheduled_actions.actions(scheduler_name):
+                    owner = self.partition_owner(scheduler_name, action_name)
+                    if owner:
+                        assignments.setdefault(owner, []).append(
+                            f"{scheduler_name}:{action_name}"
+                        )
+            return assignments
+
     # scheduling
+    @leading
     def schedule_action(self, scheduler_name: str, action_name: str):
         """
         Puts the scheduler/action into active processing. The scheduled_action
-        dictionary mirrors the successful scheduling of actions.
+        dictionary mirrors the successful scheduling of actions. Under an
+        Immediately scheduler the action executes once, after Lok.lock is released
+        (see stage_action).
+        """
+        immediate = self.stage_action(scheduler_name, action_name)
+        if immediate:
+            immediate()
+
+    def stage_action(self, scheduler_name: str, action_name: str):
+        """
+        Schedules the scheduler/action under Lok.lock. Under an Immediately scheduler
+        it returns the execution instead, for the caller to run once the lock is
+        released: the action may reach the Dispatcher from other threads (e.g.
+        Parallel members running ScheduleAction), which would wait on the lock.
         """
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -789,23 +1535,10 @@ class Dispatcher(BaseModel):
             elif isinstance(
                 scheduler, Immediately
             ):  # executes once; does not participate in scheduling
-                tag = f"{scheduler_name}:{action_name}"
-                action = self.get_action(action_name)
-                try:
-                    result = action.execute(tag=tag)
-                    log_action_result(
-                        calling_logger=logger,
-                        calling_object=self,
-                        tag="",
-                        action=action,
-                        result=result,
-                    )
-                except Exception as exception:
-                    logger.exception(
-                        f"Execution: tag ({tag}); error while executing action ({action})",
-                        exc_info=exception,
-                    )
-                return
+                plan = self.get_plan(action_name)
+                return lambda: self.execute_immediately(
+                    f"{scheduler_name}:{action_name}", action_name, plan
+                )
             action_names = self.scheduled_actions.actions(scheduler_name)
             if action_name in action_names:
                 return  # don't need to schedule
@@ -822,6 +1555,26 @@ class Dispatcher(BaseModel):
                     )
             self.save_current()
 
+    def execute_immediately(self, tag: str, action_name: str, plan: Plan):
+        action = plan.action
+        try:
+            result = execute_recorded(
+                action, tag=tag, action_name=action_name, execute=plan.execute
+            )
+            log_action_result(
+                calling_logger=logger,
+                calling_object=self,
+                tag="",
+                action=action,
+                result=result,
+            )
+        except Exception as exception:
+            logger.exception(
+                f"Execution: tag ({tag}); error while executing action ({action})",
+                exc_info=exception,
+            )
+
+    @leading
     def unschedule_scheduler_action(self, scheduler_name: str, action_name: str):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -839,6 +1592,7 @@ class Dispatcher(BaseModel):
                 scheduler.unschedule(scheduler_name_to_unschedule)
             self.save_current()
 
+    @leading
     def unschedule_scheduler(self, scheduler_name: str):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -849,11 +1603,13 @@ class Dispatcher(BaseModel):
             self.scheduled_actions.delete_scheduler(scheduler_name)
             self.save_current()
 
+    @leading
     def unschedule_all_schedulers(self):
         with Lok.lock:
             for scheduler_name in self.scheduled_actions.scheduler_names():
                 self.unschedule_scheduler(scheduler_name)
 
+    @leading
     def reschedule_scheduler(self, scheduler_name: str):
         with Lok.lock:
             self.check_scheduler_name(scheduler_name)
@@ -867,6 +1623,7 @@ class Dispatcher(BaseModel):
                 ),
             )
 
+    @leading
     def reschedule_all_schedulers(self):
         with Lok.lock:
             for scheduler_name in self.scheduled_actions.scheduler_names():
@@ -879,6 +1636,7 @@ class Dispatcher(BaseModel):
             return self.scheduled_actions.action_count()
 
     # defer scheduler/action
+    @leading
     def defer_action(self, scheduler_name: str, action_name: str, wait_until: datetime):
         """
         This method defers the start of scheduling an action. The data structure is a dictionary
@@ -902,12 +1660,20 @@ class Dispatcher(BaseModel):
         time and schedules them using the associated scheduler. See the
         defer_action and initialize methods for more details.
         """
+        immediates = []
+
+        def stage(scheduler_name: str, action_name: str):
+            immediates.append(self.stage_action(scheduler_name, action_name))
+
         with Lok.lock:
-            self.deferred_scheduled_actions.check_for_dated_actions(
-                schedule_update_thunk=self.schedule_action,
-                verb="schedule",
-            )
-            self.save_current()
+            # most checks find nothing due; they skip serializing the state
+            if self.deferred_scheduled_actions.check_for_dated_actions(
+                schedule_update_thunk=stage, verb="schedule"
+            ):
+                self.save_current()
+        for immediate in immediates:
+            if immediate:
+                immediate()
 
     def get_deferred_action_count(self):
         # returns the total number of actions in the deferred actions dictionary (a dictionary
@@ -915,12 +1681,14 @@ class Dispatcher(BaseModel):
         with Lok.lock:
             return self.deferred_scheduled_actions.action_count()
 
+    @leading
     def clear_all_deferred_actions(self):
         with Lok.lock:
             self.deferred_scheduled_actions.clear()
             self.save_current()
 
     # expire scheduler/action
+    @leading
     def expire_action(self, scheduler_name: str, action_name: str, expire_on: datetime):
         """
         This method expires an action with scheduler. The data structure is a dictionary
@@ -946,11 +1714,11 @@ class Dispatcher(BaseModel):
         See the expire_action and initialize methods for more details.
         """
         with Lok.lock:
-            self.expiring_scheduled_actions.check_for_dated_actions(
+            if self.expiring_scheduled_actions.check_for_dated_actions(
                 schedule_update_thunk=self.unschedule_scheduler_action,
                 verb="unschedule",
-            )
-            self.save_current()
+            ):
+                self.save_current()
 
     def get_expiring_action_count(self):
         # returns the total number of actions in the deferred actions dictionary (a dictionary
@@ -958,6 +1726,7 @@ class Dispatcher(BaseModel):
         with Lok.lock:
             return self.expiring_scheduled_actions.action_count()
 
+    @leading
     def clear_all_expiring_actions(self):
         with Lok.lock:
             self.expiring_scheduled_actions.clear()
@@ -1017,6 +1786,7 @@ class Dispatcher(BaseModel):
             deferred_scheduled_actions = dictionary["deferred_scheduled_actions"]
             expiring_scheduled_actions = dictionary["expiring_scheduled_actions"]
             deferred_programs = dictionary["deferred_programs"]
+            partition = dictionary.get("partition", None)
             # replace key's value for each key...
             for action_name in actions:
                 actions[action_name] = resolve_action(actions[action_name])
@@ -1038,9 +1808,82 @@ class Dispatcher(BaseModel):
                 deferred_scheduled_actions=deferred_scheduled_actions,
                 expiring_scheduled_actions=expiring_scheduled_actions,
                 deferred_programs=deferred_programs,
+                partition=partition,
             )
 
 
+class MeteredLock:
+    """
+    An RLock that observes how long acquiring it waits (see metrics.lock_wait).
+    Uncontended acquisitions are observed as waiting 0 without reading the clock.
+
+    While profiling (see Lok.start_profile), the outermost acquisitions by
+    `with` also observe their wait and how long the lock is held per call site,
+    the name of the function holding the lock (see metrics.lock_site_wait and
+    metrics.lock_site_hold). The holder's state is kept on the lock since only the
+    holding thread changes it.
+    """
+
+    __slots__ = ("lock", "depth", "site", "held_since")
+    profiling = False
+
+    def __init__(self):
+        self.lock = RLock()
+        self.depth = 0  # profiled acquisitions held
+        self.site = None
+        self.held_since = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1):
+        if self.lock.acquire(False):
+            metrics.lock_wait.observe(0.0)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self.lock.acquire(True, timeout)
+        if acquired:
+            metrics.lock_wait.observe(time.perf_counter() - start)
+        return acquired
+
+    def acquire_profiled(self, site: str):
+        start = time.perf_counter()
+        if self.lock.acquire(False):
+            wait = 0.0
+        else:
+            self.lock.acquire()
+            wait = time.perf_counter() - start
+        metrics.lock_wait.observe(wait)
+        if self.depth == 0:
+            metrics.lock_site_wait.observe(wait, site)
+            self.site = site
+            self.held_since = time.perf_counter()
+        self.depth += 1
+        return True
+
+    def release(self):
+        if self.depth:
+            self.depth -= 1
+            if self.depth == 0:
+                metrics.lock_site_hold.observe(
+                    time.perf_counter() - self.held_since, self.site
+                )
+        self.lock.release()
+
+    def __enter__(self):
+        if MeteredLock.profiling:
+            return self.acquire_profiled(sys._getframe(1).f_code.co_name)
+        if self.lock.acquire(False):
+            metrics.lock_wait.observe(0.0)
+            return True
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        if self.depth:
+            self.release()
+        else:
+            self.lock.release()
+
+
 class Lok:
     """
     usage:
@@ -1050,27 +1893,129 @@ class Lok:
         singleton
     """
 
-    lock = RLock()
+    lock = MeteredLock()
 
     @classmethod
     def reset(cls):
-        cls.lock = RLock()
+        cls.lock = MeteredLock()
+
+    @classmethod
+    def start_profile(cls):
+        """
+        Starts (over) the per call site profile of the lock's waits and holds.
+        """
+        metrics.lock_site_wait.clear()
+        metrics.lock_site_hold.clear()
+        MeteredLock.profiling = True
+
+    @classmethod
+    def stop_profile(cls):
+        """
+        Stops profiling; the profile is kept until the next start.
+        """
+        MeteredLock.profiling = False
+
+    @classmethod
+    def dump(cls):
+        """
+        Returns the profile per call site, longest total hold first: the number of
+        acquisitions and, for their waits and holds, the total, the mean and
+        the bucket bounds (seconds) of the median, 90th and 99th percentiles.
+        """
+        waits = metrics.lock_site_wait.summaries()
+        holds = metrics.lock_site_hold.summaries()
+        sites = sorted(
+            set(waits) | set(holds),
+            key=lambda site: -holds.get(site, {}).get("total", 0.0),
+        )
+        return {
+            "profiling": MeteredLock.profiling,
+            "sites": {
+                site: {
+                    "acquisitions": waits.get(site, {}).get("count", 0),
+                    "wait": waits.get(site, None),
+                    "hold": holds.get(site, None),
+                }
+                for site in sites
+            },
+        }
 
 
 class DispatcherSingleton:
+    """
+    Holds the process's Dispatcher. Processes sharing a saved_dir elect a leader with
+    a lock on saved_dir/leader.lock, into which the leader writes its identity. The
+    leader runs the jobs and the out-of-band checks and writes current.json. A
+    standby runs neither, doesn't write and rejects changes with the leader's
+    identity (see StandbyException); it reloads current.json whenever the leader
+    changes it, and takes over within standby_interval seconds of the leader exiting.
+    """
+
     # this call returns the standard non-test Data singleton
     dispatcher = None
+    leader_lock = None
+    standby_interval = 1.0
 
     @classmethod
     def get(cls):
         if not cls.dispatcher:
-            cls.dispatcher = Dispatcher(saved_dir=Dirs.saved_dir())
+            saved_dir = Dirs.saved_dir()
+            cls.dispatcher = Dispatcher(saved_dir=saved_dir)
             try:
                 cls.dispatcher = cls.dispatcher.load_current()
-            except Exception as exception:
-                logger.error("error loading dispatcher from disk", exception)
+            except Exception:
+                logger.exception("error loading dispatcher from disk")
             cls.dispatcher.set_timed(Timed.get())
-            cls.dispatcher.initialize()
-            cls.dispatcher.reschedule_all_schedulers()
-            cls.dispatcher.run_jobs()
+            cls.dispatcher.initialize(run_checks=False)
+            cls.leader_lock = FileLock(os.path.join(saved_dir, "leader.lock"))
+            if cls.leader_lock.acquire():
+                cls.lead()
+            else:
+                leader = cls.leader_lock.read() or "unknown"
+                logger.info("%s leads; standing by", leader)
+                cls.dispatcher.set_standby(leader)
+                Thread(target=cls.stand_by, name="whendo-standby", daemon=True).start()
         return cls.dispatcher
+
+    @classmethod
+    def identity(cls):
+        """
+        e.g. myhost:8000 (pid 1234); the port once SystemInfo is initialized
+        """
+        system_info = SharedRWs.singletons.get("system_info", None)
+        port = f":{system_info.data['port']}" if system_info else ""
+        return f"{socket.gethostname()}{port} (pid {os.getpid()})"
+
+    @classmethod
+    def lead(cls):
+        cls.leader_lock.write(cls.identity())
+        cls.dispatcher.set_standby(None)
+        cls.dispatcher.run_checks()
+        cls.dispatcher.reschedule_all_schedulers()
+        cls.dispatcher.run_jobs()
+
+    @classmethod
+    def stand_by(cls):
+        """
+        Follows current.json until the leader lock is acquired, then leads.
+        """
+        dispatcher = cls.dispatcher
+        path = dispatcher.get_saved_dir() + "current.json"
+        followed = None
+        while True:
+            leading = cls.leader_lock.acquire()
+            try:
+                stat = os.stat(path)
+                version = (stat.st_mtime_ns, stat.st_size)
+                if version != followed:
+                    dispatcher.follow(dispatcher.load_from_name("current"))
+                    followed = version
+                if not leading:
+                    dispatcher.set_standby(cls.leader_lock.read() or "unknown")
+            except Exception:
+                logger.exception("error following (%s)", path)
+            if leading:
+                logger.info("leader lock acquired; leading")
+                cls.lead()
+                return
+            time.sleep(cls.standby_interval)
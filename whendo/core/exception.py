@@ -4,3 +4,17 @@ class TerminateSchedulerException(Exception):
 
     def __str__(self):
         return repr(self.value)
+
+
+class StandbyException(Exception):
+    """
+    Raised by changes asked of a standby Dispatcher (see DispatcherSingleton);
+    leader identifies the process holding the leader lock.
+    """
+
+    def __init__(self, leader):
+        super().__init__(leader)
+        self.leader = leader
+
+    def __str__(self):
+        return f"standing by; changes go to the leader ({self.leader})"
@@ -5,9 +5,13 @@ the named scheduler are executed.
 """
 
 from typing import Callable
+from time import perf_counter
 import logging
 from .exception import TerminateSchedulerException
 from .action import log_action_result
+from .history import execute_recorded
+from . import metrics
+from whendo.log.sampling import LogSampling
 
 logger = logging.getLogger(__name__)
 
@@ -27,23 +31,36 @@ class Executor:
         for action_name in actions_dictionary:
             tag = f"{scheduler_name}:{action_name}"
             action = actions_dictionary[action_name]
+            start = perf_counter()
+            held = LogSampling.held.set([]) if LogSampling.enabled else None
             try:
-                result = action.execute(tag=tag)
+                result = execute_recorded(action, tag=tag, action_name=action_name)
+                duration = perf_counter() - start
+                metrics.action_duration.observe(duration, action_name)
                 log_action_result(
                     calling_logger=logger,
                     calling_object=self,
                     tag=tag,
                     action=action,
                     result=result,
+                    duration=duration,
                 )
 
             except TerminateSchedulerException as terminate:
+                LogSampling.release(True)
                 self.unschedule_scheduler_thunk(scheduler_name)
                 logger.info(
                     f"Executor: tag ({tag}); unscheduled scheduler ({scheduler_name}); TerminateSchedulerException raised ({str(terminate)})"
                 )
             except Exception as exception:
+                duration = perf_counter() - start
+                metrics.action_duration.observe(duration, action_name)
+                if LogSampling.enabled:
+                    LogSampling.release(LogSampling.admit(tag, duration, failed=True))
                 logger.exception(
                     f"Executor: tag ({tag}); error while executing action ({action})",
                     exc_info=exception,
                 )
+            finally:
+                if held is not None:
+                    LogSampling.held.reset(held)
@@ -0,0 +1,268 @@
+"""
+The recent executions of this process: a fixed-size ring of execution records
+(tag, action name, start, duration, success, short result summary), filled by the
+Executor, the Dispatcher's execute methods and the actions of composite actions.
+
+The ring is indexed by tag, by status and by both. An index holds the sequence
+numbers of its records in the order they finished, so a query reads one index from
+the first record finished since the requested time: its cost is that of the records
+it returns. Index entries of records overwritten in the ring are dropped lazily.
+
+Records can also be handed to a sink as they're made, e.g. the durable HistoryStore.
+
+usage:
+    ExecutionHistory.get().query(tag="heartbeat:ping", status="failure")
+"""
+
+import reprlib
+from contextvars import ContextVar
+from datetime import datetime
+from threading import Lock
+from time import perf_counter, time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+from .exception import TerminateSchedulerException
+
+SUCCESS = "success"
+FAILURE = "failure"
+
+# the id of the invocation the executing actions belong to: the caller's idempotency
+# key (see Dispatcher.execute_idempotently) or one per outermost execution
+invocation: ContextVar = ContextVar("invocation", default=None)
+
+
+class ExecutionHistory:
+    instance = None
+    capacity = 10000
+    summary_length = 120
+    # also receives each record, e.g. HistoryStore.add
+    sink: Optional[Callable[[tuple], None]] = None
+
+    @classmethod
+    def get(cls):
+        if not cls.instance:
+            cls.instance = ExecutionHistory(capacity=cls.capacity)
+        return cls.instance
+
+    def __init__(self, capacity: int = 10000):
+        assert capacity > 0, f"capacity ({capacity}) must be positive"
+        self.capacity = capacity
+        # (seq, finished, tag, action_name, started, duration, success, summary)
+        self.records: List[Optional[tuple]] = [None] * capacity
+        self.seq = 0  # sequence number of the next record
+        self.finished = 0.0  # finish time of the last record
+        # key -> [first live position, seq, seq, ...]
+        self.indexes: Dict[Any, List[int]] = {}
+        self.lock = Lock()
+
+    def record(
+        self,
+        tag: Optional[str],
+        action_name: str,
+        started: float,
+        duration: float,
+        result: Any = None,
+        exception: Optional[Exception] = None,
+    ):
+        """
+        Records an execution that started at started (time.time()) and took
+        duration seconds, with its result or exception.
+        """
+        success = exception is None
+        if success:
+            summary = reprlib.repr(getattr(result, "result", result))
+        else:
+            summary = f"{exception.__class__.__name__}: {exception}"
+        summary = summary[: self.summary_length]
+        tag = tag or ""
+        status = SUCCESS if success else FAILURE
+        with self.lock:
+            seq = self.seq
+            self.seq += 1
+            # finish times are kept in order so the indexes can be bisected
+            self.finished = max(self.finished, time())
+            record = (
+                seq,
+                self.finished,
+                tag,
+                action_name,
+                started,
+                duration,
+                success,
+                summary,
+            )
+            self.records[seq % self.capacity] = record
+            for key in (("tag", tag), ("status", status), ("tag", tag, status)):
+                index = self.indexes.get(key, None)
+                if index is None:
+                    index = self.indexes[key] = [1]
+                index.append(seq)
+                self.prune(index)
+            if seq % self.capacity == self.capacity - 1:
+                self.sweep()
+        sink = ExecutionHistory.sink
+        if sink:
+            sink(record)
+
+    def prune(self, index: List[int]):
+        """
+        Drops the entries of overwritten records from the front of an index.
+        """
+        floor = self.seq - self.capacity
+        position = index[0]
+        while position < len(index) and index[position] < floor:
+            position += 1
+        if position > len(index) // 2:
+            del index[1:position]
+            position = 1
+        index[0] = position
+
+    def sweep(self):
+        """
+        Prunes every index; drops the indexes without live records.
+        """
+        for key in list(self.indexes):
+            index = self.indexes[key]
+            self.prune(index)
+            if index[0] == len(index):
+                del self.indexes[key]
+
+    def query(
+        self,
+        tag: Optional[str] = None,
+        since: Optional[datetime] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ):
+        """
+        Returns the records, oldest first, of tag (if provided) and status ("success"
+        or "failure", if provided) finished at or after since (if provided); at
+        most the newest limit of them if limit is provided.
+        """
+        assert status in (None, SUCCESS, FAILURE), f"unknown status ({status})"
+        with self.lock:
+            floor = self.seq - self.capacity
+            if tag is None and status is None:
+                seqs = range(max(floor, 0), self.seq)
+                start = 0
+            else:
+                key = (
+                    ("status", status)
+                    if tag is None
+                    else (("tag", tag) if status is None else ("tag", tag, status))
+                )
+                index = self.indexes.get(key, [1])
+                self.prune(index)
+                seqs = index
+                start = index[0]
+            if since is not None:
+                start = self.first_since(seqs, start, since.timestamp())
+            if limit is not None:
+                start = max(start, len(seqs) - limit)
+            records = [self.records[seq % self.capacity] for seq in seqs[start:]]
+        return [
+            {
+                "tag": record[2],
+                "action_name": record[3],
+                "start": datetime.fromtimestamp(record[4]),
+                "duration": record[5],
+                "status": SUCCESS if record[6] else FAILURE,
+                "summary": record[7],
+            }
+            for record in records
+        ]
+
+    def first_since(self, seqs, start: int, since: float):
+        """
+        The position of the first of seqs[start:] finished at or after since.
+        """
+        end = len(seqs)
+        while start < end:
+            middle = (start + end) // 2
+            if self.records[seqs[middle] % self.capacity][1] < since:
+                start = middle + 1
+            else:
+                end = middle
+        return start
+
+    def clear(self):
+        with self.lock:
+            self.records = [None] * self.capacity
+            self.indexes.clear()
+            self.seq = 0
+
+    def info(self):
+        with self.lock:
+            return {
+                "capacity": self.capacity,
+                "recorded": self.seq,
+                "size": min(self.seq, self.capacity),
+                "indexes": len(self.indexes),
+            }
+
+
+def execute_recorded(
+    action,
+    tag: str = None,
+    rez=None,
+    action_name: str = None,
+    execute: Callable = None,
+):
+    """
+    Executes action (by calling execute(tag=tag, rez=rez) if provided), recording
+    the execution in the ExecutionHistory under tag and action_name (the action's
+    class name if not provided). A TerminateSchedulerException is the action asking
+    for its scheduler's end rather than failing: it's recorded as a success. An
+    outermost execution starts an invocation (see invoked).
+    """
+    if invocation.get() is None:
+        return invoked(
+            uuid4().hex,
+            execute_recorded,
+            action,
+            tag=tag,
+            rez=rez,
+            action_name=action_name,
+            execute=execute,
+        )
+    started = time()
+    start = perf_counter()
+    try:
+        result = (execute or action.execute)(tag=tag, rez=rez)
+    except TerminateSchedulerException as terminate:
+        ExecutionHistory.get().record(
+            tag,
+            action_name or action.__class__.__name__,
+            started,
+            perf_counter() - start,
+            result=f"terminated ({terminate})",
+        )
+        raise
+    except Exception as exception:
+        ExecutionHistory.get().record(
+            tag,
+            action_name or action.__class__.__name__,
+            started,
+            perf_counter() - start,
+            exception=exception,
+        )
+        raise
+    ExecutionHistory.get().record(
+        tag,
+        action_name or action.__class__.__name__,
+        started,
+        perf_counter() - start,
+        result=result,
+    )
+    return result
+
+
+def invoked(invocation_id: str, callable: Callable, *args, **kwargs):
+    """
+    Calls callable with the executions it makes belonging to invocation_id.
+    """
+    token = invocation.set(invocation_id)
+    try:
+        return callable(*args, **kwargs)
+    finally:
+        invocation.reset(token)
@@ -0,0 +1,319 @@
+"""
+Durable execution history: a local SQLite database under Dirs.saved_dir() that keeps
+weeks of the records of the ExecutionHistory for capacity planning.
+
+Recording an execution only appends it to a pending list; a background thread
+inserts the pending records in batches, every flush_interval seconds or as soon as
+batch_size of them are waiting, and deletes the records older than retention_days
+once an hour. The records are indexed by tag, action name, time and outcome. When
+the writer falls behind by more than max_pending records, the oldest are dropped and
+counted rather than slowing the executions down; a batch that fails to insert is
+also counted as dropped, and the error logged.
+
+stats aggregates the stored records per time bucket: counts, failures and latency
+(mean, max and the 50th, 90th and 99th nearest-rank percentiles).
+
+usage:
+    HistoryStore.enable(server="localhost:8000", retention_days=30)
+    HistoryStore.get().stats(action_name="heartbeat", bucket=3600)
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+from collections import deque
+from datetime import datetime
+from threading import Event, Lock, Thread
+from time import monotonic, time
+from typing import Deque, Optional
+from .history import ExecutionHistory, SUCCESS, FAILURE
+from .util import Dirs
+
+logger = logging.getLogger(__name__)
+
+schema = [
+    """
+    CREATE TABLE IF NOT EXISTS executions (
+        finished REAL NOT NULL,
+        started REAL NOT NULL,
+        duration REAL NOT NULL,
+        tag TEXT NOT NULL,
+        action_name TEXT NOT NULL,
+        server TEXT NOT NULL,
+        success INTEGER NOT NULL,
+        summary TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS executions_finished ON executions (finished)",
+    "CREATE INDEX IF NOT EXISTS executions_tag ON executions (tag, finished)",
+    "CREATE INDEX IF NOT EXISTS executions_action ON executions (action_name, finished)",
+    "CREATE INDEX IF NOT EXISTS executions_outcome ON executions (success, finished)",
+]
+
+# nearest-rank percentiles: the smallest duration whose rank reaches p * count
+stats_query = """
+    WITH ranked AS (
+        SELECT
+            CAST(finished / :bucket AS INTEGER) AS bucket,
+            duration,
+            success,
+            ROW_NUMBER() OVER (
+                PARTITION BY CAST(finished / :bucket AS INTEGER) ORDER BY duration
+            ) AS rank,
+            COUNT(*) OVER (PARTITION BY CAST(finished / :bucket AS INTEGER)) AS total
+        FROM executions
+        WHERE {conditions}
+    )
+    SELECT
+        bucket,
+        COUNT(*),
+        COUNT(*) - SUM(success),
+        AVG(duration),
+        MAX(duration),
+        MIN(CASE WHEN rank >= 0.5 * total THEN duration END),
+        MIN(CASE WHEN rank >= 0.9 * total THEN duration END),
+        MIN(CASE WHEN rank >= 0.99 * total THEN duration END)
+    FROM ranked
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+
+class HistoryStore:
+    instance = None
+    prune_interval = 3600.0
+    # whether disable runs at exit; registered by the first enable
+    exit_registered = False
+
+    @classmethod
+    def get(cls):
+        assert (
+            cls.instance
+        ), "the execution history store isn't enabled (see run.py --history-store)"
+        return cls.instance
+
+    @classmethod
+    def enable(
+        cls,
+        path: str = None,
+        server: str = "",
+        retention_days: float = 30.0,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_pending: int = 100000,
+    ):
+        """
+        Starts storing the records of the ExecutionHistory in the database at path
+        (history.db under Dirs.saved_dir() if not provided) under the name of this
+        server.
+        """
+        cls.disable()
+        cls.instance = HistoryStore(
+            path=path or os.path.join(Dirs.saved_dir(), "history.db"),
+            server=server,
+            retention_days=retention_days,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_pending=max_pending,
+        )
+        ExecutionHistory.sink = cls.instance.add
+        if not cls.exit_registered:
+            atexit.register(cls.disable)
+            cls.exit_registered = True
+        return cls.instance
+
+    @classmethod
+    def disable(cls):
+        """
+        Writes the pending records and stops storing.
+        """
+        if cls.instance:
+            ExecutionHistory.sink = None
+            cls.instance.close()
+            cls.instance = None
+
+    def __init__(
+        self,
+        path: str,
+        server: str = "",
+        retention_days: float = 30.0,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_pending: int = 100000,
+    ):
+        self.path = path
+        self.server = server
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # the oldest records fall off the front when the writer falls behind
+        self.pending: Deque[tuple] = deque(maxlen=max_pending)
+        self.written = 0
+        self.dropped = 0
+        self.pruned = monotonic()
+        self.lock = Lock()  # guards pending and the counts
+        self.write_lock = Lock()  # serializes the uses of the writer connection
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            for statement in schema:
+                self.connection.execute(statement)
+        self.wake = Event()
+        self.stopping = Event()
+        self.writer = Thread(target=self.run, name="whendo-history", daemon=True)
+        self.writer.start()
+
+    def add(self, record: tuple):
+        """
+        Queues an ExecutionHistory record:
+        (seq, finished, tag, action_name, started, duration, success, summary)
+        """
+        _, finished, tag, action_name, started, duration, success, summary = record
+        with self.lock:
+            if len(self.pending) == self.max_pending:
+                self.dropped += 1
+            self.pending.append(
+                (
+                    finished,
+                    started,
+                    duration,
+                    tag,
+                    action_name,
+                    self.server,
+                    int(success),
+                    summary,
+                )
+            )
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+                if monotonic() - self.pruned >= self.prune_interval:
+                    self.prune()
+            except Exception as exception:
+                # e.g. a full disk or a locked database; keeps writing later records
+                logger.exception(
+                    f"HistoryStore: error while writing to ({self.path})",
+                    exc_info=exception,
+                )
+
+    def flush(self):
+        """
+        Inserts the pending records; those that fail to insert are counted as
+        dropped.
+        """
+        with self.write_lock:
+            with self.lock:
+                batch = list(self.pending)
+                self.pending.clear()
+            if batch:
+                try:
+                    with self.connection:
+                        self.connection.executemany(
+                            "INSERT INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                except Exception:
+                    with self.lock:
+                        self.dropped += len(batch)
+                    raise
+                with self.lock:
+                    self.written += len(batch)
+
+    def prune(self, before: Optional[float] = None):
+        """
+        Deletes the records finished before before (time.time(); retention_days ago
+        if not provided); returns how many.
+        """
+        if before is None:
+            before = time() - self.retention_days * 86400
+        with self.write_lock:
+            self.pruned = monotonic()
+            with self.connection:
+                return self.connection.execute(
+                    "DELETE FROM executions WHERE finished < ?", (before,)
+                ).rowcount
+
+    def close(self):
+        self.stopping.set()
+        self.wake.set()
+        self.writer.join()
+        self.flush()
+        self.connection.close()
+
+    def stats(
+        self,
+        tag: Optional[str] = None,
+        action_name: Optional[str] = None,
+        server: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        bucket: float = 3600.0,
+    ):
+        """
+        Returns, oldest first, a summary of each bucket (seconds, aligned to the
+        epoch) of the stored records matching the provided tag, action name, server
+        and status that finished at or after since and before until.
+        """
+        assert status in (None, SUCCESS, FAILURE), f"unknown status ({status})"
+        assert bucket > 0, f"bucket ({bucket}) must be positive"
+        conditions = ["1"]
+        parameters = {"bucket": bucket}
+        for column, value in (
+            ("tag", tag),
+            ("action_name", action_name),
+            ("server", server),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = :{column}")
+                parameters[column] = value
+        if status is not None:
+            conditions.append("success = :success")
+            parameters["success"] = int(status == SUCCESS)
+        if since is not None:
+            conditions.append("finished >= :since")
+            parameters["since"] = since.timestamp()
+        if until is not None:
+            conditions.append("finished < :until")
+            parameters["until"] = until.timestamp()
+        self.flush()
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute(
+                stats_query.format(conditions=" AND ".join(conditions)), parameters
+            ).fetchall()
+        finally:
+            connection.close()
+        return [
+            {
+                "start": datetime.fromtimestamp(row[0] * bucket),
+                "count": row[1],
+                "failures": row[2],
+                "mean": row[3],
+                "max": row[4],
+                "p50": row[5],
+                "p90": row[6],
+                "p99": row[7],
+            }
+            for row in rows
+        ]
+
+    def info(self):
+        with self.lock:
+            return {
+                "path": self.path,
+                "server": self.server,
+                "retention_days": self.retention_days,
+                "pending": len(self.pending),
+                "written": self.written,
+                "dropped": self.dropped,
+            }
@@ -18,6 +18,8 @@ class DispatcherHooks:
     get_servers_thunk: Callable
     get_servers_by_tags_thunk: Callable
     get_action_thunk: Callable
+    rank_servers_thunk: Callable
+    get_server_health_thunk: Callable
     clear_all_scheduling_thunk: Callable
     unschedule_all_schedulers_thunk: Callable
     get_scheduling_info_thunk: Callable
@@ -40,6 +42,8 @@ class DispatcherHooks:
         get_servers_thunk: Callable,
         get_servers_by_tags_thunk: Callable,
         get_action_thunk: Callable,
+        rank_servers_thunk: Callable,
+        get_server_health_thunk: Callable,
         clear_all_scheduling_thunk: Callable,
         unschedule_all_schedulers_thunk: Callable,
         get_scheduling_info_thunk: Callable,
@@ -59,6 +63,8 @@ class DispatcherHooks:
         cls.get_servers_thunk = get_servers_thunk
         cls.get_servers_by_tags_thunk = get_servers_by_tags_thunk
         cls.get_action_thunk = get_action_thunk
+        cls.rank_servers_thunk = rank_servers_thunk
+        cls.get_server_health_thunk = get_server_health_thunk
         cls.clear_all_scheduling_thunk = clear_all_scheduling_thunk
         cls.unschedule_all_schedulers_thunk = unschedule_all_schedulers_thunk
         cls.get_scheduling_info_thunk = get_scheduling_info_thunk
@@ -138,6 +144,18 @@ class DispatcherHooks:
     def get_action(cls, action_name: str):
         return cls.get_action_thunk(action_name=action_name)
 
+    @classmethod
+    def rank_servers(
+        cls,
+        key_tags: Optional[Dict[str, Set[str]]] = None,
+        key_tag_mode: KeyTagMode = KeyTagMode.ANY,
+    ):
+        return cls.rank_servers_thunk(key_tags=key_tags, key_tag_mode=key_tag_mode)
+
+    @classmethod
+    def get_server_health(cls):
+        return cls.get_server_health_thunk()
+
     @classmethod
     def clear_all_scheduling(cls):
         return cls.clear_all_scheduling_thunk()
@@ -0,0 +1,238 @@
+"""
+Process metrics in the Prometheus text format.
+
+Histograms have fixed bucket bounds: each labelled child preallocates its counts, so
+an observation is a bisect of the bounds and two additions under the child's lock.
+
+The metrics of the Dispatcher's process are registered with the module's registry:
+    scheduler lag: how late each scheduler's jobs start
+    action durations: per stored action executed by a scheduler or the api
+    Lok.lock waits, and per call site waits and holds while profiling
+    saves of current.json: duration and size
+    executions at other servers: per server
+
+usage:
+    metrics.action_duration.observe(0.25, "foo")
+    text = metrics.registry.render()
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+default_buckets = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def label_text(label_name: Optional[str], label: Optional[str], extra: str = ""):
+    labels = []
+    if label_name is not None:
+        value = str(label).replace("\\", "\\\\").replace('"', '\\"')
+        labels.append(f'{label_name}="{value}"')
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.lock = Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram:
+    """
+    A histogram per value of an (optional) label.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_name: Optional[str] = None,
+        buckets: Tuple[float, ...] = default_buckets,
+    ):
+        self.name = name
+        self.help = help
+        self.label_name = label_name
+        self.bounds = tuple(sorted(buckets))
+        self.children: Dict[Optional[str], HistogramChild] = {}
+        self.lock = Lock()
+
+    def labels(self, label: Optional[str] = None):
+        child = self.children.get(label, None)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(label, HistogramChild(self.bounds))
+        return child
+
+    def observe(self, value: float, label: Optional[str] = None):
+        self.labels(label).observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.children = {}
+
+    def summaries(self):
+        """
+        Returns per label value the count, total and mean of the observations and
+        the upper bounds of the buckets of their 50th, 90th and 99th percentiles
+        (None beyond the largest bound).
+        """
+        summaries = {}
+        for label, child in list(self.children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            count = sum(counts)
+            summary = {
+                "count": count,
+                "total": total,
+                "mean": total / count if count else 0.0,
+            }
+            for name, quantile in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+                rank, cumulative, bound = quantile * count, 0, None
+                for index, bucket_count in enumerate(counts):
+                    cumulative += bucket_count
+                    if cumulative >= rank:
+                        bound = self.bounds[index] if index < len(self.bounds) else None
+                        break
+                summary[name] = bound
+            summaries[label] = summary
+        return summaries
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, child in sorted(
+            self.children.items(), key=lambda item: item[0] or ""
+        ):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = label_text(self.label_name, label, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = label_text(self.label_name, label)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A value per value of an (optional) label.
+    """
+
+    def __init__(self, name: str, help: str, label_name: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.label_name = label_name
+        self.values: Dict[Optional[str], float] = {}
+
+    def set(self, value: float, label: Optional[str] = None):
+        self.values[label] = value
+
+    def clear(self):
+        self.values = {}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for label, value in sorted(self.values.items(), key=lambda item: item[0] or ""):
+            lines.append(f"{self.name}{label_text(self.label_name, label)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        return "".join(
+            f"{line}\n" for metric in self.metrics for line in metric.render()
+        )
+
+
+registry = Registry()
+scheduler_lag = registry.register(
+    Histogram(
+        "whendo_scheduler_lag_seconds",
+        "Delay between the scheduled and the actual start of a scheduler's jobs.",
+        label_name="scheduler",
+    )
+)
+action_duration = registry.register(
+    Histogram(
+        "whendo_action_duration_seconds",
+        "Execution time of stored actions.",
+        label_name="action",
+    )
+)
+lock_wait = registry.register(
+    Histogram("whendo_lock_wait_seconds", "Time spent waiting to acquire Lok.lock.")
+)
+save_duration = registry.register(
+    Histogram(
+        "whendo_save_duration_seconds",
+        "Time to serialize and write current.json when the state changed.",
+    )
+)
+save_size = registry.register(
+    Gauge("whendo_save_size_bytes", "Size of the last saved current.json.")
+)
+lock_site_wait = registry.register(
+    Histogram(
+        "whendo_lock_site_wait_seconds",
+        "Time spent waiting to acquire Lok.lock per call site, while profiling.",
+        label_name="site",
+    )
+)
+lock_site_hold = registry.register(
+    Histogram(
+        "whendo_lock_site_hold_seconds",
+        "Time Lok.lock is held per call site, while profiling.",
+        label_name="site",
+    )
+)
+server_request_duration = registry.register(
+    Histogram(
+        "whendo_server_request_duration_seconds",
+        "Execution time of requests to other servers.",
+        label_name="server",
+    )
+)
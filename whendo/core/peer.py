@@ -0,0 +1,289 @@
+"""
+Remote action executions between whendo servers.
+
+Peer(host, port) executes actions at another server. Without peer channels, each call
+is an http request. With peer channels enabled (PeerChannels.enable, needs the
+websockets package), the calls to a server share one long-lived WebSocket to its
+/execution/channel endpoint. Each request carries an id, so many executions can be
+in flight on the one socket; responses are matched to their callers by id in
+whatever order they complete.
+
+A server whose channel can't be opened is reached over http until retry_interval
+has passed. A call whose channel closes while it is in flight fails rather than
+being retried over http, since the action may already have run.
+"""
+
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+from pydantic import BaseModel
+from . import metrics
+from .action import Action, ActionRez
+from .resolver import resolve_rez
+from .util import Http, Rez
+
+try:
+    from websockets.sync.client import connect
+except ImportError:
+    connect = None  # no websockets (>= 11); peers are reached over http
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeerRequest(BaseModel):
+    """
+    Executes the named action if action_name is supplied, otherwise the supplied action.
+    """
+
+    id: int
+    action_name: Optional[str] = None
+    action: Optional[Action] = None
+    rez: Optional[Rez] = None
+    idempotency_key: Optional[str] = None
+
+
+class PeerResponse(BaseModel):
+    id: int
+    rez: Optional[Rez] = None
+    error: Optional[Any] = None
+
+
+class PeerChannel:
+    """
+    One WebSocket to a server, shared by the threads calling it. A daemon thread
+    receives the responses and completes the callers' futures.
+    """
+
+    def __init__(self, host: str, port: int, open_timeout: float):
+        self.url = f"ws://{host}:{port}/execution/channel"
+        self.ids = itertools.count()
+        self.pending: Dict[int, Future] = {}
+        self.lock = threading.Lock()
+        self.connection = connect(self.url, open_timeout=open_timeout, max_size=None)
+        threading.Thread(
+            target=self.receive, name=f"whendo-peer-{host}:{port}", daemon=True
+        ).start()
+
+    def is_open(self):
+        return self.connection is not None
+
+    def receive(self):
+        try:
+            for message in self.connection:
+                response = json.loads(message)
+                with self.lock:
+                    future = self.pending.pop(response["id"], None)
+                if future:
+                    future.set_result(response)
+        except Exception as exception:
+            logger.warning(f"peer channel ({self.url}) failed", exc_info=exception)
+        finally:
+            self.close()
+
+    def close(self):
+        with self.lock:
+            connection, self.connection = self.connection, None
+            pending, self.pending = self.pending, {}
+        if connection:
+            connection.close()
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"peer channel ({self.url}) closed"))
+
+    def call(self, request: PeerRequest, timeout: float):
+        """
+        Sends request, with an id assigned here, and returns its response's rez.
+        """
+        future = Future()
+        with self.lock:
+            if self.connection is None:
+                raise ConnectionError(f"peer channel ({self.url}) closed")
+            request.id = next(self.ids)
+            self.pending[request.id] = future
+            connection = self.connection
+        try:
+            connection.send(request.json())
+            response = future.result(timeout)
+        finally:
+            with self.lock:
+                self.pending.pop(request.id, None)
+        assert response.get("error", None) is None, str(response["error"])
+        return response["rez"]
+
+
+class PeerChannels:
+    """
+    The open peer channels of this process, one per host:port.
+
+    usage:
+        PeerChannels.enable()
+        Peer(host="10.0.0.2", port=8000).execute_action("foo")
+    """
+
+    enabled = False
+    timeout = 60.0
+    open_timeout = 5.0
+    retry_interval = 30.0
+    channels: Dict[Tuple[str, int], PeerChannel] = {}
+    # host:port -> when opening a channel last failed
+    failures: Dict[Tuple[str, int], float] = {}
+    # host:port -> the lock of the callers opening its channel
+    openers: Dict[Tuple[str, int], threading.Lock] = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def enable(
+        cls,
+        timeout: float = 60.0,
+        open_timeout: float = 5.0,
+        retry_interval: float = 30.0,
+    ):
+        assert connect, "peer channels need the websockets package (>= 11)"
+        cls.timeout = timeout
+        cls.open_timeout = open_timeout
+        cls.retry_interval = retry_interval
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        with cls.lock:
+            cls.enabled = False
+            channels = list(cls.channels.values())
+            cls.channels.clear()
+            cls.failures.clear()
+        for channel in channels:
+            channel.close()
+
+    @classmethod
+    def get(cls, host: str, port: int):
+        """
+        Returns the open channel to host:port, opening one if needed; None if
+        channels are disabled or the server can't be reached by one. Channels are
+        opened outside the class lock, so only the callers for the same host:port
+        wait on a slow or unreachable server.
+        """
+        if not cls.enabled:
+            return None
+        key = (host, port)
+        with cls.lock:
+            channel, usable = cls.lookup(key)
+            if usable:
+                return channel
+            opener = cls.openers.setdefault(key, threading.Lock())
+        with opener:
+            # another caller may have opened it, or failed to, meanwhile
+            with cls.lock:
+                channel, usable = cls.lookup(key)
+            if usable:
+                return channel
+            try:
+                channel = PeerChannel(host, port, open_timeout=cls.open_timeout)
+            except Exception as exception:
+                with cls.lock:
+                    cls.failures[key] = time.monotonic()
+                logger.warning(
+                    f"couldn't open a peer channel to ({host}:{port}); using http",
+                    exc_info=exception,
+                )
+                return None
+            with cls.lock:
+                if cls.enabled:
+                    cls.failures.pop(key, None)
+                    cls.channels[key] = channel
+                    return channel
+            # disabled while opening
+            channel.close()
+            return None
+
+    @classmethod
+    def lookup(cls, key: Tuple[str, int]):
+        """
+        Under cls.lock: returns (channel, True) if the channel to key is open, or
+        (None, True) if opening it failed within the retry interval or channels
+        were disabled; otherwise (None, False), when a channel should be opened.
+        """
+        if not cls.enabled:
+            return (None, True)
+        channel = cls.channels.get(key, None)
+        if channel and channel.is_open():
+            return (channel, True)
+        failed = cls.failures.get(key, None)
+        if failed and time.monotonic() - failed < cls.retry_interval:
+            return (None, True)
+        return (None, False)
+
+
+class Peer:
+    """
+    Executes actions at another server, over its peer channel if there is one. Calls
+    with the same idempotency_key execute at most once at the server while it keeps
+    the result (see Dispatcher.execute_idempotently), so they can be retried safely.
+
+    usage:
+        Peer(host=server.host, port=server.port).execute_action("foo", rez=rez)
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    def execute_action(
+        self, action_name: str, rez: Rez = None, idempotency_key: str = None
+    ):
+        start = time.perf_counter()
+        try:
+            channel = PeerChannels.get(self.host, self.port)
+            if channel:
+                request = PeerRequest(
+                    id=0,
+                    action_name=action_name,
+                    rez=rez,
+                    idempotency_key=idempotency_key,
+                )
+                return resolve_rez(channel.call(request, timeout=PeerChannels.timeout))
+            http = Http(host=self.host, port=self.port)
+            headers = self.headers(idempotency_key)
+            path = f"/actions/{action_name}/execute"
+            if rez:
+                return resolve_rez(http.post(path, rez, headers=headers))
+            return resolve_rez(http.get(path, headers=headers))
+        finally:
+            self.observe(start)
+
+    def execute_supplied_action(
+        self, action: Action, rez: Rez = None, idempotency_key: str = None
+    ):
+        start = time.perf_counter()
+        try:
+            channel = PeerChannels.get(self.host, self.port)
+            if channel:
+                request = PeerRequest(
+                    id=0, action=action, rez=rez, idempotency_key=idempotency_key
+                )
+                return resolve_rez(channel.call(request, timeout=PeerChannels.timeout))
+            http = Http(host=self.host, port=self.port)
+            headers = self.headers(idempotency_key)
+            if rez:
+                action_rez = ActionRez(action=action, rez=rez)
+                return resolve_rez(
+                    http.post(f"/execution/with_rez", action_rez, headers=headers)
+                )
+            return resolve_rez(http.post(f"/execution", action, headers=headers))
+        finally:
+            self.observe(start)
+
+    def observe(self, start: float):
+        """
+        Observes the time since start (time.perf_counter()) as a request to this
+        server, whether it succeeded or not.
+        """
+        metrics.server_request_duration.observe(
+            time.perf_counter() - start, f"{self.host}:{self.port}"
+        )
+
+    def headers(self, idempotency_key: str = None):
+        return {"Idempotency-Key": idempotency_key} if idempotency_key else None
@@ -0,0 +1,167 @@
+"""
+Compiled execution plans for stored actions.
+
+Executing a composite action (All, UntilSuccess, UntilFailure, IfElse, Compose) the
+usual way computes its flds at every node of the tree on every execution. A Plan
+does that work once: it flattens the tree into a list of steps, each holding its
+action, the indices of its children's steps and the field values it reads. Executing
+the plan runs each composite's own execute_flds with its precomputed field values and
+an execute that runs the children's steps; the other actions execute as usual.
+
+A composite whose unset (None) fields are supplied by the incoming rez.flds can't use
+its precomputed values; that step executes its action as usual. Results, processing
+info and logging are the same as executing the action itself.
+
+Compiling a named action also gives each step its reference for the info of its
+action's results: the action name, the step and a hash of the stored action. The plan
+keeps the references and supplies them while it runs the steps (see rez_info), leaving
+the actions themselves untouched.
+
+usage:
+    plan = Plan(action, name="foo")
+    rez = plan.execute(tag="scheduler:action")
+"""
+
+import hashlib
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from .action import Action, plan_reference
+from .history import execute_recorded
+from .util import Rez
+from .actions.list_action import (
+    ListOpMode,
+    ListAction,
+    All,
+    UntilSuccess,
+    UntilFailure,
+    IfElse,
+    Compose,
+)
+
+
+class StepKind:
+    ACTION = "action"
+    LIST = "list"
+    IF_ELSE = "if_else"
+    COMPOSE = "compose"
+
+
+compiled_kinds = {
+    ListAction: StepKind.LIST,
+    All: StepKind.LIST,
+    UntilSuccess: StepKind.LIST,
+    UntilFailure: StepKind.LIST,
+    IfElse: StepKind.IF_ELSE,
+    Compose: StepKind.COMPOSE,
+}
+sequential_op_modes = {
+    ListOpMode.ALL,
+    ListOpMode.UNTIL_SUCCESS,
+    ListOpMode.UNTIL_FAILURE,
+}
+
+
+class Step:
+    """
+    One node of a Plan. children are step indices; for IfElse they are (test, else,
+    if), if being None when there's no if_action. loose names the fields the action
+    leaves to rez.flds.
+    """
+
+    __slots__ = ("kind", "action", "flds", "loose", "children")
+
+    def __init__(self, action: Action):
+        self.kind = StepKind.ACTION
+        self.action = action
+        self.flds: Dict[str, Any] = {}
+        self.loose: FrozenSet[str] = frozenset()
+        self.children: Tuple[Optional[int], ...] = ()
+
+
+class Plan:
+    def __init__(self, action: Action, name: Optional[str] = None):
+        self.action = action
+        self.name = name
+        self.hash = (
+            hashlib.md5(action.json().encode()).hexdigest()[:8] if name else None
+        )
+        self.steps: List[Step] = []
+        # per step, the reference for the info of its action's results (see rez_info)
+        self.references: List[Optional[Dict[str, Any]]] = []
+        self.compile(action)
+
+    def __str__(self):
+        return str(self.action)
+
+    def compile(self, action: Action):
+        """
+        Appends the steps of action's tree; returns the index of action's step.
+        """
+        index = len(self.steps)
+        step = Step(action)
+        self.steps.append(step)
+        self.references.append(
+            {
+                "class": f"{action.__class__.__module__}.{action.__class__.__name__}",
+                "action": self.name,
+                "step": index,
+                "hash": self.hash,
+            }
+            if self.name
+            else None
+        )
+        kind = compiled_kinds.get(type(action), None)
+        if kind == StepKind.LIST and action.op_mode not in sequential_op_modes:
+            kind = None
+        if kind is None:
+            return index
+        step.kind = kind
+        step.flds = action.field_values()
+        step.loose = frozenset(action.fields() - step.flds.keys())
+        if kind == StepKind.IF_ELSE:
+            step.children = (
+                self.compile(step.flds["test_action"]),
+                self.compile(step.flds["else_action"]),
+                (
+                    self.compile(step.flds["if_action"])
+                    if "if_action" in step.flds
+                    else None
+                ),
+            )
+        else:
+            step.children = tuple(self.compile(child) for child in step.flds["actions"])
+        return index
+
+    def execute(self, tag: str = None, rez: Rez = None):
+        return self.run(0, tag, rez)
+
+    def run(self, index: int, tag: str = None, rez: Rez = None):
+        step = self.steps[index]
+        token = plan_reference.set((step.action, self.references[index]))
+        try:
+            if step.kind == StepKind.ACTION or (
+                rez is not None and rez.flds and not step.loose.isdisjoint(rez.flds)
+            ):
+                return step.action.execute(tag=tag, rez=rez)
+            return step.action.execute_flds(
+                step.flds, tag=tag, rez=rez, execute=self.child_runner(step)
+            )
+        finally:
+            plan_reference.reset(token)
+
+    def child_runner(self, step: Step):
+        """
+        Returns the execute of step's composite (see list_action.execute_child): it
+        runs the child's step, recording it in the ExecutionHistory like the
+        composites' own executions of their children.
+        """
+
+        def execute(position: int, action: Action, tag: str = None, rez: Rez = None):
+            index = step.children[position]
+            return execute_recorded(
+                action,
+                tag=tag,
+                rez=rez,
+                execute=lambda tag, rez: self.run(index, tag, rez),
+            )
+
+        return execute
@@ -0,0 +1,85 @@
+"""
+An on-demand sampling profiler of this process's threads: the Timed threads
+(whendo-timed, whendo-timed-out-of-band), the api executors' workers
+(whendo-mutations, whendo-executions), the api threads and any other.
+
+While a profile runs, a sampling thread reads the stack of every thread hz times a
+second; otherwise nothing runs and nothing is recorded. The result is in the
+collapsed-stack format read by flamegraph tools: one line per distinct stack, its
+frames (module.function) from the thread's root down, separated by semicolons and
+followed by the number of samples. Each stack starts with the thread's name, the
+numbers of pool threads removed so that the workers of a pool share a root.
+
+usage:
+    collapsed = StackSampler.profile(seconds=10, hz=100)
+"""
+
+import re
+import sys
+import threading
+from collections import Counter
+from time import monotonic, sleep
+from typing import Optional
+
+max_seconds = 60.0
+max_hz = 1000.0
+
+
+def thread_group(name: str):
+    """
+    e.g. whendo-executions_3 -> whendo-executions, Thread-7 (run) -> Thread (run)
+    """
+    return re.sub(r"[-_]\d+", "", name)
+
+
+def collapse(frame):
+    frames = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        frames.append(f"{module}.{frame.f_code.co_name}")
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class StackSampler:
+    lock = threading.Lock()  # one profile at a time
+
+    @classmethod
+    def profile(cls, seconds: float, hz: float = 100.0, threads: Optional[str] = None):
+        """
+        Samples for seconds (at most max_seconds) the stacks of the threads whose
+        names match the regular expression threads (all if not provided) hz
+        times a second; returns the collapsed stacks.
+        """
+        assert (
+            0 < seconds <= max_seconds
+        ), f"seconds ({seconds}) not in (0, {max_seconds}]"
+        assert 0 < hz <= max_hz, f"hz ({hz}) not in (0, {max_hz}]"
+        pattern = re.compile(threads) if threads else None
+        if not cls.lock.acquire(blocking=False):
+            raise Exception("a profile is already running")
+        try:
+            return cls.sample(seconds, 1.0 / hz, pattern)
+        finally:
+            cls.lock.release()
+
+    @classmethod
+    def sample(cls, seconds: float, interval: float, pattern):
+        stacks = Counter()
+        sampler = threading.get_ident()
+        deadline = monotonic() + seconds
+        next_sample = monotonic()
+        while next_sample < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == sampler:
+                    continue
+                name = names.get(ident, f"thread {ident}")
+                if pattern and not pattern.search(name):
+                    continue
+                stacks[";".join([thread_group(name)] + collapse(frame))] += 1
+            # skips the samples it's too late for rather than bunching them up
+            next_sample = max(next_sample + interval, monotonic())
+            sleep(max(next_sample - monotonic(), 0.0))
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
@@ -7,5 +7,6 @@ import whendo.core.actions.http_action
 import whendo.core.actions.list_action
 import whendo.core.actions.sys_action
 import whendo.core.actions.dispatch_action
+import whendo.core.actions.cache_action
 import whendo.core.schedulers.timed_scheduler
 import whendo.core.programs.simple_program
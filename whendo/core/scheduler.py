@@ -96,6 +96,12 @@ class Scheduler(BaseModel):
 class TimedScheduler(Scheduler):
     _timed: Timed = PrivateAttr()
 
+    def __getstate__(self):
+        # a running Timed instance cannot be pickled and belongs to this process anyway
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {}
+        return state
+
     def get_timed(self):
         return self._timed
 
@@ -147,7 +147,8 @@ class DatedScheduledActions(BaseModel):
         """
         This method invokes a supplied thunk when the datetime represented
         in the dictionary key precedes the current time. This thunk expects
-        scheduler and action names as arguments.
+        scheduler and action names as arguments. Returns the number of datetimes
+        handled and removed.
         """
         now = Now.dt()
         to_remove = []
@@ -167,6 +168,7 @@ class DatedScheduledActions(BaseModel):
                 to_remove.append(date_time_str)
         for date_time_str in to_remove:  # modify outside the previous for-loop
             self.dated_scheduled_actions.pop(date_time_str)
+        return len(to_remove)
 
     def apply_date(
         self,
@@ -6,12 +6,15 @@ actions on more than one machine.
 """
 
 from pydantic import BaseModel
-from typing import Dict, Set, List, Optional
+from typing import Any, Dict, Set, List, Optional
 from enum import Enum
+import bisect
+import hashlib
 import logging
+import statistics
+import threading
 from .util import KeyTagMode
 
-
 logger = logging.getLogger(__name__)
 
 
@@ -132,3 +135,247 @@ class Server(BaseModel):
                 )
         else:
             return []
+
+
+class ServerIndex:
+    """
+    An inverted index from key:tag pairs to server names. The Dispatcher
+    maintains an instance as servers are added, updated and deleted so that
+    selecting servers by key:tags does not require a visit to every server.
+
+    usage:
+        index = ServerIndex()
+        index.add(server_name, server)
+        index.select(key_tags={"foo": ["bar"]}, key_tag_mode=KeyTagMode.ANY)
+    """
+
+    def __init__(self):
+        # key -> tag -> server names
+        self.key_tag_names: Dict[str, Dict[str, Set[str]]] = {}
+        # key -> names of servers having the key (with or without tags)
+        self.key_names: Dict[str, Set[str]] = {}
+        # server name -> key -> indexed tags; servers are mutable, so deletion
+        # relies on what was indexed rather than on the server's current tags
+        self.indexed: Dict[str, Dict[str, Set[str]]] = {}
+
+    def add(self, server_name: str, server: Server):
+        """
+        Index all of the server's key:tag pairs.
+        """
+        self.indexed.setdefault(server_name, {})
+        if server.tags:
+            self.add_key_tags(server_name, server.tags)
+
+    def add_key_tags(self, server_name: str, key_tags: Dict[str, List[str]]):
+        indexed = self.indexed.setdefault(server_name, {})
+        for key in key_tags:
+            self.key_names.setdefault(key, set()).add(server_name)
+            tag_names = self.key_tag_names.setdefault(key, {})
+            indexed_tags = indexed.setdefault(key, set())
+            for tag in key_tags[key]:
+                tag_names.setdefault(tag, set()).add(server_name)
+                indexed_tags.add(tag)
+
+    def delete(self, server_name: str):
+        """
+        Remove all of the server's key:tag pairs, removing consequently
+        empty entries.
+        """
+        indexed = self.indexed.pop(server_name, {})
+        for key in indexed:
+            names = self.key_names.get(key, None)
+            if names is not None:
+                names.discard(server_name)
+                if len(names) == 0:
+                    self.key_names.pop(key)
+            tag_names = self.key_tag_names.get(key, None)
+            if tag_names is not None:
+                for tag in indexed[key]:
+                    names = tag_names.get(tag, None)
+                    if names is not None:
+                        names.discard(server_name)
+                        if len(names) == 0:
+                            tag_names.pop(tag)
+                if len(tag_names) == 0:
+                    self.key_tag_names.pop(key)
+
+    def clear(self):
+        self.key_tag_names.clear()
+        self.key_names.clear()
+        self.indexed.clear()
+
+    def select(
+        self,
+        key_tags: Dict[str, List[str]],
+        key_tag_mode: KeyTagMode = KeyTagMode.ANY,
+    ):
+        """
+        Returns the set of names of the servers that satisfy at least one of
+        the supplied keys. The per-key test mirrors Server.get_keys:
+
+            ANY: the server's tags for the key intersect the supplied tags
+            ALL: the supplied tags cover the server's tags for the key
+        """
+        result: Set[str] = set()
+        for key in key_tags:
+            tags = set(key_tags[key])
+            tag_names = self.key_tag_names.get(key, {})
+            if key_tag_mode == KeyTagMode.ANY:
+                for tag in tags:
+                    result.update(tag_names.get(tag, ()))
+            elif key_tag_mode == KeyTagMode.ALL:
+                excluded: Set[str] = set()
+                for tag in tag_names:
+                    if tag not in tags:
+                        excluded.update(tag_names[tag])
+                result.update(self.key_names.get(key, set()) - excluded)
+        return result
+
+
+class Partition(BaseModel):
+    """
+    Partitions scheduled actions across the servers selected by key_tags (see
+    Dispatcher.get_servers_by_tags). Each scheduler:action pair runs only on the
+    server that owns it on a HashRing of those servers.
+    """
+
+    key_tags: Dict[str, List[str]]
+    key_tag_mode: KeyTagMode = KeyTagMode.ANY
+    replicas: int = 64
+
+    def description(self):
+        return f"Scheduled actions are partitioned across the servers with key:tags ({self.key_tags}) in mode ({self.key_tag_mode})."
+
+
+class HashRing:
+    """
+    A consistent-hash ring over server names. Each server appears at replicas points
+    on the ring; a key belongs to the server at the first point at or after the key's
+    hash. Adding or removing a server moves only the keys falling next to its points,
+    about 1/n of all keys for n servers.
+
+    Hashes come from md5 rather than hash(), which differs between processes.
+
+    usage:
+        ring = HashRing(["aqua", "teal"])
+        ring.owner("bath:flea")
+    """
+
+    def __init__(self, server_names: List[str], replicas: int = 64):
+        points = sorted(
+            (self.hash(f"{server_name}#{replica}"), server_name)
+            for server_name in server_names
+            for replica in range(replicas)
+        )
+        self.hashes = [point[0] for point in points]
+        self.names = [point[1] for point in points]
+
+    @staticmethod
+    def hash(key: str):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def owner(self, key: str):
+        """
+        Returns the name of the server owning key, None if the ring is empty.
+        """
+        if not self.hashes:
+            return None
+        i = bisect.bisect_left(self.hashes, self.hash(key))
+        return self.names[i % len(self.names)]
+
+
+class ServerHealth:
+    """
+    The health of servers as observed by the Dispatcher: an exponentially weighted
+    moving average (EWMA) of call latency and of error rate per server, and the
+    1min load_avg a server last reported through SysInfo. Lower scores are better:
+    the load-weighted latency plus error_penalty seconds per unit of error rate, so
+    a server failing fast doesn't rank ahead of a slower healthy one. Servers
+    without observed calls have no score; rank gives them the median score of the
+    measured candidates, neither preferring nor avoiding them.
+
+    Thread-safe; calls are recorded from the threads executing actions.
+
+    usage:
+        health = ServerHealth()
+        health.record_call("aqua", latency=0.12, ok=True)
+        health.record_load("aqua", {"1min": 0.5, "5min": 0.4, "15min": 0.3})
+        health.rank(["aqua", "teal"])
+    """
+
+    def __init__(self, alpha: float = 0.3, error_penalty: float = 10.0):
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def entry(self, server_name: str):
+        return self.stats.setdefault(
+            server_name,
+            {
+                "calls": 0,
+                "errors": 0,
+                "latency": 0.0,
+                "error_rate": 0.0,
+                "load_avg": None,
+            },
+        )
+
+    def record_call(self, server_name: str, latency: float, ok: bool):
+        with self.lock:
+            stats = self.entry(server_name)
+            error = 0.0 if ok else 1.0
+            if stats["calls"] == 0:
+                stats["latency"] = latency
+                stats["error_rate"] = error
+            else:
+                stats["latency"] += self.alpha * (latency - stats["latency"])
+                stats["error_rate"] += self.alpha * (error - stats["error_rate"])
+            stats["calls"] += 1
+            if not ok:
+                stats["errors"] += 1
+
+    def record_load(self, server_name: str, load_avg: Dict[str, float]):
+        with self.lock:
+            self.entry(server_name)["load_avg"] = load_avg.get("1min", None)
+
+    def score(self, server_name: str):
+        stats = self.stats.get(server_name, None)
+        if stats is None or stats["calls"] == 0:
+            return None
+        load = stats["load_avg"] or 0.0
+        return (
+            stats["latency"] * (1.0 + load) + self.error_penalty * stats["error_rate"]
+        )
+
+    def rank(self, server_names: List[str]):
+        """
+        Returns server_names ordered best first, ties broken by name; the servers
+        without observed calls score the median of the others (0 if none).
+        """
+        with self.lock:
+            scores = {name: self.score(name) for name in server_names}
+        measured = [score for score in scores.values() if score is not None]
+        prior = statistics.median(measured) if measured else 0.0
+        return sorted(
+            server_names,
+            key=lambda name: (
+                prior if scores[name] is None else scores[name],
+                name,
+            ),
+        )
+
+    def forget(self, server_name: str):
+        with self.lock:
+            self.stats.pop(server_name, None)
+
+    def clear(self):
+        with self.lock:
+            self.stats.clear()
+
+    def describe(self):
+        with self.lock:
+            return {
+                server_name: dict(stats, score=self.score(server_name))
+                for server_name, stats in self.stats.items()
+            }
@@ -2,12 +2,15 @@
 This module contains the class that schedules and runs jobs.
 """
 
+from contextvars import ContextVar
 from schedule import Scheduler
 from threading import Event, Thread
+from datetime import datetime
 import time
 from collections.abc import Callable
 import logging
 from whendo.core.util import Now, TimeUnit
+from whendo.core import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +33,9 @@ class Timed(Scheduler):
     """
 
     instance = None
+    # the scheduled time of the running job, carried to the threads its actions use
+    # (see fire_time)
+    firing: ContextVar = ContextVar("firing", default=None)
 
     @classmethod
     def get(cls):
@@ -37,6 +43,13 @@ class Timed(Scheduler):
             cls.instance = Timed()
         return cls.instance
 
+    @classmethod
+    def fire_time(cls):
+        """
+        Returns the time the running job was scheduled for; None outside jobs.
+        """
+        return cls.firing.get()
+
     def __init__(self):
         super().__init__()
         self.cease_timed_run = None
@@ -66,10 +79,10 @@ class Timed(Scheduler):
     # from https://github.com/mrhwick/schedule/blob/master/schedule/__init__.py
     # ... ensures one active invocation of run at a
     #
-    def run(self, interval=1):
+    def run(self, interval=1, name: str = "whendo-timed"):
         """
         Continuously run, while executing pending jobs at each elapsed
-        time interval.
+        time interval, in a thread named name.
         @return cease_timed_run: threading.Event which can be set to
         cease timed run.
         Please note that it is *intended behavior that run()
@@ -92,13 +105,29 @@ class Timed(Scheduler):
                         self.run_pending()
                         time.sleep(interval)
 
-            timed_thread = ScheduleThread()
+            timed_thread = ScheduleThread(name=name)
             timed_thread.setDaemon(True)
             timed_thread.start()
             return "started running"
         else:
             return "already running"
 
+    def _run_job(self, job):
+        """
+        Observes how late the job starts, under its (scheduler name) tag, and
+        keeps its scheduled time for the job's execution (see fire_time).
+        """
+        if job.next_run is not None:
+            metrics.scheduler_lag.observe(
+                max((datetime.now() - job.next_run).total_seconds(), 0.0),
+                next(iter(job.tags), ""),
+            )
+        token = Timed.firing.set(job.next_run)
+        try:
+            super()._run_job(job)
+        finally:
+            Timed.firing.reset(token)
+
     # methods added to adapt to Dispatcher scheduling model (an adaptation of the schedule library model)
     def schedule_timely_callable(
         self,
@@ -2,6 +2,10 @@ try:
     from psutil import virtual_memory, net_if_addrs, cpu_percent, getloadavg, disk_usage
 except:
     from .mockpsutil import virtual_memory, net_if_addrs, cpu_percent, getloadavg, disk_usage
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no advisory locks (e.g. Windows); FileLock always succeeds
 
 import logging
 from enum import Enum
@@ -10,13 +14,17 @@ from sys import stdout
 import socket
 import requests
 import json
+import hashlib
 from datetime import datetime, time
-from typing import Callable, Optional
+from typing import Callable, Optional, List
 import os
 from pathlib import Path
-from pydantic import BaseModel
-from typing import Dict, Any
-from threading import RLock
+from pydantic import BaseModel, PrivateAttr
+from typing import Dict, Any, ClassVar
+from threading import RLock, Lock, Thread
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import monotonic
 
 logger = logging.getLogger(__name__)
 
@@ -230,6 +238,33 @@ def object_info(obj):
     }
 
 
+def object_projection(obj, fields: List[str]):
+    """
+    Returns a dictionary of the requested fields of obj, presumably a BaseModel
+    instance. Besides regular fields, two pseudo-fields are supported:
+
+        class: the name of obj's class
+        marker: the name of the field whose default is its own name (e.g. All's _all),
+                None if there is no such field
+    """
+    projection = {}
+    for field in fields:
+        if field == "class":
+            projection["class"] = obj.__class__.__name__
+        elif field == "marker":
+            projection["marker"] = next(
+                (
+                    name
+                    for name, model_field in obj.__fields__.items()
+                    if model_field.default == name
+                ),
+                None,
+            )
+        else:
+            projection[field] = getattr(obj, field, None)
+    return projection
+
+
 def add_to_list(a_list: list, element: object):
     """
     Attempts to append element to a list. If already contained,
@@ -348,6 +383,200 @@ class Dirs:
         return assured_dir
 
 
+class FileLock:
+    """
+    A non-blocking, exclusive, advisory lock on a file. The operating system releases
+    it when the holding process exits, however it exits.
+
+    usage:
+        lock = FileLock(os.path.join(Dirs.saved_dir(), "leader.lock"))
+        if lock.acquire():
+            # this process holds the lock until lock.release() or exit
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        if self.file:
+            return True
+        file = open(self.path, "a")
+        if fcntl:
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                file.close()
+                return False
+        self.file = file
+        return True
+
+    def release(self):
+        if self.file:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+    def is_held(self):
+        return self.file is not None
+
+    def write(self, text: str):
+        """
+        Replaces the content of the held file, e.g. with the holder's identity.
+        """
+        self.file.truncate(0)
+        self.file.write(text)
+        self.file.flush()
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read()
+
+
+def fingerprint(value: Any):
+    """
+    A digest of value's json serialization, pydantic models (with their class) and
+    other objects (as str) included; equal for equal values.
+    """
+
+    def default(obj):
+        if isinstance(obj, BaseModel):
+            return {"__class__": type(obj).__name__, **obj.dict()}
+        return str(obj)
+
+    serialization = json.dumps(value, sort_keys=True, default=default)
+    return hashlib.sha256(serialization.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    A bounded cache of results by key. Entries expire ttl seconds after they are stored,
+    and past max_size the least recently used entries are dropped, though never one
+    still being computed.
+
+    get_or_compute runs thunk at most once per live key: a caller finding the key
+    cached gets the stored result, and a caller finding it still being computed waits
+    for that result rather than computing it again. Exceptions aren't cached. With
+    stale_while_revalidate, a caller finding the key expired gets the expired result
+    at once while thunk recomputes it in a background thread.
+
+    usage:
+        cache = ResultCache(max_size=1024, ttl=60.0)
+        rez = cache.get_or_compute("4f9c", lambda: action.execute())
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = Lock()
+        # key -> (expiration or None while computing, future, whether revalidating)
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def get_or_compute(
+        self, key: Any, thunk: Callable, stale_while_revalidate: bool = False
+    ):
+        return self.fetch(key, thunk, stale_while_revalidate)[0]
+
+    def fetch(self, key: Any, thunk: Callable, stale_while_revalidate: bool = False):
+        """
+        Returns (result, outcome), outcome being one of hit, stale or miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry and (entry[0] is None or entry[0] > monotonic()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                future, outcome = entry[1], "hit"
+            elif entry and stale_while_revalidate and entry[1].done():
+                # completed futures in entries hold results; failures are removed
+                self.entries.move_to_end(key)
+                self.stale_hits += 1
+                if not entry[2]:
+                    self.entries[key] = (entry[0], entry[1], True)
+                    Thread(
+                        target=self.revalidate,
+                        args=(key, entry[1], thunk),
+                        name="whendo-revalidate",
+                        daemon=True,
+                    ).start()
+                return entry[1].result(), "stale"
+            else:
+                future = Future()
+                self.entries[key] = (None, future, False)
+                self.entries.move_to_end(key)
+                self.misses += 1
+                self.evict()
+                outcome = "miss"
+        if outcome == "hit":
+            return future.result(), outcome
+        try:
+            result = thunk()
+        except BaseException as exception:
+            with self.lock:
+                if self.entries.get(key, (None, None, False))[1] is future:
+                    self.entries.pop(key)
+            future.set_exception(exception)
+            raise
+        with self.lock:
+            if self.entries.get(key, (None, None, False))[1] is future:
+                self.entries[key] = (monotonic() + self.ttl, future, False)
+        future.set_result(result)
+        return result, outcome
+
+    def evict(self):
+        """
+        Drops the least recently used entries past max_size, skipping the ones being
+        computed: their callers wait on them, and a repeat of their key would
+        compute them again.
+        """
+        excess = len(self.entries) - self.max_size
+        if excess > 0:
+            evicted = []
+            for key, entry in self.entries.items():
+                if entry[0] is not None:
+                    evicted.append(key)
+                    if len(evicted) == excess:
+                        break
+            for key in evicted:
+                del self.entries[key]
+
+    def revalidate(self, key: Any, stale: Future, thunk: Callable):
+        try:
+            result = thunk()
+        except Exception as exception:
+            logger.warning(f"failed to revalidate ({key})", exc_info=exception)
+            with self.lock:
+                entry = self.entries.get(key, None)
+                if entry and entry[1] is stale:
+                    self.entries[key] = (entry[0], stale, False)
+            return
+        future = Future()
+        future.set_result(result)
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry and entry[1] is stale:
+                self.entries[key] = (monotonic() + self.ttl, future, False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def info(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+            }
+
+
 class SharedRO:
     """
     This class provides in-memory shared data so that actions can communicate with each other during
@@ -474,6 +703,9 @@ class SystemInfo:
                 "elapsed": lambda: str(Now.dt() - dt),
                 "successes": 0,
                 "failures": 0,
+                "cache_hits": 0,
+                "cache_stale_hits": 0,
+                "cache_misses": 0,
                 "cwd": os.getcwd(),
                 "login": os.getlogin(),
                 "os_version": os.uname()[3],
@@ -509,6 +741,23 @@ class SystemInfo:
 
         system_info.apply(update)
 
+    @classmethod
+    def increment_cache_count(cls, outcome: str):
+        """
+        Counts a Cached action lookup by its outcome: hit, stale or miss.
+        """
+        system_info = SharedRWs.get("system_info")
+        counter = {
+            "hit": "cache_hits",
+            "stale": "cache_stale_hits",
+            "miss": "cache_misses",
+        }[outcome]
+
+        def update(dictionary: dict):
+            dictionary[counter] = 1 + dictionary.get(counter, 0)
+
+        system_info.apply(update)
+
     @classmethod
     def get(cls):
         return SharedRWs.get("system_info").data_copy()
@@ -540,8 +789,8 @@ class Http(BaseModel):
     host: str
     port: int
 
-    def get(self, path: str, data=None):
-        response = requests.get(self.cmd(path), data)
+    def get(self, path: str, data=None, headers: Optional[Dict[str, str]] = None):
+        response = requests.get(self.cmd(path), data, headers=headers)
         assert response.status_code == 200, response.text
         return response.json()
 
@@ -550,8 +799,10 @@ class Http(BaseModel):
         assert response.status_code == 200, response.text
         return response.json()
 
-    def post(self, path: str, data: BaseModel):
-        response = requests.post(self.cmd(path), data.json())
+    def post(
+        self, path: str, data: BaseModel, headers: Optional[Dict[str, str]] = None
+    ):
+        response = requests.post(self.cmd(path), data.json(), headers=headers)
         assert response.status_code == 200, response.text
         return response.json()
 
@@ -599,19 +850,82 @@ class Http(BaseModel):
         return f"http://{self.host}:{self.port}{path}"
 
 
+class RezLink:
+    """
+    The type of Rez.rez. A model is kept as is rather than copied (pydantic's
+    default), so that Rez chains share their unchanged ancestors.
+    """
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value):
+        return value if isinstance(value, BaseModel) else BaseModel.validate(value)
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(type="object")
+
+
 class Rez(BaseModel):
+    """
+    The result of an action, linked to the results it was computed from. A chain
+    longer than max_depth is cut to its newest max_depth // 2 results, followed by
+    a summary of the truncated ones (extra={"truncated": count}). The results kept
+    are copied; the truncated ones are left to whoever else shares them.
+    """
+
     result: Optional[Any] = None
     flds: Optional[Dict[str, Any]] = None
     rez: Optional[
-        BaseModel
+        RezLink
     ] = None  # actually a Rez -- cannot define self-referencing classes
     extra: Optional[Dict[str, Any]] = None
     info: Optional[Dict[str, Any]] = None
 
+    max_depth: ClassVar[Optional[int]] = 64
+    # length of the chain starting here, and number of results truncated from it
+    _depth: int = PrivateAttr(default=1)
+    _truncated: int = PrivateAttr(default=0)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if isinstance(self.rez, Rez):
+            self._depth = self.rez._depth + 1
+            self._truncated = self.rez._truncated
+            if self.max_depth and self._depth > self.max_depth:
+                self.truncate(max(self.max_depth // 2, 1))
+
+    def truncate(self, keep: int):
+        """
+        Cuts the chain to this and the keep - 1 results following it, plus a summary.
+        """
+        kept = []
+        rez = self.rez
+        for _ in range(keep - 1):
+            kept.append(rez)
+            rez = rez.rez
+        truncated = rez._depth - (1 if rez._truncated else 0) + rez._truncated
+        below = Rez(
+            result=f"({truncated}) earlier results truncated",
+            extra={"truncated": truncated},
+        )
+        below._truncated = truncated
+        for rez in reversed(kept):
+            rez = rez.copy(update={"rez": below})
+            rez._depth = below._depth + 1
+            rez._truncated = truncated
+            below = rez
+        self.rez = below
+        self._depth = below._depth + 1
+        self._truncated = truncated
+
     def flatten_results(self):
         results = []
         rez = self
-        while rez != None:
+        while rez is not None:
             results.append(rez.flatten_result())
             rez = rez.rez
         return results
@@ -620,6 +934,6 @@ class Rez(BaseModel):
         return {
             "action_info": self.info,
             "action_result": self.result
-            if self.result != None
+            if self.result is not None
             else "Empty action result",
         }
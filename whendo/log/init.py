@@ -1,6 +1,12 @@
 import logging
+import logging.config
 import os
 import whendo.core.util as util
+from whendo.log.pipeline import LogPipeline
+
+log_file = os.path.join(util.Dirs.log_dir(), "job.log")
+# set in the workers' environment by the leader (see whendo.api.leader.Leader)
+leader_address_variable = "WHENDO_LEADER_ADDRESS"
 
 logging_config = {
     "version": 1,
@@ -13,7 +19,7 @@ logging_config = {
             "class": "logging.handlers.RotatingFileHandler",
             "level": "INFO",
             "formatter": "standard",
-            "filename": os.path.join(util.Dirs.log_dir(), "job.log"),
+            "filename": log_file,
             "maxBytes": 10000000,
             "backupCount": 20,
             "encoding": "utf8",
@@ -30,4 +36,16 @@ logging_config = {
         "": {"handlers": ["default_handler"], "level": "DEBUG", "propagate": False}
     },
 }
+# the uvicorn workers of a leader (see whendo.api.leader) append to the leader's
+# job.log: only the leader rotates it, and the workers reopen it once it's rotated
+if leader_address_variable in os.environ:
+    logging_config["handlers"]["default_handler"] = {
+        "class": "logging.handlers.WatchedFileHandler",
+        "level": "INFO",
+        "formatter": "standard",
+        "filename": log_file,
+        "encoding": "utf8",
+    }
 logging.config.dictConfig(logging_config)
+# the file is written by a background thread rather than the threads that log
+LogPipeline.start(logging.getLogger())
@@ -0,0 +1,89 @@
+"""
+Queue-based logging. The threads that log (e.g. the Timed thread executing scheduled
+actions) only put records on a bounded queue; a background thread formats them and
+writes them to the actual handlers. Records are queued unformatted, so lazily
+rendered arguments (see whendo.core.action.log_action_result) are rendered by the
+writer rather than the logging thread. When the queue is full, records are dropped
+and counted rather than blocking the caller.
+
+usage:
+    logging.config.dictConfig(logging_config)
+    LogPipeline.start(logging.getLogger())
+"""
+
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue, Full
+from typing import Optional
+from whendo.log.sampling import LogSampling
+
+
+class AsyncQueueHandler(QueueHandler):
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord):
+        """
+        Leaves formatting, including the message's arguments, to the writer.
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    The logging pipeline of this process; at most one at a time.
+    """
+
+    queue_size = 10000
+    handler: Optional[AsyncQueueHandler] = None
+    listener: Optional[QueueListener] = None
+    running = False
+
+    @classmethod
+    def start(cls, logger: logging.Logger, queue_size: int = 10000):
+        """
+        Moves logger's handlers behind a queue written by a background thread.
+        """
+        if cls.running:
+            return
+        handlers = list(logger.handlers)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        cls.queue_size = queue_size
+        cls.handler = AsyncQueueHandler(Queue(maxsize=queue_size))
+        cls.listener = QueueListener(
+            cls.handler.queue, *handlers, respect_handler_level=True
+        )
+        logger.addHandler(cls.handler)
+        cls.listener.start()
+        cls.running = True
+        atexit.register(cls.stop)
+
+    @classmethod
+    def stop(cls):
+        """
+        Writes the remaining sampling summaries and the queued records, and stops the
+        background thread. The handlers stay behind the queue handler; records logged
+        afterwards are dropped.
+        """
+        if cls.running:
+            if LogSampling.enabled:
+                LogSampling.summarize()
+            cls.running = False
+            cls.listener.stop()
+
+    @classmethod
+    def info(cls):
+        return {
+            "queued": cls.handler.queue.qsize() if cls.handler else 0,
+            "queue_size": cls.queue_size,
+            "dropped": cls.handler.dropped if cls.handler else 0,
+        }
@@ -0,0 +1,256 @@
+"""
+Sampling and rate limiting of the per-execution action result logs.
+
+With sampling enabled, log_action_result logs only 1 in sample_every successes of
+each tag (scheduler:action) and at most rate_limit lines per second per tag;
+failures are always logged. Only the results of the jobs (Executor.push) count; the
+lines of the actions within a job (e.g. the members of an All) are held until the
+job's result and logged only if it is. Every summary_interval seconds, one summary line per
+active tag reports what the suppressed lines would have: the number of results,
+how many were logged, failures, and the mean and max execution durations. A
+background thread writes the summaries when they're due, so a tag that goes quiet
+still has its last interval reported; LogPipeline.stop writes the remaining ones.
+
+Policies can be set per scheduler, e.g. for a Timely(interval=1) scheduler running
+several actions.
+
+usage:
+    LogSampling.configure(sample_every=10, rate_limit=1.0, summary_interval=60.0)
+    LogSampling.set_policy("heartbeat", sample_every=100)
+"""
+
+import logging
+from contextvars import ContextVar
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TagStats:
+    """
+    A tag's counts since its last summary, and its rate limit token bucket.
+    """
+
+    __slots__ = (
+        "results",
+        "successes",
+        "logged",
+        "failures",
+        "executions",
+        "duration",
+        "max_duration",
+        "tokens",
+        "refilled",
+    )
+
+    def __init__(self, rate_limit: Optional[float], now: float):
+        self.results = 0
+        self.successes = 0
+        self.logged = 0
+        self.failures = 0
+        self.executions = 0
+        self.duration = 0.0
+        self.max_duration = 0.0
+        self.tokens = max(rate_limit or 0.0, 1.0)
+        self.refilled = now
+
+
+class LogSampling:
+    enabled = False
+    sample_every = 1
+    rate_limit: Optional[float] = None
+    summary_interval = 60.0
+    # scheduler name -> (sample_every, rate_limit)
+    policies: Dict[str, Tuple[int, Optional[float]]] = {}
+    stats: Dict[str, TagStats] = {}
+    summarized = monotonic()
+    lock = Lock()
+    summarizer: Optional[Thread] = None
+    stopping: Optional[Event] = None
+    # the (logger, record) pairs held for the job executing in this context
+    held: ContextVar = ContextVar("held", default=None)
+
+    @classmethod
+    def configure(
+        cls,
+        sample_every: int = 1,
+        rate_limit: Optional[float] = None,
+        summary_interval: float = 60.0,
+    ):
+        """
+        Sets the default policy; sampling is enabled unless it logs everything.
+        """
+        assert sample_every >= 1, f"sample_every ({sample_every}) must be positive"
+        with cls.lock:
+            cls.sample_every = sample_every
+            cls.rate_limit = rate_limit
+            cls.summary_interval = summary_interval
+            cls.enabled = bool(cls.policies or sample_every > 1 or rate_limit)
+            cls.stats.clear()
+            enabled = cls.enabled
+        # restarted to wait the new summary_interval
+        cls.stop()
+        if enabled:
+            cls.start()
+
+    @classmethod
+    def set_policy(
+        cls, scheduler_name: str, sample_every: int = 1, rate_limit: float = None
+    ):
+        assert sample_every >= 1, f"sample_every ({sample_every}) must be positive"
+        with cls.lock:
+            cls.policies[scheduler_name] = (sample_every, rate_limit)
+            cls.enabled = True
+        cls.start()
+
+    @classmethod
+    def reset(cls):
+        cls.stop()
+        with cls.lock:
+            cls.enabled = False
+            cls.sample_every = 1
+            cls.rate_limit = None
+            cls.summary_interval = 60.0
+            cls.policies.clear()
+            cls.stats.clear()
+            cls.summarized = monotonic()
+
+    @classmethod
+    def policy(cls, tag: str):
+        scheduler_name = tag.split(":", 1)[0]
+        return cls.policies.get(scheduler_name, (cls.sample_every, cls.rate_limit))
+
+    @classmethod
+    def admit(cls, tag: Optional[str], duration: float = None, failed: bool = False):
+        """
+        Counts a result of tag, with the duration of its execution if known;
+        returns whether to log it.
+        """
+        tag = tag or ""
+        now = monotonic()
+        with cls.lock:
+            sample_every, rate_limit = cls.policy(tag)
+            stats = cls.stats.get(tag, None)
+            if stats is None:
+                stats = cls.stats[tag] = TagStats(rate_limit, now)
+            stats.results += 1
+            if duration is not None:
+                stats.executions += 1
+                stats.duration += duration
+                stats.max_duration = max(stats.max_duration, duration)
+            if failed:
+                stats.failures += 1
+                admitted = True
+            else:
+                stats.successes += 1
+                admitted = (stats.successes - 1) % sample_every == 0
+                if admitted and rate_limit:
+                    stats.tokens = min(
+                        max(rate_limit, 1.0),
+                        stats.tokens + (now - stats.refilled) * rate_limit,
+                    )
+                    stats.refilled = now
+                    admitted = stats.tokens >= 1.0
+                    if admitted:
+                        stats.tokens -= 1.0
+            if admitted:
+                stats.logged += 1
+            due = now - cls.summarized >= cls.summary_interval
+            summaries = cls.take_summaries(now) if due else []
+        for summary in summaries:
+            logger.info(summary)
+        return admitted
+
+    @classmethod
+    def holding(cls):
+        """
+        Returns whether a job is executing in this context, its records held.
+        """
+        return cls.held.get() is not None
+
+    @classmethod
+    def hold(cls, calling_logger: logging.Logger, record: logging.LogRecord):
+        """
+        Holds record for the job executing in this context (see holding).
+        """
+        cls.held.get().append((calling_logger, record))
+
+    @classmethod
+    def release(cls, admitted: bool):
+        """
+        Logs the records held for the job executing in this context if its result
+        was admitted, and drops them otherwise.
+        """
+        records = cls.held.get()
+        if not records:
+            return
+        # members of a Parallel may still be appending
+        taken = records[:]
+        del records[: len(taken)]
+        if admitted:
+            for calling_logger, record in taken:
+                calling_logger.handle(record)
+
+    @classmethod
+    def summarize(cls):
+        """
+        Logs the summaries of the tags active since the last ones.
+        """
+        with cls.lock:
+            summaries = cls.take_summaries(monotonic())
+        for summary in summaries:
+            logger.info(summary)
+
+    @classmethod
+    def start(cls):
+        """
+        Starts the thread writing the summaries when they're due.
+        """
+        with cls.lock:
+            if cls.summarizer:
+                return
+            cls.stopping = Event()
+            cls.summarizer = Thread(
+                target=cls.run,
+                args=(cls.stopping,),
+                name="whendo-log-summaries",
+                daemon=True,
+            )
+            cls.summarizer.start()
+
+    @classmethod
+    def stop(cls):
+        with cls.lock:
+            summarizer, cls.summarizer = cls.summarizer, None
+            if summarizer:
+                cls.stopping.set()
+        if summarizer:
+            summarizer.join()
+
+    @classmethod
+    def run(cls, stopping: Event):
+        wait = 0.0
+        while not stopping.wait(wait):
+            with cls.lock:
+                now = monotonic()
+                wait = cls.summarized + cls.summary_interval - now
+                due = wait <= 0
+                summaries = cls.take_summaries(now) if due else []
+                if due:
+                    wait = cls.summary_interval
+            for summary in summaries:
+                logger.info(summary)
+
+    @classmethod
+    def take_summaries(cls, now: float) -> List[str]:
+        interval = now - cls.summarized
+        cls.summarized = now
+        summaries = [
+            f"SUMMARY TAG ({tag}) RESULTS ({stats.results}) LOGGED ({stats.logged}) FAILURES ({stats.failures}) MEAN ({stats.duration / stats.executions if stats.executions else 0.0:.4f}s) MAX ({stats.max_duration:.4f}s) OVER ({interval:.1f}s)"
+            for tag, stats in cls.stats.items()
+            if stats.results
+        ]
+        cls.stats.clear()
+        return summaries
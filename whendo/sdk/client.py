@@ -1,10 +1,12 @@
 from pydantic import BaseModel, PrivateAttr
 import requests
 import logging
-from typing import Optional
+from datetime import datetime
+from urllib.parse import urlencode
+from typing import Optional, List, Dict, Callable, ClassVar
 from whendo.core.action import Action, ActionRez, Rez, RezDict
 from whendo.core.scheduler import Scheduler
-from whendo.core.server import Server
+from whendo.core.server import Server, Partition
 from whendo.core.resolver import (
     resolve_action,
     resolve_scheduler,
@@ -26,6 +28,14 @@ class Client(BaseModel):
     client_used: bool = False
     http_instance: Optional[Http] = None
 
+    # resolvers of the inventory collections (see get_page)
+    resolvers: ClassVar[Dict[str, Callable]] = {
+        "actions": resolve_action,
+        "schedulers": resolve_scheduler,
+        "programs": resolve_program,
+        "servers": resolve_server,
+    }
+
     def get_host(self):
         return self.host
 
@@ -47,6 +57,20 @@ class Client(BaseModel):
     def clear_dispatcher(self):
         return self.http().get("/dispatcher/clear")
 
+    def load_dispatcher_fields(self, fields: List[str]):
+        """
+        Returns a dictionary holding only the named Dispatcher fields.
+        """
+        return self.http().get(f"/dispatcher/load", {"fields": ",".join(fields)})
+
+    def get_changes(self, since: int = 0, epoch: Optional[str] = None):
+        """
+        Returns the changes to the server's Dispatcher after revision since. Feed
+        the result to Dispatcher.apply_changes to keep a replica current.
+        """
+        params = {"since": since, "epoch": epoch} if epoch else {"since": since}
+        return self.http().get("/dispatcher/changes", params)
+
     def load_dispatcher_from_name(self, name: str):
         return Dispatcher.resolve(self.http().get(f"/dispatcher/load_from_name/{name}"))
 
@@ -65,17 +89,172 @@ class Client(BaseModel):
     def describe_all(self):
         return self.http().get("/dispatcher/describe_all")
 
+    def get_partition(self):
+        partition = self.http().get("/dispatcher/partition")
+        return Partition(**partition) if partition else None
+
+    def set_partition(self, partition: Partition):
+        return self.http().put("/dispatcher/partition", partition)
+
+    def clear_partition(self):
+        return self.http().delete("/dispatcher/partition")
+
+    def get_partition_assignments(self):
+        return self.http().get("/dispatcher/partition/assignments")
+
+    def start_lock_profile(self, token: str):
+        return self.lock_profile_command("start", token)
+
+    def stop_lock_profile(self, token: str):
+        return self.lock_profile_command("stop", token)
+
+    def lock_profile_command(self, command: str, token: str):
+        """
+        token is the server's WHENDO_DEBUG_TOKEN.
+        """
+        response = requests.post(
+            self.http().cmd(f"/dispatcher/lock_profile/{command}"),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def get_lock_profile(self):
+        return self.http().get("/dispatcher/lock_profile")
+
+    # paged inventory
+    def get_page(
+        self,
+        collection: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        prefix: Optional[str] = None,
+        class_name: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        names_only: bool = False,
+    ):
+        """
+        Returns one page of actions, schedulers, programs or servers as
+        {"items": ..., "next": ...}. Pass "next" as the "after" argument to get the
+        following page. Whole elements are resolved; projections and names are not.
+        """
+        params = {
+            "after": after,
+            "limit": limit,
+            "prefix": prefix,
+            "class_name": class_name,
+            "fields": ",".join(fields) if fields else None,
+            "names_only": names_only if names_only else None,
+        }
+        page = self.http().get(
+            f"/{collection}",
+            {key: value for key, value in params.items() if value is not None},
+        )
+        if not (fields or names_only):
+            resolve = Client.resolvers[collection]
+            items = page["items"]
+            page["items"] = {name: resolve(items[name]) for name in items}
+        return page
+
+    def get_names(self, collection: str, prefix: Optional[str] = None):
+        return self.get_page(collection, prefix=prefix, names_only=True)["items"]
+
     # /execution
 
-    def execute_supplied_action(self, supplied_action: Action):
-        response = self.http().post(f"/execution", supplied_action)
+    def execute_supplied_action(
+        self, supplied_action: Action, idempotency_key: Optional[str] = None
+    ):
+        response = self.http().post(
+            f"/execution",
+            supplied_action,
+            headers=self.idempotency_headers(idempotency_key),
+        )
         return resolve_rez(response)
 
-    def execute_supplied_action_with_rez(self, supplied_action: Action, rez: Rez):
+    def execute_supplied_action_with_rez(
+        self,
+        supplied_action: Action,
+        rez: Rez,
+        idempotency_key: Optional[str] = None,
+    ):
         action_rez = ActionRez(action=supplied_action, rez=rez)
-        response = self.http().post(f"/execution/with_rez", action_rez)
+        response = self.http().post(
+            f"/execution/with_rez",
+            action_rez,
+            headers=self.idempotency_headers(idempotency_key),
+        )
         return resolve_rez(response)
 
+    # /debug
+    def profile(
+        self,
+        token: str,
+        seconds: float = 10.0,
+        hz: float = 100.0,
+        threads: Optional[str] = None,
+        local: bool = False,
+    ):
+        """
+        Returns the server's thread stacks sampled for seconds, in the collapsed-stack
+        format (see /debug/profile); token is the server's WHENDO_DEBUG_TOKEN.
+        """
+        query = {"seconds": seconds, "hz": hz, "threads": threads, "local": local}
+        query = urlencode({k: v for k, v in query.items() if v is not None})
+        response = requests.get(
+            self.http().cmd(f"/debug/profile?{query}"),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200, response.text
+        return response.text
+
+    # /executions
+    def get_executions(
+        self,
+        tag: Optional[str] = None,
+        since: Optional[datetime] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ):
+        query = {
+            "tag": tag,
+            "since": since.isoformat() if since else None,
+            "status": status,
+            "limit": limit,
+        }
+        query = urlencode({k: v for k, v in query.items() if v is not None})
+        return self.http().get(f"/executions?{query}" if query else "/executions")
+
+    def get_execution_stats(
+        self,
+        tag: Optional[str] = None,
+        action_name: Optional[str] = None,
+        server: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        bucket: Optional[float] = None,
+    ):
+        query = {
+            "tag": tag,
+            "action_name": action_name,
+            "server": server,
+            "status": status,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "bucket": bucket,
+        }
+        query = urlencode({k: v for k, v in query.items() if v is not None})
+        return self.http().get(
+            f"/executions/stats?{query}" if query else "/executions/stats"
+        )
+
+    def idempotency_headers(self, idempotency_key: Optional[str] = None):
+        """
+        Requests repeated with the same idempotency key execute once while the
+        server keeps the result, so they can be retried safely.
+        """
+        return {"Idempotency-Key": idempotency_key} if idempotency_key else None
+
     # /actions
     def get_action(self, action_name: str):
         return resolve_action(self.http().get(f"/actions/{action_name}"))
@@ -96,11 +275,24 @@ class Client(BaseModel):
     def delete_action(self, action_name: str):
         return self.http().delete(f"/actions/{action_name}")
 
-    def execute_action(self, action_name: str):
-        return resolve_rez(self.http().get(f"/actions/{action_name}/execute"))
+    def execute_action(self, action_name: str, idempotency_key: Optional[str] = None):
+        return resolve_rez(
+            self.http().get(
+                f"/actions/{action_name}/execute",
+                headers=self.idempotency_headers(idempotency_key),
+            )
+        )
 
-    def execute_action_with_rez(self, action_name: str, rez: Rez):
-        return resolve_rez(self.http().post(f"/actions/{action_name}/execute", rez))
+    def execute_action_with_rez(
+        self, action_name: str, rez: Rez, idempotency_key: Optional[str] = None
+    ):
+        return resolve_rez(
+            self.http().post(
+                f"/actions/{action_name}/execute",
+                rez,
+                headers=self.idempotency_headers(idempotency_key),
+            )
+        )
 
     # /schedulers
 
@@ -190,6 +382,9 @@ class Client(BaseModel):
         servers = self.http().get(f"/servers")
         return {name: resolve_server(servers[name]) for name in servers}
 
+    def get_server_health(self):
+        return self.http().get(f"/dispatcher/server_health")
+
     def describe_server(self, server_name: str):
         return self.http().get(f"/servers/{server_name}/describe")
 